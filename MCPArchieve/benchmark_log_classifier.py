@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Loki日志分类性能测试脚本
+生成100万行合成Loki日志, 对比逐关键词子串扫描与单次编译正则分类的耗时,
+并校验两者的分析结果一致
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+# 添加项目路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from core.mcp_protocols import LokiPromtailProtocol
+from core.log_classifier import classify_log_line, matches_query_type
+
+TEMPLATES = [
+    "systemd[1]: Started Session {n} of user root.",
+    "kernel: [{n}.123] TCP: request_sock_TCP: Possible SYN flooding on port 80",
+    "mysqld[{n}]: [Warning] Aborted connection {n} to db: 'app'",
+    "prometheus: level=error msg=\"scrape failed\" target=node-{n}",
+    "app[{n}]: Exception in thread main: java.lang.NullPointerException",
+    "nginx: upstream timed out while reading response header from {n}",
+    "kernel: Out of memory: Killed process {n} (java) - fatal",
+    "dnsmasq[{n}]: query[A] example.com from 10.0.0.{n}",
+    "sshd[{n}]: Accepted publickey for root from 10.1.2.3",
+    "app[{n}]: WARN connection pool nearly exhausted",
+]
+
+QUERY_TYPES = ["recent", "errors", "warnings", "system", "network"]
+# 每次查询分析的日志条数, 不超过分类缓存容量
+QUERY_WINDOW = 10000
+
+
+def generate_log_file(path, line_count):
+    """生成合成的Loki JSON行日志"""
+    rng = random.Random(42)
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(line_count):
+            template = TEMPLATES[rng.randrange(len(TEMPLATES))]
+            f.write(json.dumps({
+                "timestamp": f"2025-08-01T{(i // 3600) % 24:02d}:{(i // 60) % 60:02d}:{i % 60:02d}Z",
+                "log": template.format(n=rng.randrange(1000000))
+            }) + "\n")
+
+
+def legacy_filter(log_content, query_type):
+    """逐关键词子串扫描的原始查询类型过滤, 作为对照"""
+    log_lower = log_content.lower()
+    if query_type == "errors":
+        return any(keyword in log_lower for keyword in ["error", "failed", "exception", "critical"])
+    elif query_type == "warnings":
+        return any(keyword in log_lower for keyword in ["warning", "warn"])
+    elif query_type == "system":
+        return any(keyword in log_lower for keyword in ["system", "kernel", "systemd"])
+    elif query_type == "network":
+        return any(keyword in log_lower for keyword in ["network", "connection", "tcp", "udp", "dns"])
+    return True
+
+
+def legacy_analyze(logs):
+    """逐关键词子串扫描的原始分析实现, 作为对照"""
+    analysis = {
+        "total_logs": len(logs), "error_count": 0, "warning_count": 0, "info_count": 0, "critical_count": 0,
+        "error_patterns": {}, "warning_patterns": {}, "time_distribution": {}, "service_distribution": {}
+    }
+    for log_entry in logs:
+        log_line = log_entry["log"].lower()
+        hour = log_entry["timestamp"].split("T")[1].split(":")[0]
+        analysis["time_distribution"][hour] = analysis["time_distribution"].get(hour, 0) + 1
+        if any(keyword in log_line for keyword in ["critical", "fatal"]):
+            analysis["critical_count"] += 1
+        elif any(keyword in log_line for keyword in ["error", "failed", "exception"]):
+            analysis["error_count"] += 1
+            for keyword in ["error", "failed", "exception"]:
+                if keyword in log_line:
+                    analysis["error_patterns"][keyword] = analysis["error_patterns"].get(keyword, 0) + 1
+        elif any(keyword in log_line for keyword in ["warning", "warn"]):
+            analysis["warning_count"] += 1
+            for keyword in ["warning", "warn"]:
+                if keyword in log_line:
+                    analysis["warning_patterns"][keyword] = analysis["warning_patterns"].get(keyword, 0) + 1
+        else:
+            analysis["info_count"] += 1
+
+        if "systemd" in log_line:
+            service = "systemd"
+        elif "kernel" in log_line:
+            service = "kernel"
+        elif "mysql" in log_line:
+            service = "mysql"
+        elif "prometheus" in log_line:
+            service = "prometheus"
+        else:
+            service = "other"
+        analysis["service_distribution"][service] = analysis["service_distribution"].get(service, 0) + 1
+    return analysis
+
+
+def run_queries(logs, window, filter_func, analyze_func):
+    """按查询窗口依次执行 过滤 + 分析, 模拟协议的调用方式"""
+    results = []
+    for start in range(0, len(logs), window):
+        batch = logs[start:start + window]
+        for query_type in QUERY_TYPES:
+            selected = [entry for entry in batch if filter_func(entry["log"], query_type)]
+            results.append(analyze_func(selected))
+    return results
+
+
+def timed(func, *args):
+    """执行并返回 (结果, 耗时秒数)"""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    line_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    with tempfile.TemporaryDirectory() as temp_dir:
+        log_path = os.path.join(temp_dir, "loki_monitor_log.json")
+        print(f"生成 {line_count} 行合成Loki日志...")
+        generate_log_file(log_path, line_count)
+
+        with open(log_path, 'r', encoding='utf-8') as f:
+            logs = [json.loads(line) for line in f]
+
+    compiled_analyze = lambda selected: LokiPromtailProtocol._analyze_logs({"logs": selected})
+
+    legacy, legacy_time = timed(run_queries, logs, QUERY_WINDOW, legacy_filter, legacy_analyze)
+    classify_log_line.cache_clear()
+    compiled, compiled_time = timed(run_queries, logs, QUERY_WINDOW, matches_query_type, compiled_analyze)
+
+    for legacy_result, compiled_result in zip(legacy, compiled):
+        for key, value in legacy_result.items():
+            assert compiled_result[key] == value, f"结果不一致: {key}"
+
+    print(f"查询窗口 {QUERY_WINDOW} 行, 每个窗口执行 {len(QUERY_TYPES)} 种查询类型的过滤 + 分析")
+    print(f"逐关键词扫描: {legacy_time:.2f}s")
+    print(f"编译正则单次分类: {compiled_time:.2f}s  加速 {legacy_time / compiled_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
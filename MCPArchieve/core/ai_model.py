@@ -212,6 +212,8 @@ class OnlineModel:
      [MCP_CALL]{"protocol":"SkyWalkingProtocol","params":{}}[/MCP_CALL]
    - 资源关联: 当用户提到"资源关联"、"资源依赖"、"依赖关系"、"服务关系"等时，生成：
      [MCP_CALL]{"protocol":"SkyWalkingProtocol","params":{}}[/MCP_CALL]
+   - 完整分析: 当用户明确要求"重新完整分析"、"完整分析"、"重新采集"等时，生成：
+     [MCP_CALL]{"protocol":"SkyWalkingProtocol","params":{"full_analysis":true}}[/MCP_CALL]
 
 12. 当用户询问异常模式检测、风险扫描、机器风险、模式匹配、异常模式等相关问题时，生成异常模式检测MCP调用指令：
    - 完整异常模式检测: 当用户提到"异常模式检测"、"风险扫描"、"机器风险"、"模式匹配"、"异常模式"、"检测异常模式"、"完整异常模式捕捉"等时，生成：
@@ -292,7 +294,7 @@ class OnlineModel:
 - TrivySecurityProtocol: tool (scan_image, scan_filesystem, scan_repository, scan_kubernetes, scan_config, scan_sbom, scan_secrets), target
 - WebScanProtocol: url, mode (full, quick, security, performance), text
 - AutofixProtocol: problem_description (用户描述的问题)
-- SkyWalkingProtocol: 无需参数（自动执行分布式追踪和根因分析）
+- SkyWalkingProtocol: full_analysis (可选，默认基于实时滑动窗口分析；为true时重新运行完整分析脚本)
 - AnomalyPatternDetectionProtocol: action (run_pipeline, run_scanner, status, list_scanners), service, scanner_type
 - FusionLLMAnomalyDetectionProtocol: detection_type (comprehensive, logs_only, metrics_only), window_size, step_size, batch_size
 """
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+日志分类引擎
+将级别、错误/警告模式、服务以及查询类型的全部关键词编译为一个正则,
+每行日志只扫描一遍即可得到全部分类结果, 结果按行内容缓存
+"""
+
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+# 级别关键词, 按优先级排列
+CRITICAL_KEYWORDS = ("critical", "fatal")
+ERROR_KEYWORDS = ("error", "failed", "exception")
+WARNING_KEYWORDS = ("warning", "warn")
+
+# 服务关键词, 按匹配优先级排列
+SERVICE_KEYWORDS = ("systemd", "kernel", "mysql", "prometheus")
+
+# 查询类型关键词 (recent 不过滤)
+QUERY_TYPE_KEYWORDS = {
+    "errors": ("error", "failed", "exception", "critical"),
+    "warnings": ("warning", "warn"),
+    "system": ("system", "kernel", "systemd"),
+    "network": ("network", "connection", "tcp", "udp", "dns"),
+}
+
+_ALL_KEYWORDS = set(CRITICAL_KEYWORDS + ERROR_KEYWORDS + WARNING_KEYWORDS + SERVICE_KEYWORDS)
+for _keywords in QUERY_TYPE_KEYWORDS.values():
+    _ALL_KEYWORDS.update(_keywords)
+
+# 每个关键词同时意味着包含的较短关键词 (如 warning 包含 warn)
+_IMPLIED_KEYWORDS = {
+    keyword: frozenset(other for other in _ALL_KEYWORDS if other in keyword)
+    for keyword in _ALL_KEYWORDS
+}
+
+
+def _keyword_regex(keywords):
+    """将关键词构造成按前缀合并的正则(字典树形式), 首字符即可分派, 避免逐个尝试备选项"""
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # 当前节点本身是一个完整关键词时, 后续部分可选 (贪婪匹配取最长关键词)
+        return "(?:" + pattern + ")?" if "" in node else pattern
+
+    return re.compile(build(trie))
+
+
+# 所有关键词合并为一个正则, 对小写后的日志内容只扫描一遍;
+# 同一位置取最长关键词, 其包含的较短关键词由 _IMPLIED_KEYWORDS 补全
+_KEYWORD_PATTERN = _keyword_regex(_ALL_KEYWORDS)
+
+LogClassification = namedtuple(
+    "LogClassification",
+    ["level", "error_patterns", "warning_patterns", "service", "query_types"]
+)
+
+
+def _classify_keywords(found):
+    """根据出现的关键词集合得到分类结果"""
+    error_patterns = ()
+    warning_patterns = ()
+    if any(keyword in found for keyword in CRITICAL_KEYWORDS):
+        level = "critical"
+    elif any(keyword in found for keyword in ERROR_KEYWORDS):
+        level = "error"
+        error_patterns = tuple(keyword for keyword in ERROR_KEYWORDS if keyword in found)
+    elif any(keyword in found for keyword in WARNING_KEYWORDS):
+        level = "warning"
+        warning_patterns = tuple(keyword for keyword in WARNING_KEYWORDS if keyword in found)
+    else:
+        level = "info"
+
+    service = next((keyword for keyword in SERVICE_KEYWORDS if keyword in found), "other")
+
+    query_types = frozenset(
+        query_type for query_type, keywords in QUERY_TYPE_KEYWORDS.items()
+        if any(keyword in found for keyword in keywords)
+    )
+
+    return LogClassification(level, error_patterns, warning_patterns, service, query_types)
+
+
+# 关键词组合 -> 分类结果, 不同组合的数量很少, 全部缓存
+_classification_by_keywords = {}
+
+
+@lru_cache(maxsize=65536)
+def classify_log_line(log_content):
+    """
+    对一行日志进行分类
+    :return: LogClassification(level, error_patterns, warning_patterns, service, query_types)
+             level 为 critical/error/warning/info
+    """
+    matched = frozenset(_KEYWORD_PATTERN.findall(log_content.lower()))
+    classification = _classification_by_keywords.get(matched)
+    if classification is None:
+        found = set()
+        for keyword in matched:
+            found |= _IMPLIED_KEYWORDS[keyword]
+        classification = _classify_keywords(found)
+        _classification_by_keywords[matched] = classification
+    return classification
+
+
+def matches_query_type(log_content, query_type):
+    """判断日志是否属于某个查询类型, 未知类型(如recent)不过滤"""
+    if query_type not in QUERY_TYPE_KEYWORDS:
+        return True
+    return query_type in classify_log_line(log_content).query_types
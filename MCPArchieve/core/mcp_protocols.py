@@ -8,8 +8,14 @@ import requests
 import subprocess
 import os
 import shutil
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 from datetime import datetime
 from .monitor_utils import query_sys_io
+from .log_tail_reader import get_reader
+from .log_classifier import classify_log_line, matches_query_type
+from .reverse_log_reader import get_index, iter_lines_reversed, parse_timestamp
+from .scan_risk_table import ScanRiskTable, CRITICAL_SERVICES, normalize_scan_anomalies
 
 class WindowsIOMonitorProtocol:
     @staticmethod
@@ -225,70 +231,68 @@ class NodeExporterProtocol:
     
     @staticmethod
     def _read_node_metrics_from_log(log_file_path):
-        """从日志文件读取Node Exporter数据"""
-        import os
-        
-        if not os.path.exists(log_file_path):
-            raise FileNotFoundError(f"日志文件不存在: {log_file_path}")
-        
-        metrics = {}
+        """从日志文件读取Node Exporter数据 (增量解析新追加的行)"""
+        reader = get_reader(log_file_path, NodeExporterProtocol._consume_metric_line, dict)
         
         try:
-            with open(log_file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # 解析日志文件内容，根据文档示例格式解析
-            lines = content.strip().split('\n')
-            
-            for line in lines:
-                line = line.strip()
-                if not line or line.startswith('=') or line.startswith('Timestamp'):
-                    continue
-                
-                try:
-                    # 解析格式: metric_name{labels} value
-                    if '{' in line:
-                        metric_part, value_part = line.rsplit(' ', 1)
-                        metric_name = metric_part.split('{')[0]
-                        labels_part = metric_part.split('{')[1].rstrip('}')
-                        
-                        # 解析标签
-                        labels = {}
-                        if labels_part:
-                            for label_pair in labels_part.split(','):
-                                if '=' in label_pair:
-                                    key, value = label_pair.split('=', 1)
-                                    labels[key.strip()] = value.strip('"')
-                    else:
-                        parts = line.split()
-                        if len(parts) >= 2:
-                            metric_name = parts[0]
-                            value_part = parts[1]
-                            labels = {}
-                        else:
-                            continue
-                    
-                    # 尝试转换为数字
-                    try:
-                        value = float(value_part)
-                    except ValueError:
-                        continue
-                    
-                    if metric_name not in metrics:
-                        metrics[metric_name] = []
-                    
-                    metrics[metric_name].append({
-                        "labels": labels,
-                        "value": value
-                    })
-                    
-                except Exception:
-                    continue
-        
+            return reader.read(NodeExporterProtocol._snapshot_view)
+        except FileNotFoundError:
+            raise
         except Exception as e:
             raise Exception(f"读取日志文件失败: {str(e)}")
+    
+    @staticmethod
+    def _snapshot_view(metrics, tail):
+        """复制快照, 并合并末尾尚未换行的一行"""
+        view = {k: list(v) for k, v in metrics.items()}
+        if tail:
+            try:
+                NodeExporterProtocol._consume_metric_line(view, tail)
+            except Exception:
+                pass
+        return view
+    
+    @staticmethod
+    def _consume_metric_line(metrics, line):
+        """解析一行Node Exporter数据并合并到快照"""
+        if line.startswith('=') or line.startswith('Timestamp'):
+            return
+        
+        # 解析格式: metric_name{labels} value
+        if '{' in line:
+            metric_part, value_part = line.rsplit(' ', 1)
+            metric_name = metric_part.split('{')[0]
+            labels_part = metric_part.split('{')[1].rstrip('}')
+            
+            # 解析标签
+            labels = {}
+            if labels_part:
+                for label_pair in labels_part.split(','):
+                    if '=' in label_pair:
+                        key, value = label_pair.split('=', 1)
+                        labels[key.strip()] = value.strip('"')
+        else:
+            parts = line.split()
+            if len(parts) >= 2:
+                metric_name = parts[0]
+                value_part = parts[1]
+                labels = {}
+            else:
+                return
         
-        return metrics
+        # 尝试转换为数字
+        try:
+            value = float(value_part)
+        except ValueError:
+            return
+        
+        if metric_name not in metrics:
+            metrics[metric_name] = []
+        
+        metrics[metric_name].append({
+            "labels": labels,
+            "value": value
+        })
     
     @staticmethod
     def _filter_metrics(metrics_data, metric_type):
@@ -454,59 +458,68 @@ class BlackboxExporterProtocol:
     
     @staticmethod
     def _read_blackbox_metrics_from_log(log_file_path, target_filter=None):
-        """从JSON日志文件读取Blackbox Exporter数据"""
-        import os
-        import json
-        
-        if not os.path.exists(log_file_path):
-            raise FileNotFoundError(f"日志文件不存在: {log_file_path}")
+        """从JSON日志文件读取Blackbox Exporter数据 (增量解析新追加的行)"""
+        reader = get_reader(
+            log_file_path,
+            BlackboxExporterProtocol._consume_probe_line,
+            lambda: {"all": {}, "by_target": {}}
+        )
         
-        metrics_by_module = {}
+        def view(snapshot, tail):
+            snapshots = [snapshot]
+            if tail:
+                # 末尾尚未换行的一行单独解析后再合并
+                tail_snapshot = {"all": {}, "by_target": {}}
+                BlackboxExporterProtocol._consume_probe_line(tail_snapshot, tail)
+                snapshots.append(tail_snapshot)
+            
+            metrics_by_module = {}
+            for item in snapshots:
+                if target_filter:
+                    modules = item["by_target"].get(target_filter, {})
+                else:
+                    modules = item["all"]
+                for module, info in modules.items():
+                    if module in metrics_by_module:
+                        metrics_by_module[module]["metrics"].update(info["metrics"])
+                    else:
+                        metrics_by_module[module] = dict(info, metrics=dict(info["metrics"]))
+            return metrics_by_module
         
         try:
-            with open(log_file_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-            
-            # 解析JSON格式的日志数据
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-                
-                try:
-                    data = json.loads(line)
-                    target = data.get("target", "")
-                    module = data.get("module", "")
-                    metric = data.get("metric", "")
-                    value = data.get("value", 0)
-                    labels = data.get("labels", {})
-                    
-                    # 如果指定了目标过滤，只处理匹配的目标
-                    if target_filter and target != target_filter:
-                        continue
-                    
-                    if module not in metrics_by_module:
-                        metrics_by_module[module] = {
-                            "module": module,
-                            "target": target,
-                            "metrics": {},
-                            "status": "success"
-                        }
-                    
-                    metrics_by_module[module]["metrics"][metric] = {
-                        "value": value,
-                        "labels": labels
-                    }
-                    
-                except json.JSONDecodeError:
-                    continue
-                except Exception:
-                    continue
-        
+            return reader.read(view)
+        except FileNotFoundError:
+            raise
         except Exception as e:
             raise Exception(f"读取日志文件失败: {str(e)}")
-        
-        return metrics_by_module
+    
+    @staticmethod
+    def _consume_probe_line(snapshot, line):
+        """解析一行Blackbox探测数据, 同时更新全量视图和按目标划分的视图"""
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError:
+            return
+        
+        target = data.get("target", "")
+        module = data.get("module", "")
+        metric = data.get("metric", "")
+        value = data.get("value", 0)
+        labels = data.get("labels", {})
+        
+        for metrics_by_module in (snapshot["all"], snapshot["by_target"].setdefault(target, {})):
+            if module not in metrics_by_module:
+                metrics_by_module[module] = {
+                    "module": module,
+                    "target": target,
+                    "metrics": {},
+                    "status": "success"
+                }
+            
+            metrics_by_module[module]["metrics"][metric] = {
+                "value": value,
+                "labels": labels
+            }
     
     @staticmethod
     def _generate_summary(results, target):
@@ -717,71 +730,115 @@ class MysqldExporterProtocol:
     
     @staticmethod
     def _read_mysql_metrics_from_log(log_file_path):
-        """从JSON日志文件读取Mysqld Exporter数据"""
-        import os
-        import json
+        """从JSON日志文件读取Mysqld Exporter数据 (增量解析新追加的行)"""
+        reader = get_reader(
+            log_file_path,
+            MysqldExporterProtocol._consume_metrics_line,
+            MysqldExporterProtocol._new_metrics_snapshot
+        )
         
-        if not os.path.exists(log_file_path):
-            raise FileNotFoundError(f"日志文件不存在: {log_file_path}")
+        try:
+            return reader.read(MysqldExporterProtocol._metrics_view)
+        except FileNotFoundError:
+            raise
+        except Exception as e:
+            raise Exception(f"读取日志文件失败: {str(e)}")
+    
+    @staticmethod
+    def _new_metrics_snapshot():
+        """
+        空的解析快照 (文件轮转或截断时由读取器重建)
+        mode 由文件第一行决定: 第一行是完整JSON对象时为逐行JSON(lines), 否则整个文件是
+        一个多行JSON文档(document), 此时缓存全部行并按读取位置缓存文档的解析结果
+        """
+        return {
+            "mode": None,
+            "metrics": {},
+            "document_lines": [],
+            "document_position": None,
+            "document_metrics": {}
+        }
+    
+    @staticmethod
+    def _consume_metrics_line(snapshot, line):
+        """解析一行JSON格式的Mysqld Exporter数据; 多行JSON文档只缓存行, 在视图中整体解析"""
+        if snapshot["mode"] is None:
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError:
+                data = None
+            snapshot["mode"] = "lines" if isinstance(data, dict) else "document"
         
-        metrics = {}
+        if snapshot["mode"] == "document":
+            snapshot["document_lines"].append(line)
+            return
         
         try:
-            with open(log_file_path, 'r', encoding='utf-8') as f:
-                content = f.read().strip()
-            
-            # 解析JSON格式的日志数据
-            if content:
+            data = json.loads(line)
+        except json.JSONDecodeError:
+            return
+        if isinstance(data, dict):
+            MysqldExporterProtocol._merge_metrics(snapshot["metrics"], data)
+    
+    @staticmethod
+    def _metrics_view(snapshot, tail):
+        """由快照和文件末尾未以换行结束的内容生成指标字典"""
+        if snapshot["mode"] == "document" or (snapshot["mode"] is None and tail):
+            # 行只会追加 (轮转时快照重建), 已缓存的行数和末尾内容唯一确定读取位置
+            position = (len(snapshot["document_lines"]), tail)
+            if snapshot["document_position"] != position:
+                lines = snapshot["document_lines"] + ([tail] if tail else [])
+                snapshot["document_metrics"] = MysqldExporterProtocol._parse_metrics_document(lines)
+                snapshot["document_position"] = position
+            return {k: list(v) for k, v in snapshot["document_metrics"].items()}
+        
+        metrics = {k: list(v) for k, v in snapshot["metrics"].items()}
+        if tail:
+            try:
+                data = json.loads(tail)
+            except json.JSONDecodeError:
+                data = None
+            if isinstance(data, dict):
+                MysqldExporterProtocol._merge_metrics(metrics, data)
+        return metrics
+    
+    @staticmethod
+    def _parse_metrics_document(lines):
+        """按完整JSON解析多行文档, 无法整体解析时逐行解析"""
+        metrics = {}
+        try:
+            data = json.loads("\n".join(lines))
+        except json.JSONDecodeError:
+            for line in lines:
                 try:
-                    # 尝试解析为完整的JSON对象
-                    data = json.loads(content)
-                    
-                    # 根据文档示例格式解析
-                    if "metrics" in data:
-                        for metric_info in data["metrics"]:
-                            metric_name = metric_info.get("metric", "")
-                            value = metric_info.get("value", 0)
-                            labels = metric_info.get("labels", {})
-                            
-                            if metric_name not in metrics:
-                                metrics[metric_name] = []
-                            
-                            metrics[metric_name].append({
-                                "labels": labels,
-                                "value": value
-                            })
-                    
+                    data = json.loads(line)
                 except json.JSONDecodeError:
-                    # 如果不是完整JSON，尝试按行解析
-                    lines = content.split('\n')
-                    for line in lines:
-                        line = line.strip()
-                        if not line:
-                            continue
-                        
-                        try:
-                            data = json.loads(line)
-                            if "metrics" in data:
-                                for metric_info in data["metrics"]:
-                                    metric_name = metric_info.get("metric", "")
-                                    value = metric_info.get("value", 0)
-                                    labels = metric_info.get("labels", {})
-                                    
-                                    if metric_name not in metrics:
-                                        metrics[metric_name] = []
-                                    
-                                    metrics[metric_name].append({
-                                        "labels": labels,
-                                        "value": value
-                                    })
-                        except json.JSONDecodeError:
-                            continue
-        
-        except Exception as e:
-            raise Exception(f"读取日志文件失败: {str(e)}")
+                    continue
+                if isinstance(data, dict):
+                    MysqldExporterProtocol._merge_metrics(metrics, data)
+            return metrics
         
+        if isinstance(data, dict):
+            MysqldExporterProtocol._merge_metrics(metrics, data)
         return metrics
     
+    @staticmethod
+    def _merge_metrics(metrics, data):
+        """将一条JSON记录中的指标合并到指标字典"""
+        if "metrics" in data:
+            for metric_info in data["metrics"]:
+                metric_name = metric_info.get("metric", "")
+                value = metric_info.get("value", 0)
+                labels = metric_info.get("labels", {})
+                
+                if metric_name not in metrics:
+                    metrics[metric_name] = []
+                
+                metrics[metric_name].append({
+                    "labels": labels,
+                    "value": value
+                })
+    
     @staticmethod
     def _filter_metrics(metrics_data, metric_type):
         """根据指标类型过滤数据"""
@@ -975,7 +1032,7 @@ class LokiPromtailProtocol:
     def execute(params=None):
         """
         Loki + Promtail日志监控协议
-        :param params: 字典参数 (支持query_type, time_range, log_level等)
+        :param params: 字典参数 (支持query_type, time_range, since, until, log_level等)
         """
         log_file_path = "/var/log/loki_monitor_log.json"
         
@@ -984,16 +1041,26 @@ class LokiPromtailProtocol:
         time_range = "1h"
         log_level = "all"
         limit = 100
+        since = None
+        until = None
         
         if params:
             query_type = params.get("query_type", query_type)
             time_range = params.get("time_range", time_range)
             log_level = params.get("log_level", log_level)
             limit = params.get("limit", limit)
+            # 显式指定time_range时, 将其作为since使用
+            since = params.get("since", params.get("time_range"))
+            until = params.get("until")
         
         try:
+            since = LokiPromtailProtocol._parse_time_bound(since)
+            until = LokiPromtailProtocol._parse_time_bound(until)
+            
             # 从日志文件读取Loki数据
-            logs_data = LokiPromtailProtocol._read_loki_logs_from_file(log_file_path, query_type, limit)
+            logs_data = LokiPromtailProtocol._read_loki_logs_from_file(
+                log_file_path, query_type, limit, since=since, until=until
+            )
             
             # 分析日志内容
             log_analysis = LokiPromtailProtocol._analyze_logs(logs_data)
@@ -1022,31 +1089,39 @@ class LokiPromtailProtocol:
             }
     
     @staticmethod
-    def _read_loki_logs_from_file(log_file_path, query_type, limit):
-        """从JSON日志文件读取Loki数据"""
-        import os
-        import json
-        
+    def _read_loki_logs_from_file(log_file_path, query_type, limit, since=None, until=None):
+        """
+        从JSON日志文件倒序读取Loki数据 (最新的日志在前)
+        :param since: 起始时间(Unix秒), 读到更早的日志即停止
+        :param until: 结束时间(Unix秒), 通过稀疏时间索引直接定位, 跳过更晚的日志
+        """
         if not os.path.exists(log_file_path):
             raise FileNotFoundError(f"日志文件不存在: {log_file_path}")
         
         logs = []
         
         try:
-            with open(log_file_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
+            end_offset = None
+            if until is not None:
+                index = get_index(log_file_path, LokiPromtailProtocol._line_timestamp)
+                end_offset = index.end_offset_for(until)
             
-            # 解析JSON格式的日志数据，每行一个JSON对象
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-                
+            # 解析JSON格式的日志数据，每行一个JSON对象，从文件末尾向前读取
+            for _, line in iter_lines_reversed(log_file_path, end_offset):
                 try:
                     data = json.loads(line)
                     timestamp = data.get("timestamp", "")
                     log_content = data.get("log", "")
                     
+                    # 按时间范围截断
+                    if since is not None or until is not None:
+                        ts = parse_timestamp(timestamp)
+                        if ts is not None:
+                            if until is not None and ts > until:
+                                continue
+                            if since is not None and ts < since:
+                                break
+                    
                     # 根据查询类型过滤日志
                     if LokiPromtailProtocol._filter_log_by_type(log_content, query_type):
                         logs.append({
@@ -1069,21 +1144,34 @@ class LokiPromtailProtocol:
         
         return {"logs": logs, "total_count": len(logs)}
     
+    @staticmethod
+    def _line_timestamp(line):
+        """取出一行JSON日志的时间戳(Unix秒)"""
+        try:
+            return parse_timestamp(json.loads(line).get("timestamp"))
+        except (ValueError, AttributeError):
+            return None
+    
+    @staticmethod
+    def _parse_time_bound(value, now=None):
+        """
+        解析查询时间边界
+        支持Unix时间戳、ISO8601时间以及"15m"/"1h"/"7d"这样的相对时长(相对当前时间向前)
+        """
+        if value is None or value == "":
+            return None
+        if isinstance(value, str):
+            text = value.strip().lower()
+            units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+            if len(text) > 1 and text[-1] in units and text[:-1].replace(".", "", 1).isdigit():
+                now = now if now is not None else datetime.now().timestamp()
+                return now - float(text[:-1]) * units[text[-1]]
+        return parse_timestamp(value)
+    
     @staticmethod
     def _filter_log_by_type(log_content, query_type):
         """根据查询类型过滤日志内容"""
-        log_lower = log_content.lower()
-        
-        if query_type == "errors":
-            return any(keyword in log_lower for keyword in ["error", "failed", "exception", "critical"])
-        elif query_type == "warnings":
-            return any(keyword in log_lower for keyword in ["warning", "warn"])
-        elif query_type == "system":
-            return any(keyword in log_lower for keyword in ["system", "kernel", "systemd"])
-        elif query_type == "network":
-            return any(keyword in log_lower for keyword in ["network", "connection", "tcp", "udp", "dns"])
-        else:  # recent - 返回所有日志
-            return True
+        return matches_query_type(log_content, query_type)
     
     @staticmethod
     def _analyze_logs(logs_data):
@@ -1104,53 +1192,29 @@ class LokiPromtailProtocol:
             "service_distribution": {}
         }
         
+        # 每行只做一次编译正则分类, 相同分类结果先计数再统一累加
+        classification_counts = Counter()
+        hour_counts = Counter()
         for log_entry in logs:
-            log_line = log_entry["log"].lower()
-            timestamp = log_entry["timestamp"]
-            hour = timestamp.split("T")[1].split(":")[0]
-            
-            # 统计时间分布
-            if hour not in analysis["time_distribution"]:
-                analysis["time_distribution"][hour] = 0
-            analysis["time_distribution"][hour] += 1
-            
+            hour_counts[log_entry["timestamp"].split("T")[1].split(":")[0]] += 1
+            classification_counts[classify_log_line(log_entry["log"])] += 1
+        
+        # 统计时间分布
+        analysis["time_distribution"].update(hour_counts)
+        
+        for classification, count in classification_counts.items():
             # 分类日志级别
-            if any(keyword in log_line for keyword in ["critical", "fatal"]):
-                analysis["critical_count"] += 1
-            elif any(keyword in log_line for keyword in ["error", "failed", "exception"]):
-                analysis["error_count"] += 1
-                # 提取错误模式
-                for keyword in ["error", "failed", "exception"]:
-                    if keyword in log_line:
-                        if keyword not in analysis["error_patterns"]:
-                            analysis["error_patterns"][keyword] = 0
-                        analysis["error_patterns"][keyword] += 1
-            elif any(keyword in log_line for keyword in ["warning", "warn"]):
-                analysis["warning_count"] += 1
-                # 提取警告模式
-                for keyword in ["warning", "warn"]:
-                    if keyword in log_line:
-                        if keyword not in analysis["warning_patterns"]:
-                            analysis["warning_patterns"][keyword] = 0
-                        analysis["warning_patterns"][keyword] += 1
-            else:
-                analysis["info_count"] += 1
+            analysis[f"{classification.level}_count"] += count
             
-            # 分析服务分布
-            if "systemd" in log_line:
-                service = "systemd"
-            elif "kernel" in log_line:
-                service = "kernel"
-            elif "mysql" in log_line:
-                service = "mysql"
-            elif "prometheus" in log_line:
-                service = "prometheus"
-            else:
-                service = "other"
+            # 提取错误/警告模式
+            for keyword in classification.error_patterns:
+                analysis["error_patterns"][keyword] = analysis["error_patterns"].get(keyword, 0) + count
+            for keyword in classification.warning_patterns:
+                analysis["warning_patterns"][keyword] = analysis["warning_patterns"].get(keyword, 0) + count
             
-            if service not in analysis["service_distribution"]:
-                analysis["service_distribution"][service] = 0
-            analysis["service_distribution"][service] += 1
+            # 分析服务分布
+            service = classification.service
+            analysis["service_distribution"][service] = analysis["service_distribution"].get(service, 0) + count
         
         return analysis
     
@@ -2464,15 +2528,26 @@ class MySQLOptimizationProtocol:
             }
 
 class SkyWalkingProtocol:
+    # SkyWalking根因分析系统路径
+    RCA_PATH = "/home/denerate/rca_sky-main"
+    
     @staticmethod
     def execute(params=None):
         """
         SkyWalking分布式追踪和微服务监控协议
         当用户询问微服务、分布式、异常服务、资源关联、资源依赖关系、异常根因定位等问题时调用
+        :param params: 字典参数
+            - full_analysis: 为True时重新运行分析脚本(单次采集完整时间窗口),
+              否则优先基于进程内常驻的滑动窗口分析; 两种方式都包含AI分析和结果导出
         """
+        if not (params or {}).get("full_analysis"):
+            window_result = SkyWalkingProtocol._analyze_sliding_window(SkyWalkingProtocol.RCA_PATH)
+            if window_result is not None:
+                return window_result
+        
         try:
             # 设置脚本路径
-            script_path = "/home/denerate/rca_sky-main/main.py"
+            script_path = os.path.join(SkyWalkingProtocol.RCA_PATH, "main.py")
             
             # 检查脚本是否存在
             if not os.path.exists(script_path):
@@ -2567,9 +2642,102 @@ class SkyWalkingProtocol:
                 "message": f"执行SkyWalking分析时出错: {str(e)}"
             }
 
+    @staticmethod
+    def _analyze_sliding_window(rca_path):
+        """
+        基于常驻的滑动窗口采集器在进程内执行异常检测、根因分析、AI分析和结果导出
+        首次调用时采集完整窗口并启动后台增量采集, 之后直接使用内存中的窗口数据;
+        无法导入、初始化失败(如SkyWalking不可用)或窗口长时间未更新时返回None, 由调用方退回运行分析脚本
+        """
+        config_path = os.path.join(rca_path, "config.yaml")
+        if not os.path.exists(config_path):
+            return None
+        
+        try:
+            import sys
+            if rca_path not in sys.path:
+                sys.path.insert(0, rca_path)
+            from sliding_window_collector import get_window_collector
+            
+            window = get_window_collector(config_path)
+            if window.is_stale():
+                print(f"⚠️ 滑动窗口已超过 {window.max_stale_seconds} 秒未成功更新，改为运行分析脚本")
+                return None
+            analysis = window.report()
+        except Exception as e:
+            print(f"⚠️ 滑动窗口分析不可用，改为运行分析脚本: {str(e)}")
+            return None
+        
+        anomalies = analysis["anomalies_data"].get("anomalies", {})
+        root_causes = analysis["root_cause_data"].get("root_causes", [])
+        window_info = analysis["window"]
+        ai_analysis = analysis["ai_analysis"]
+        exported_files = analysis["exported_files"]
+        total_anomalies = sum(len(items) for items in anomalies.values())
+        
+        output_lines = [
+            f"⏰ 窗口截至: {window_info['last_minute']} (最近 {window_info['minutes']} 分钟)",
+            f"🔍 监控服务数: {window_info['services']}",
+            f"⚠️ 检测异常数: {total_anomalies}",
+            f"   - 高优先级: {len(anomalies.get('high_priority', []))}",
+            f"   - 中优先级: {len(anomalies.get('medium_priority', []))}",
+            f"   - 低优先级: {len(anomalies.get('low_priority', []))}",
+            f"🎯 识别根因数: {len(root_causes)}"
+        ]
+        if ai_analysis and "error" not in ai_analysis:
+            ai_success_count = sum(1 for item in ai_analysis.values()
+                                   if isinstance(item, dict) and item.get("success"))
+            output_lines.append(f"🤖 AI分析项目: {ai_success_count}/{len(ai_analysis)}")
+        if exported_files:
+            output_lines.append(f"📁 导出文件数: {len(exported_files)}")
+        for i, anomaly in enumerate(anomalies.get("high_priority", [])[:3], 1):
+            output_lines.append(f"   高优先级异常 {i}. {anomaly.get('service', 'unknown')}: {anomaly.get('type', 'unknown')}")
+        for i, root_cause in enumerate(root_causes[:3], 1):
+            output_lines.append(
+                f"   主要根因 {i}. {root_cause.get('root_service', 'unknown')} "
+                f"(得分: {root_cause.get('root_cause_score', 0):.2f})"
+            )
+        full_output = '\n'.join(output_lines)
+        print(full_output)
+        
+        return {
+            "status": "success",
+            "message": "SkyWalking分布式追踪分析完成",
+            "output": full_output,
+            "summary": {
+                "analysis_type": "微服务分布式追踪与根因分析",
+                "tool": "SkyWalking 滑动窗口实时分析 + AI智能分析",
+                "execution_time": "实时分析",
+                "window": window_info,
+                "output_files": "结果已导出到文件" if exported_files else "未发现异常，未导出文件",
+                "next_steps": "查看分析报告获取详细信息"
+            },
+            "anomalies": anomalies,
+            "root_causes": root_causes[:10],
+            "ai_analysis": ai_analysis,
+            "exported_files": exported_files,
+            "raw_output": full_output,
+            "error_output": None
+        }
+
 class AnomalyPatternDetectionProtocol:
     """异常模式检测协议 - 集成abnormal_pattern_detect功能"""
     
+    # 并发执行扫描器的数量上限
+    SCANNER_MAX_WORKERS = 4
+    # 单个扫描器的超时时间(秒)
+    SCANNER_TIMEOUT = 120
+    # 是否在当前进程内运行常驻的扫描器实例 (否则每个扫描器启动一个子进程)
+    SCANNER_IN_PROCESS = True
+    
+    # 按服务名称给出的优化建议
+    SERVICE_OPTIMIZATION_SUGGESTIONS = (
+        ("mysql", ["检查MySQL连接池配置", "优化慢查询", "检查数据库索引使用情况"]),
+        ("nginx", ["检查Nginx配置文件", "优化worker进程数", "检查访问日志和错误日志"]),
+        ("system", ["检查系统资源使用情况", "优化系统参数配置", "清理临时文件和日志"]),
+        ("loki", ["检查Loki存储配置", "优化日志收集性能", "检查Promtail配置"]),
+    )
+    
     @staticmethod
     def execute(params=None):
         """
@@ -2636,24 +2804,18 @@ class AnomalyPatternDetectionProtocol:
                     "message": f"异常模式检测目录不存在: {anomaly_detect_path}"
                 }
             
-            # 切换到工作目录
-            original_dir = os.getcwd()
-            os.chdir(anomaly_detect_path)
-            
-            # 执行主程序
+            # 执行主程序 (通过cwd指定工作目录, 不修改当前进程的工作目录)
             cmd = ["python3", "main.py", "run"]
             print(f"📋 执行命令: {' '.join(cmd)}")
             
             result = subprocess.run(
                 cmd,
+                cwd=anomaly_detect_path,
                 capture_output=True,
                 text=True,
                 timeout=600  # 10分钟超时
             )
             
-            # 恢复工作目录
-            os.chdir(original_dir)
-            
             # 分析执行结果
             if result.returncode == 0:
                 # 检查生成的文件
@@ -2802,24 +2964,39 @@ class AnomalyPatternDetectionProtocol:
             print(f"🔍 开始执行扫描器: {scanner_file}")
             print(f"📂 扫描器路径: {scanner_path}")
             
-            # 切换到工作目录
-            original_dir = os.getcwd()
-            os.chdir(os.path.dirname(scanner_path))
+            # 优先在当前进程内运行常驻的扫描器实例
+            registry = AnomalyPatternDetectionProtocol._get_scanner_registry(anomaly_detect_path)
+            if registry is not None:
+                scan_results = AnomalyPatternDetectionProtocol._normalize_scan_data(
+                    registry.run_scan(scanner_file), service
+                )
+                return {
+                    "status": "success",
+                    "message": f"{service} 服务扫描完成",
+                    "service": service,
+                    "scanner_type": scanner_type,
+                    "scanner_file": scanner_file,
+                    "execution_time": datetime.now().isoformat(),
+                    "command": f"{scanner_file} (进程内执行)",
+                    "scan_results": scan_results,
+                    "raw_output": "",
+                    "anomaly_analysis": AnomalyPatternDetectionProtocol._analyze_scan_anomalies(scan_results)
+                }
             
-            # 执行扫描器
+            # 执行扫描器 (通过cwd指定工作目录, 不修改当前进程的工作目录)
             cmd = ["python3", scanner_file]
             result = subprocess.run(
                 cmd,
+                cwd=os.path.dirname(scanner_path),
                 capture_output=True,
                 text=True,
                 timeout=300  # 5分钟超时
             )
             
-            # 恢复工作目录
-            os.chdir(original_dir)
-            
             # 分析扫描结果
-            scan_results = AnomalyPatternDetectionProtocol._parse_scan_results(anomaly_detect_path, service)
+            scan_results = AnomalyPatternDetectionProtocol._parse_scanner_output(result.stdout, service)
+            if scan_results is None:
+                scan_results = AnomalyPatternDetectionProtocol._parse_scan_results(anomaly_detect_path, service)
             
             if result.returncode == 0:
                 return {
@@ -2878,11 +3055,21 @@ class AnomalyPatternDetectionProtocol:
             # 检查生成的文件
             generated_files = AnomalyPatternDetectionProtocol._check_generated_files(anomaly_detect_path)
             
+            # 各服务最新一次扫描的摘要
+            latest_scans = {}
+            store = AnomalyPatternDetectionProtocol._get_result_store(anomaly_detect_path)
+            if store is not None:
+                try:
+                    latest_scans = store.latest_summaries()
+                except Exception as e:
+                    print(f"⚠️ 读取扫描结果摘要失败: {str(e)}")
+            
             return {
                 "status": "success",
                 "message": "系统状态获取成功",
                 "system_status": status,
                 "generated_files": generated_files,
+                "latest_scans": latest_scans,
                 "timestamp": datetime.now().isoformat()
             }
             
@@ -2964,9 +3151,35 @@ class AnomalyPatternDetectionProtocol:
             return [f for f in os.listdir(scanners_dir) if f.endswith('.py')]
         return []
     
+    @staticmethod
+    def _get_result_store(anomaly_detect_path):
+        """获取扫描结果存储 (scanners/results/scan_results.db), 无法导入或打开时返回None"""
+        if not os.path.isdir(os.path.join(anomaly_detect_path, "scanners")):
+            return None
+        
+        try:
+            import sys
+            if anomaly_detect_path not in sys.path:
+                sys.path.insert(0, anomaly_detect_path)
+            from scan_result_store import get_result_store
+            return get_result_store(os.path.join(anomaly_detect_path, "scanners", "results"))
+        except Exception as e:
+            print(f"⚠️ 无法打开扫描结果存储，使用结果文件: {str(e)}")
+            return None
+    
     @staticmethod
     def _parse_scan_results(anomaly_detect_path, service):
         """解析扫描结果"""
+        # 优先从结果存储按服务索引读取最新结果
+        store = AnomalyPatternDetectionProtocol._get_result_store(anomaly_detect_path)
+        if store is not None:
+            try:
+                scan_data = store.latest(service)
+            except Exception as e:
+                return {"error": f"读取扫描结果失败: {str(e)}"}
+            if scan_data is not None:
+                return AnomalyPatternDetectionProtocol._normalize_scan_data(scan_data, service)
+        
         # 查找最新的扫描结果文件 - 从scanners/results目录
         results_dir = os.path.join(anomaly_detect_path, "scanners", "results")
         if not os.path.exists(results_dir):
@@ -2998,28 +3211,32 @@ class AnomalyPatternDetectionProtocol:
         try:
             with open(latest_path, 'r', encoding='utf-8') as f:
                 scan_data = json.load(f)
-                
-                # 转换新格式的扫描结果为标准格式
-                if isinstance(scan_data, dict):
-                    # 新格式的扫描器返回的是完整的扫描结果
-                    return {
-                        "scan_info": {
-                            "service_name": scan_data.get("service_name", service),
-                            "pattern_id": scan_data.get("pattern_id", "unknown"),
-                            "scan_start_time": scan_data.get("scan_start_time"),
-                            "scan_end_time": scan_data.get("scan_end_time")
-                        },
-                        "anomaly_analysis": scan_data.get("results", {}).get("anomaly_analysis", {}),
-                        "summary": scan_data.get("summary", {}),
-                        "results": scan_data.get("results", {}),
-                        "pattern_statistics": scan_data.get("pattern_statistics", {})
-                    }
-                else:
-                    return scan_data
+            
+            return AnomalyPatternDetectionProtocol._normalize_scan_data(scan_data, service)
                     
         except Exception as e:
             return {"error": f"解析扫描结果失败: {str(e)}"}
     
+    @staticmethod
+    def _normalize_scan_data(scan_data, service):
+        """转换新格式的扫描结果为标准格式"""
+        if isinstance(scan_data, dict):
+            # 新格式的扫描器返回的是完整的扫描结果
+            return {
+                "scan_info": {
+                    "service_name": scan_data.get("service_name", service),
+                    "pattern_id": scan_data.get("pattern_id", "unknown"),
+                    "scan_start_time": scan_data.get("scan_start_time"),
+                    "scan_end_time": scan_data.get("scan_end_time")
+                },
+                "anomaly_analysis": scan_data.get("results", {}).get("anomaly_analysis", {}),
+                "summary": scan_data.get("summary", {}),
+                "results": scan_data.get("results", {}),
+                "pattern_statistics": scan_data.get("pattern_statistics", {})
+            }
+        else:
+            return scan_data
+    
     @staticmethod
     def _analyze_scan_anomalies(scan_results):
         """分析扫描结果中的异常"""
@@ -3031,103 +3248,21 @@ class AnomalyPatternDetectionProtocol:
                 "total_anomalies": 0
             }
         
-        anomalies = []
-        severity_score = 0
-        
-        # 分析新格式的扫描结果
-        if isinstance(scan_results, dict):
-            # 检查异常分析结果
-            if "anomaly_analysis" in scan_results:
-                anomaly_analysis = scan_results["anomaly_analysis"]
-                severity_score = anomaly_analysis.get("severity_score", 0)
-                total_anomalies = anomaly_analysis.get("total_anomalies", 0)
-                
-                # 处理异常列表
-                anomaly_list = anomaly_analysis.get("anomalies", [])
-                for anomaly in anomaly_list:
-                    anomaly_type = anomaly.get("type", "未知异常")
-                    severity = anomaly.get("severity", "medium")
-                    
-                    # 转换严重程度为数值
-                    severity_value = {
-                        "critical": 10,
-                        "high": 8,
-                        "medium": 5,
-                        "low": 2
-                    }.get(severity, 5)
-                    
-                    anomalies.append({
-                        "type": anomaly_type,
-                        "details": anomaly,
-                        "severity": severity_value,
-                        "description": anomaly.get("description", "未知异常")
-                    })
-            
-            # 检查摘要信息
-            elif "summary" in scan_results:
-                summary = scan_results["summary"]
-                severity_score = summary.get("severity_score", 0)
-                total_anomalies = summary.get("total_anomalies", 0)
-                
-                # 如果摘要中有异常信息
-                if total_anomalies > 0:
-                    anomalies.append({
-                        "type": "综合异常",
-                        "details": summary,
-                        "severity": min(severity_score, 10),
-                        "description": f"检测到 {total_anomalies} 个异常"
-                    })
-            
-            # 检查结果中的异常
-            elif "results" in scan_results:
-                results = scan_results["results"]
-                
-                # 检查系统指标异常
-                if "system_metrics" in results:
-                    system_metrics = results["system_metrics"]
-                    if system_metrics.get("status") != "normal":
-                        system_anomalies = system_metrics.get("anomalies", [])
-                        for anomaly in system_anomalies:
-                            anomalies.append({
-                                "type": "系统指标异常",
-                                "details": anomaly,
-                                "severity": 5,
-                                "description": anomaly.get("description", "系统指标异常")
-                            })
-                        severity_score = max(severity_score, 5)
-                
-                # 检查进程指标异常
-                if "process_metrics" in results:
-                    process_metrics = results["process_metrics"]
-                    if process_metrics.get("status") != "normal":
-                        process_anomalies = process_metrics.get("anomalies", [])
-                        for anomaly in process_anomalies:
-                            anomalies.append({
-                                "type": "进程异常",
-                                "details": anomaly,
-                                "severity": 6,
-                                "description": anomaly.get("description", "进程异常")
-                            })
-                        severity_score = max(severity_score, 6)
-                
-                # 检查日志异常
-                if "log_anomalies" in results:
-                    log_anomalies = results["log_anomalies"]
-                    if log_anomalies.get("status") != "normal":
-                        log_anomaly_list = log_anomalies.get("anomalies", [])
-                        for anomaly in log_anomaly_list:
-                            anomalies.append({
-                                "type": "日志异常",
-                                "details": anomaly,
-                                "severity": 7,
-                                "description": anomaly.get("description", "日志异常")
-                            })
-                        severity_score = max(severity_score, 7)
+        service = scan_results.get("scan_info", {}).get("service_name") if isinstance(scan_results, dict) else None
+        severity_score, anomalies = normalize_scan_anomalies(service, scan_results)
         
         return {
             "severity_score": severity_score,
             "severity_level": AnomalyPatternDetectionProtocol._get_severity_description(severity_score),
-            "anomalies": anomalies,
+            "anomalies": [
+                {
+                    "type": anomaly.type,
+                    "details": anomaly.details,
+                    "severity": anomaly.severity,
+                    "description": anomaly.description
+                }
+                for anomaly in anomalies
+            ],
             "total_anomalies": len(anomalies)
         }
     
@@ -3146,8 +3281,12 @@ class AnomalyPatternDetectionProtocol:
             return "危急异常"
     
     @staticmethod
-    def _execute_all_scanners(anomaly_detect_path):
-        """执行所有生成的扫描器"""
+    def _execute_all_scanners(anomaly_detect_path, max_workers=None, timeout=None):
+        """
+        并发执行所有生成的扫描器
+        :param max_workers: 并发执行的扫描器数量上限, 默认SCANNER_MAX_WORKERS
+        :param timeout: 单个扫描器的超时时间(秒), 默认SCANNER_TIMEOUT
+        """
         scan_results = {}
         scanners_dir = os.path.join(anomaly_detect_path, "scanners")
         
@@ -3155,57 +3294,156 @@ class AnomalyPatternDetectionProtocol:
             return scan_results
         
         # 获取所有扫描器文件
-        scanner_files = [f for f in os.listdir(scanners_dir) if f.endswith('.py') and f.startswith('scan_')]
+        scanner_files = sorted(f for f in os.listdir(scanners_dir) if f.endswith('.py') and f.startswith('scan_'))
+        if not scanner_files:
+            return scan_results
         
-        print(f"🔍 发现 {len(scanner_files)} 个扫描器，开始执行...")
+        max_workers = max_workers or AnomalyPatternDetectionProtocol.SCANNER_MAX_WORKERS
+        timeout = timeout or AnomalyPatternDetectionProtocol.SCANNER_TIMEOUT
         
-        for scanner_file in scanner_files:
-            try:
-                # 提取服务名称
-                service_name = scanner_file[5:-3]  # 去掉 'scan_' 前缀和 '.py' 后缀
-                
-                print(f"🔍 执行扫描器: {scanner_file}")
-                
-                # 切换到扫描器目录
-                original_dir = os.getcwd()
-                os.chdir(scanners_dir)
-                
-                # 执行扫描器
-                result = subprocess.run(
-                    ["python3", scanner_file],
-                    capture_output=True,
-                    text=True,
-                    timeout=120  # 2分钟超时
-                )
-                
-                # 恢复工作目录
-                os.chdir(original_dir)
-                
-                # 等待一小段时间确保文件写入完成
-                import time
-                time.sleep(2)
-                
-                # 解析扫描结果
-                scan_data = AnomalyPatternDetectionProtocol._parse_scan_results(anomaly_detect_path, service_name)
-                
-                scan_results[service_name] = {
-                    "scanner_file": scanner_file,
-                    "execution_status": "success" if result.returncode == 0 else "failed",
-                    "return_code": result.returncode,
-                    "scan_data": scan_data,
-                    "raw_output": result.stdout[-500:] if result.stdout else "",
-                    "error": result.stderr[-200:] if result.stderr else ""
+        # 优先在当前进程内运行常驻的扫描器实例, 不可用时回退到子进程执行
+        registry = AnomalyPatternDetectionProtocol._get_scanner_registry(anomaly_detect_path)
+        
+        print(f"🔍 发现 {len(scanner_files)} 个扫描器，开始并发执行 (并发数: {max_workers})...")
+        
+        executor = ThreadPoolExecutor(max_workers=min(max_workers, len(scanner_files)))
+        try:
+            if registry is not None:
+                futures = {
+                    scanner_file: executor.submit(
+                        AnomalyPatternDetectionProtocol._run_scanner_in_process,
+                        registry, scanner_file
+                    )
+                    for scanner_file in scanner_files
                 }
-                
-            except Exception as e:
-                scan_results[service_name] = {
-                    "scanner_file": scanner_file,
-                    "execution_status": "error",
-                    "error": str(e)
+            else:
+                futures = {
+                    scanner_file: executor.submit(
+                        AnomalyPatternDetectionProtocol._run_scanner_process,
+                        anomaly_detect_path, scanner_file, timeout
+                    )
+                    for scanner_file in scanner_files
                 }
+            
+            # 按扫描器文件名顺序收集结果, 保证输出稳定
+            for scanner_file, future in futures.items():
+                service_name = scanner_file[5:-3]  # 去掉 'scan_' 前缀和 '.py' 后缀
+                try:
+                    scan_results[service_name] = future.result(timeout=timeout)
+                except FuturesTimeoutError:
+                    scan_results[service_name] = {
+                        "scanner_file": scanner_file,
+                        "execution_status": "timeout",
+                        "error": f"扫描器执行超时（超过{timeout}秒）"
+                    }
+                except Exception as e:
+                    scan_results[service_name] = {
+                        "scanner_file": scanner_file,
+                        "execution_status": "error",
+                        "error": str(e)
+                    }
+        finally:
+            # 不等待超时仍未结束的扫描器
+            executor.shutdown(wait=False, cancel_futures=True)
         
         return scan_results
     
+    @staticmethod
+    def _get_scanner_registry(anomaly_detect_path):
+        """获取异常模式检测系统的扫描器注册表, 无法导入时返回None"""
+        if not AnomalyPatternDetectionProtocol.SCANNER_IN_PROCESS:
+            return None
+        
+        try:
+            import sys
+            if anomaly_detect_path not in sys.path:
+                sys.path.insert(0, anomaly_detect_path)
+            from scanner_registry import get_registry
+        except ImportError as e:
+            print(f"⚠️ 无法导入扫描器注册表，使用子进程执行扫描器: {str(e)}")
+            return None
+        
+        return get_registry(os.path.join(anomaly_detect_path, "scanners"))
+    
+    @staticmethod
+    def _run_scanner_in_process(registry, scanner_file):
+        """在当前进程内运行常驻的扫描器实例"""
+        service_name = scanner_file[5:-3]
+        
+        print(f"🔍 执行扫描器: {scanner_file}")
+        
+        try:
+            scan_data = registry.run_scan(scanner_file)
+        except Exception as e:
+            return {
+                "scanner_file": scanner_file,
+                "execution_status": "failed",
+                "return_code": 1,
+                "scan_data": {},
+                "raw_output": "",
+                "error": str(e)[-200:]
+            }
+        
+        return {
+            "scanner_file": scanner_file,
+            "execution_status": "success",
+            "return_code": 0,
+            "scan_data": AnomalyPatternDetectionProtocol._normalize_scan_data(scan_data, service_name),
+            "raw_output": "",
+            "error": ""
+        }
+    
+    @staticmethod
+    def _run_scanner_process(anomaly_detect_path, scanner_file, timeout):
+        """
+        在子进程中执行单个扫描器, 从其标准输出读取扫描结果
+        通过cwd参数指定工作目录, 不修改当前进程的工作目录
+        """
+        scanners_dir = os.path.join(anomaly_detect_path, "scanners")
+        service_name = scanner_file[5:-3]
+        
+        print(f"🔍 执行扫描器: {scanner_file}")
+        
+        try:
+            result = subprocess.run(
+                ["python3", scanner_file],
+                cwd=scanners_dir,
+                capture_output=True,
+                text=True,
+                timeout=timeout
+            )
+        except subprocess.TimeoutExpired:
+            return {
+                "scanner_file": scanner_file,
+                "execution_status": "timeout",
+                "error": f"扫描器执行超时（超过{timeout}秒）"
+            }
+        
+        # 扫描器先在标准输出打印完整的JSON结果, 无法解析时再回退到结果文件
+        scan_data = AnomalyPatternDetectionProtocol._parse_scanner_output(result.stdout, service_name)
+        if scan_data is None:
+            scan_data = AnomalyPatternDetectionProtocol._parse_scan_results(anomaly_detect_path, service_name)
+        
+        return {
+            "scanner_file": scanner_file,
+            "execution_status": "success" if result.returncode == 0 else "failed",
+            "return_code": result.returncode,
+            "scan_data": scan_data,
+            "raw_output": result.stdout[-500:] if result.stdout else "",
+            "error": result.stderr[-200:] if result.stderr else ""
+        }
+    
+    @staticmethod
+    def _parse_scanner_output(stdout, service):
+        """从扫描器标准输出开头解析JSON扫描结果, 解析失败返回None"""
+        if not stdout:
+            return None
+        try:
+            scan_data, _ = json.JSONDecoder().raw_decode(stdout.lstrip())
+        except ValueError:
+            return None
+        return AnomalyPatternDetectionProtocol._normalize_scan_data(scan_data, service)
+    
     @staticmethod
     def _calculate_risk_probability(scan_results):
         """计算机器存在风险的概率"""
@@ -3222,41 +3460,22 @@ class AnomalyPatternDetectionProtocol:
                 "risk_analysis": "无扫描数据，无法评估风险"
             }
         
-        # 计算模式匹配度 (40% 权重)
-        pattern_match_score = 0
-        total_anomalies = 0
-        total_scanners = len(scan_results)
-        
-        for service, result in scan_results.items():
-            if result.get("execution_status") == "success":
-                scan_data = result.get("scan_data", {})
-                if isinstance(scan_data, dict) and "anomaly_analysis" in scan_data:
-                    anomaly_analysis = scan_data["anomaly_analysis"]
-                    severity_score = anomaly_analysis.get("severity_score", 0)
-                    total_anomalies += anomaly_analysis.get("total_anomalies", 0)
-                    
-                    # 根据严重程度计算匹配度
-                    if severity_score > 0:
-                        pattern_match_score += severity_score / 10.0  # 转换为0-1范围
+        # 一次规范化扫描结果, 以下各项分析共用风险表的汇总值
+        table = ScanRiskTable(scan_results)
+        total_scanners = table.total_services
+        total_anomalies = table.total_anomalies
         
-        # 计算平均模式匹配度
-        if total_scanners > 0:
-            pattern_match_score = (pattern_match_score / total_scanners) * 100
+        # 计算模式匹配度 (40% 权重) - 各服务严重程度(转换为0-1范围)的平均值
+        pattern_match_score = (table.pattern_match_sum / total_scanners) * 100 if total_scanners > 0 else 0
         
         # 计算历史频率 (30% 权重) - 基于异常数量
         historical_frequency = min(total_anomalies * 10, 100)  # 每个异常10%概率，最大100%
         
         # 计算服务重要性 (20% 权重) - 基于关键服务数量
-        critical_services = ["mysql", "nginx", "system", "loki"]
-        service_importance = 0
-        for service in critical_services:
-            if service in scan_results:
-                service_importance += 25  # 每个关键服务25%重要性
-        service_importance = min(service_importance, 100)
+        service_importance = min(sum(25 for service in CRITICAL_SERVICES if service in scan_results), 100)  # 每个关键服务25%重要性
         
         # 计算环境因素 (10% 权重) - 基于扫描成功率
-        successful_scans = sum(1 for r in scan_results.values() if r.get("execution_status") == "success")
-        environmental_factors = (successful_scans / total_scanners) * 100 if total_scanners > 0 else 0
+        environmental_factors = table.success_rate
         
         # 计算综合风险概率
         risk_probability = (
@@ -3288,13 +3507,13 @@ class AnomalyPatternDetectionProtocol:
                 "environmental_factors": round(environmental_factors, 2)
             },
             "risk_analysis": f"基于{total_scanners}个服务的扫描结果，发现{total_anomalies}个异常，综合评估机器存在{risk_level}",
-            "monitoring_suggestions": AnomalyPatternDetectionProtocol._generate_monitoring_suggestions(risk_probability, scan_results),
-            "service_analysis": AnomalyPatternDetectionProtocol._generate_service_analysis(scan_results),
-            "overall_summary": AnomalyPatternDetectionProtocol._generate_overall_summary(scan_results, risk_probability, risk_level)
+            "monitoring_suggestions": AnomalyPatternDetectionProtocol._generate_monitoring_suggestions(risk_probability, table),
+            "service_analysis": AnomalyPatternDetectionProtocol._generate_service_analysis(table),
+            "overall_summary": AnomalyPatternDetectionProtocol._generate_overall_summary(table, risk_probability, risk_level)
         }
     
     @staticmethod
-    def _generate_monitoring_suggestions(risk_probability, scan_results):
+    def _generate_monitoring_suggestions(risk_probability, table):
         """生成监控建议"""
         suggestions = []
         
@@ -3330,159 +3549,68 @@ class AnomalyPatternDetectionProtocol:
             ])
         
         # 添加具体服务建议
-        critical_services = []
-        for service, result in scan_results.items():
-            if result.get("execution_status") == "success":
-                scan_data = result.get("scan_data", {})
-                if isinstance(scan_data, dict) and "anomaly_analysis" in scan_data:
-                    anomaly_analysis = scan_data["anomaly_analysis"]
-                    if anomaly_analysis.get("severity_score", 0) > 5:
-                        critical_services.append(service)
-        
+        critical_services = [row.service for row in table.analyzed_services if row.severity_score > 5]
         if critical_services:
             suggestions.append(f"重点关注服务: {', '.join(critical_services)}")
         
         return suggestions
     
     @staticmethod
-    def _generate_service_analysis(scan_results):
+    def _generate_service_analysis(table):
         """生成各服务的详细分析"""
         service_analysis = {}
         
-        for service, result in scan_results.items():
+        for row in table.services:
             service_info = {
-                "service_name": service,
-                "execution_status": result.get("execution_status", "unknown"),
-                "status": "未知",
+                "service_name": row.service,
+                "execution_status": row.execution_status,
+                "status": table.status_by_service[row.service],
                 "anomaly_types": [],
-                "severity_score": 0,
+                "severity_score": row.severity_score,
                 "risk_points": [],
                 "optimization_suggestions": []
             }
             
-            if result.get("execution_status") == "success":
-                scan_data = result.get("scan_data", {})
-                
-                if isinstance(scan_data, dict) and "anomaly_analysis" in scan_data:
-                    anomaly_analysis = scan_data["anomaly_analysis"]
-                    severity_score = anomaly_analysis.get("severity_score", 0)
-                    total_anomalies = anomaly_analysis.get("total_anomalies", 0)
-                    
-                    service_info["severity_score"] = severity_score
-                    
-                    # 确定服务状态
-                    if severity_score == 0:
-                        service_info["status"] = "正常"
-                    elif severity_score <= 3:
-                        service_info["status"] = "轻微异常"
-                    elif severity_score <= 6:
-                        service_info["status"] = "异常"
-                    else:
-                        service_info["status"] = "严重异常"
-                    
-                    # 分析异常类型
-                    anomalies = anomaly_analysis.get("anomalies", [])
-                    for anomaly in anomalies:
-                        anomaly_type = anomaly.get("type", "未知异常")
-                        service_info["anomaly_types"].append(anomaly_type)
-                        
-                        # 根据异常类型生成风险点
-                        if "进程" in anomaly_type:
-                            service_info["risk_points"].append("进程运行异常，可能存在资源竞争或死锁")
-                        elif "系统指标" in anomaly_type:
-                            service_info["risk_points"].append("系统资源使用异常，可能存在性能瓶颈")
-                        elif "日志" in anomaly_type:
-                            service_info["risk_points"].append("日志异常，可能存在配置错误或服务故障")
+            if row.has_analysis:
+                # 分析异常类型, 根据异常类型生成风险点
+                for anomaly in table.anomalies_by_service[row.service]:
+                    service_info["anomaly_types"].append(anomaly.type)
                     
-                    # 生成优化建议
-                    if severity_score > 0:
-                        if "mysql" in service.lower():
-                            service_info["optimization_suggestions"].extend([
-                                "检查MySQL连接池配置",
-                                "优化慢查询",
-                                "检查数据库索引使用情况"
-                            ])
-                        elif "nginx" in service.lower():
-                            service_info["optimization_suggestions"].extend([
-                                "检查Nginx配置文件",
-                                "优化worker进程数",
-                                "检查访问日志和错误日志"
-                            ])
-                        elif "system" in service.lower():
-                            service_info["optimization_suggestions"].extend([
-                                "检查系统资源使用情况",
-                                "优化系统参数配置",
-                                "清理临时文件和日志"
-                            ])
-                        elif "loki" in service.lower():
-                            service_info["optimization_suggestions"].extend([
-                                "检查Loki存储配置",
-                                "优化日志收集性能",
-                                "检查Promtail配置"
-                            ])
-                        else:
-                            service_info["optimization_suggestions"].append("检查服务配置和运行状态")
-                else:
-                    service_info["status"] = "扫描失败"
-                    service_info["risk_points"].append("无法获取扫描数据")
+                    if "进程" in anomaly.type:
+                        service_info["risk_points"].append("进程运行异常，可能存在资源竞争或死锁")
+                    elif "系统指标" in anomaly.type:
+                        service_info["risk_points"].append("系统资源使用异常，可能存在性能瓶颈")
+                    elif "日志" in anomaly.type:
+                        service_info["risk_points"].append("日志异常，可能存在配置错误或服务故障")
+                
+                # 生成优化建议
+                if row.severity_score > 0:
+                    service_name = row.service.lower()
+                    suggestions = next(
+                        (items for keyword, items in AnomalyPatternDetectionProtocol.SERVICE_OPTIMIZATION_SUGGESTIONS
+                         if keyword in service_name),
+                        ["检查服务配置和运行状态"]
+                    )
+                    service_info["optimization_suggestions"].extend(suggestions)
+            elif row.execution_status == "success":
+                service_info["risk_points"].append("无法获取扫描数据")
             else:
-                service_info["status"] = "执行失败"
-                service_info["risk_points"].append(f"扫描器执行失败: {result.get('error', '未知错误')}")
+                service_info["risk_points"].append(f"扫描器执行失败: {row.error}")
             
-            service_analysis[service] = service_info
+            service_analysis[row.service] = service_info
         
         return service_analysis
     
     @staticmethod
-    def _generate_overall_summary(scan_results, risk_probability, risk_level):
+    def _generate_overall_summary(table, risk_probability, risk_level):
         """生成总体情况摘要"""
-        total_services = len(scan_results)
-        successful_scans = sum(1 for r in scan_results.values() if r.get("execution_status") == "success")
-        success_rate = (successful_scans / total_services) * 100 if total_services > 0 else 0
-        
-        # 统计各状态的服务数量
-        status_counts = {"正常": 0, "轻微异常": 0, "异常": 0, "严重异常": 0, "执行失败": 0}
-        critical_services_status = {}
-        
-        for service, result in scan_results.items():
-            if result.get("execution_status") == "success":
-                scan_data = result.get("scan_data", {})
-                if isinstance(scan_data, dict) and "anomaly_analysis" in scan_data:
-                    anomaly_analysis = scan_data["anomaly_analysis"]
-                    severity_score = anomaly_analysis.get("severity_score", 0)
-                    
-                    if severity_score == 0:
-                        status_counts["正常"] += 1
-                    elif severity_score <= 3:
-                        status_counts["轻微异常"] += 1
-                    elif severity_score <= 6:
-                        status_counts["异常"] += 1
-                    else:
-                        status_counts["严重异常"] += 1
-                else:
-                    status_counts["执行失败"] += 1
-            else:
-                status_counts["执行失败"] += 1
-            
-            # 记录关键服务状态
-            if service in ["mysql", "nginx", "system", "loki"]:
-                if result.get("execution_status") == "success":
-                    scan_data = result.get("scan_data", {})
-                    if isinstance(scan_data, dict) and "anomaly_analysis" in scan_data:
-                        anomaly_analysis = scan_data["anomaly_analysis"]
-                        severity_score = anomaly_analysis.get("severity_score", 0)
-                        if severity_score == 0:
-                            critical_services_status[service] = "正常"
-                        elif severity_score <= 3:
-                            critical_services_status[service] = "轻微异常"
-                        elif severity_score <= 6:
-                            critical_services_status[service] = "异常"
-                        else:
-                            critical_services_status[service] = "严重异常"
-                    else:
-                        critical_services_status[service] = "扫描失败"
-                else:
-                    critical_services_status[service] = "执行失败"
+        status_counts = dict(table.status_counts)
+        
+        # 记录关键服务状态
+        critical_services_status = {
+            row.service: table.status_by_service[row.service]
+            for row in table.services if row.service in CRITICAL_SERVICES
+        }
         
         # 确定整体健康状态
         if status_counts["严重异常"] > 0:
@@ -3495,9 +3623,9 @@ class AnomalyPatternDetectionProtocol:
             overall_health = "正常"
         
         return {
-            "total_services": total_services,
-            "successful_scans": successful_scans,
-            "success_rate": round(success_rate, 2),
+            "total_services": table.total_services,
+            "successful_scans": table.successful_scans,
+            "success_rate": round(table.success_rate, 2),
             "overall_health": overall_health,
             "status_distribution": status_counts,
             "critical_services_status": critical_services_status,
@@ -3524,46 +3652,40 @@ class AnomalyPatternDetectionProtocol:
             medium_risk_services = []
             low_risk_services = []
             critical_issues = []
-            total_severity_score = 0
-            service_count = 0
-            
-            # 分析每个服务的风险情况
-            for service, result in scan_results.items():
-                if result.get("execution_status") == "success":
-                    scan_data = result.get("scan_data", {})
-                    if isinstance(scan_data, dict) and "anomaly_analysis" in scan_data:
-                        anomaly_analysis = scan_data["anomaly_analysis"]
-                        severity_score = anomaly_analysis.get("severity_score", 0)
-                        total_severity_score += severity_score
-                        service_count += 1
-                        
-                        # 根据严重程度分类服务（精简版）
-                        if severity_score >= 7:
-                            high_risk_services.append({
-                                "service": service,
-                                "severity_score": severity_score,
-                                "status": "严重异常"
-                            })
-                            critical_issues.append(f"{service}服务严重异常(评分{severity_score})")
-                        elif severity_score >= 4:
-                            medium_risk_services.append({
-                                "service": service,
-                                "severity_score": severity_score,
-                                "status": "异常"
-                            })
-                        else:
-                            low_risk_services.append({
-                                "service": service,
-                                "severity_score": severity_score,
-                                "status": "正常" if severity_score == 0 else "轻微异常"
-                            })
+            
+            # 一次规范化扫描结果, 按服务行分类风险
+            table = ScanRiskTable(scan_results)
+            for row in table.services:
+                service = row.service
+                severity_score = row.severity_score
+                if row.has_analysis:
+                    # 根据严重程度分类服务（精简版）
+                    if severity_score >= 7:
+                        high_risk_services.append({
+                            "service": service,
+                            "severity_score": severity_score,
+                            "status": "严重异常"
+                        })
+                        critical_issues.append(f"{service}服务严重异常(评分{severity_score})")
+                    elif severity_score >= 4:
+                        medium_risk_services.append({
+                            "service": service,
+                            "severity_score": severity_score,
+                            "status": "异常"
+                        })
                     else:
-                        critical_issues.append(f"{service}服务扫描数据异常，无法获取有效信息")
+                        low_risk_services.append({
+                            "service": service,
+                            "severity_score": severity_score,
+                            "status": "正常" if severity_score == 0 else "轻微异常"
+                        })
+                elif row.execution_status == "success":
+                    critical_issues.append(f"{service}服务扫描数据异常，无法获取有效信息")
                 else:
-                    critical_issues.append(f"{service}服务扫描失败：{result.get('error', '未知错误')}")
+                    critical_issues.append(f"{service}服务扫描失败：{row.error}")
             
             # 计算整体风险等级
-            avg_severity = total_severity_score / service_count if service_count > 0 else 0
+            avg_severity = table.severity_sum / table.analyzed_count if table.analyzed_count > 0 else 0
             
             if avg_severity >= 6 or len(high_risk_services) >= 2:
                 overall_risk_level = "高风险"
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+倒序日志读取模块
+从文件末尾按块倒序读取JSON行日志, 并维护持久化的稀疏 时间戳->偏移 索引,
+使按时间范围的查询只需读取所需的文件尾部或定位到对应区间
+"""
+
+import bisect
+import json
+import os
+from datetime import datetime
+
+# 倒序读取的块大小
+CHUNK_SIZE = 64 * 1024
+# 稀疏索引的采样间隔(字节)
+INDEX_STRIDE = 1024 * 1024
+# 索引文件后缀, 与日志文件存放在同一目录
+INDEX_SUFFIX = ".idx"
+
+
+def parse_timestamp(value):
+    """
+    将日志中的时间戳转换为Unix时间(秒)
+    支持ISO8601字符串(含Z/时区/纳秒)以及秒/毫秒/纳秒级数字
+    :return: 浮点秒数, 无法解析时返回None
+    """
+    if value is None or value == "":
+        return None
+
+    if isinstance(value, (int, float)):
+        number = float(value)
+    else:
+        text = str(value).strip()
+        try:
+            number = float(text)
+        except ValueError:
+            number = None
+
+        if number is None:
+            if text.endswith("Z"):
+                text = text[:-1] + "+00:00"
+            # datetime只支持微秒精度, 截断更长的小数部分
+            if "." in text:
+                head, _, rest = text.partition(".")
+                digits = len(rest) - len(rest.lstrip("0123456789"))
+                text = head + "." + rest[:min(digits, 6)] + rest[digits:]
+            try:
+                return datetime.fromisoformat(text).timestamp()
+            except ValueError:
+                return None
+
+    # 根据数量级判断单位
+    if number > 1e17:
+        return number / 1e9
+    if number > 1e14:
+        return number / 1e6
+    if number > 1e11:
+        return number / 1e3
+    return number
+
+
+def iter_lines_reversed(log_file_path, end_offset=None, chunk_size=CHUNK_SIZE):
+    """
+    从end_offset(默认文件末尾)开始倒序逐行读取文件
+    :yield: (行起始偏移, 行内容)
+    """
+    with open(log_file_path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell() if end_offset is None else min(end_offset, f.tell())
+        remainder = b""
+
+        while position > 0:
+            read_size = min(chunk_size, position)
+            position -= read_size
+            f.seek(position)
+            buffer = f.read(read_size) + remainder
+            lines = buffer.split(b"\n")
+            # 第一段可能是被块边界截断的行, 留给下一块拼接
+            remainder = lines[0]
+            line_end = position + len(buffer)
+            for line in reversed(lines[1:]):
+                line_end -= len(line) + 1
+                if line.strip():
+                    yield line_end + 1, line.decode('utf-8', errors='replace')
+
+        if remainder.strip():
+            yield 0, remainder.decode('utf-8', errors='replace')
+
+
+class TimestampOffsetIndex:
+    """
+    稀疏的 时间戳->偏移 索引
+    每隔INDEX_STRIDE字节记录一行的起始偏移和时间戳, 以JSON格式保存在日志文件旁,
+    文件追加时增量扩展, 文件轮转或截断时重建
+    """
+
+    def __init__(self, log_file_path, timestamp_of, stride=INDEX_STRIDE):
+        """
+        :param log_file_path: 日志文件路径
+        :param timestamp_of: 从一行内容中取出Unix时间戳的函数, 无法解析时返回None
+        :param stride: 采样间隔(字节)
+        """
+        self.log_file_path = log_file_path
+        self.index_path = log_file_path + INDEX_SUFFIX
+        self.timestamp_of = timestamp_of
+        self.stride = stride
+        self.inode = None
+        self.size = 0
+        self.timestamps = []
+        self.offsets = []
+        self._load()
+
+    def _load(self):
+        """加载已持久化的索引"""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("stride") != self.stride:
+                return
+            self.inode = data.get("inode")
+            self.size = data.get("size", 0)
+            entries = data.get("entries", [])
+            self.timestamps = [entry[0] for entry in entries]
+            self.offsets = [entry[1] for entry in entries]
+        except (OSError, ValueError, TypeError, IndexError):
+            self.inode = None
+            self.size = 0
+            self.timestamps = []
+            self.offsets = []
+
+    def _save(self):
+        """保存索引, 日志目录不可写时仅保留内存中的索引"""
+        data = {
+            "inode": self.inode,
+            "size": self.size,
+            "stride": self.stride,
+            "entries": [[ts, offset] for ts, offset in zip(self.timestamps, self.offsets)]
+        }
+        try:
+            temp_path = self.index_path + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(temp_path, self.index_path)
+        except OSError:
+            pass
+
+    def update(self):
+        """根据文件当前状态增量扩展或重建索引"""
+        stat = os.stat(self.log_file_path)
+        if stat.st_ino != self.inode or stat.st_size < self.size:
+            self.inode = stat.st_ino
+            self.size = 0
+            self.timestamps = []
+            self.offsets = []
+
+        if stat.st_size - self.size < self.stride and self.offsets:
+            return
+
+        next_boundary = self.offsets[-1] + self.stride if self.offsets else 0
+        changed = False
+        with open(self.log_file_path, 'rb') as f:
+            while next_boundary < stat.st_size:
+                f.seek(next_boundary)
+                if next_boundary > 0:
+                    # 跳过被采样点截断的行
+                    f.readline()
+                offset = f.tell()
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    break
+
+                timestamp = self.timestamp_of(line.decode('utf-8', errors='replace'))
+                if timestamp is not None and (not self.timestamps or timestamp >= self.timestamps[-1]):
+                    self.timestamps.append(timestamp)
+                    self.offsets.append(offset)
+                    changed = True
+                next_boundary = max(offset + len(line), next_boundary + self.stride)
+
+        self.size = stat.st_size
+        if changed:
+            self._save()
+
+    def end_offset_for(self, until):
+        """
+        返回读取until之前(含)日志所需的结束偏移
+        该偏移之后的采样行都晚于until, 无需读取
+        """
+        if until is None:
+            return None
+        position = bisect.bisect_right(self.timestamps, until)
+        if position >= len(self.offsets):
+            return None
+        return self.offsets[position]
+
+
+_indexes = {}
+
+
+def get_index(log_file_path, timestamp_of):
+    """获取某个日志文件的时间戳索引(进程内复用), 并更新到文件当前状态"""
+    key = os.path.abspath(log_file_path)
+    index = _indexes.get(key)
+    if index is None or index.timestamp_of is not timestamp_of:
+        index = TimestampOffsetIndex(log_file_path, timestamp_of)
+        _indexes[key] = index
+    index.update()
+    return index
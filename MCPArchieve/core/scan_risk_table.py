@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+扫描结果风险表
+将扫描器返回的嵌套扫描结果一次性规范化为 服务行 + 异常行 两张表,
+并在同一遍中计算各类风险分析共用的汇总值 (成功数、评分合计、异常总数、服务状态分布等)
+"""
+
+from collections import namedtuple
+
+# 异常严重程度对应的数值
+SEVERITY_VALUES = {"critical": 10, "high": 8, "medium": 5, "low": 2}
+
+# 按 results 中的检查项推断异常时使用的类型与数值
+RESULT_SECTIONS = (
+    ("system_metrics", "系统指标异常", 5),
+    ("process_metrics", "进程异常", 6),
+    ("log_anomalies", "日志异常", 7),
+)
+
+# 需重点关注的关键服务
+CRITICAL_SERVICES = ("mysql", "nginx", "system", "loki")
+
+# 一个服务的扫描结果: has_analysis 表示扫描成功且包含 anomaly_analysis
+ServiceRow = namedtuple("ServiceRow", [
+    "service", "execution_status", "has_analysis", "severity_score", "total_anomalies", "error"
+])
+
+# 一个异常: severity 为数值化的严重程度
+AnomalyRow = namedtuple("AnomalyRow", ["service", "type", "severity", "description", "details"])
+
+
+def score_status(severity_score):
+    """按严重程度评分划分服务状态"""
+    if severity_score == 0:
+        return "正常"
+    elif severity_score <= 3:
+        return "轻微异常"
+    elif severity_score <= 6:
+        return "异常"
+    return "严重异常"
+
+
+def normalize_scan_anomalies(service, scan_data):
+    """
+    将单个服务的扫描结果规范化为异常行
+    优先使用 anomaly_analysis, 其次 summary, 最后按 results 中各检查项推断
+    :return: (严重程度评分, 异常行列表)
+    """
+    anomalies = []
+    severity_score = 0
+    if not isinstance(scan_data, dict):
+        return severity_score, anomalies
+
+    if "anomaly_analysis" in scan_data:
+        anomaly_analysis = scan_data["anomaly_analysis"]
+        severity_score = anomaly_analysis.get("severity_score", 0)
+        for anomaly in anomaly_analysis.get("anomalies", []):
+            anomalies.append(AnomalyRow(
+                service,
+                anomaly.get("type", "未知异常"),
+                SEVERITY_VALUES.get(anomaly.get("severity", "medium"), 5),
+                anomaly.get("description", "未知异常"),
+                anomaly
+            ))
+
+    elif "summary" in scan_data:
+        summary = scan_data["summary"]
+        severity_score = summary.get("severity_score", 0)
+        total_anomalies = summary.get("total_anomalies", 0)
+        if total_anomalies > 0:
+            anomalies.append(AnomalyRow(
+                service, "综合异常", min(severity_score, 10), f"检测到 {total_anomalies} 个异常", summary
+            ))
+
+    elif "results" in scan_data:
+        results = scan_data["results"]
+        for section, anomaly_type, severity in RESULT_SECTIONS:
+            section_data = results.get(section)
+            if section_data is None or section_data.get("status") == "normal":
+                continue
+            for anomaly in section_data.get("anomalies", []):
+                anomalies.append(AnomalyRow(
+                    service, anomaly_type, severity, anomaly.get("description", anomaly_type), anomaly
+                ))
+            severity_score = max(severity_score, severity)
+
+    return severity_score, anomalies
+
+
+class ScanRiskTable:
+    """多个服务扫描结果的风险表
+
+    构造时遍历一次 {服务: 执行结果}, 生成服务行与异常行, 并同时累计
+    风险概率、服务分析、总体摘要和综合风险分析共用的汇总值
+    """
+
+    def __init__(self, scan_results):
+        self.services = []
+        self.anomalies = []
+        self.anomalies_by_service = {}
+
+        self.total_services = 0
+        self.successful_scans = 0
+        # 包含 anomaly_analysis 的服务数及其评分/异常数合计
+        self.analyzed_count = 0
+        self.severity_sum = 0
+        self.pattern_match_sum = 0.0
+        self.total_anomalies = 0
+
+        self.status_by_service = {}
+        self.status_counts = {"正常": 0, "轻微异常": 0, "异常": 0, "严重异常": 0, "执行失败": 0}
+
+        for service, result in (scan_results or {}).items():
+            self._add(service, result)
+
+    def _add(self, service, result):
+        """规范化一个服务的执行结果并更新汇总值"""
+        execution_status = result.get("execution_status", "unknown")
+        scan_data = result.get("scan_data", {})
+        has_analysis = (execution_status == "success" and isinstance(scan_data, dict)
+                        and "anomaly_analysis" in scan_data)
+
+        severity_score = 0
+        total_anomalies = 0
+        service_anomalies = []
+        if has_analysis:
+            severity_score, service_anomalies = normalize_scan_anomalies(service, scan_data)
+            total_anomalies = scan_data["anomaly_analysis"].get("total_anomalies", 0)
+
+        row = ServiceRow(service, execution_status, has_analysis, severity_score,
+                         total_anomalies, result.get("error", "未知错误"))
+        self.services.append(row)
+        self.anomalies.extend(service_anomalies)
+        self.anomalies_by_service[service] = service_anomalies
+
+        self.total_services += 1
+        if execution_status == "success":
+            self.successful_scans += 1
+
+        if has_analysis:
+            self.analyzed_count += 1
+            self.severity_sum += severity_score
+            self.total_anomalies += total_anomalies
+            if severity_score > 0:
+                self.pattern_match_sum += severity_score / 10.0
+            status = score_status(severity_score)
+            self.status_counts[status] += 1
+        else:
+            status = "扫描失败" if execution_status == "success" else "执行失败"
+            self.status_counts["执行失败"] += 1
+        self.status_by_service[service] = status
+
+    def __len__(self):
+        return self.total_services
+
+    @property
+    def analyzed_services(self):
+        """包含 anomaly_analysis 的服务行"""
+        return [row for row in self.services if row.has_analysis]
+
+    @property
+    def success_rate(self):
+        """扫描成功率 (百分比)"""
+        return (self.successful_scans / self.total_services) * 100 if self.total_services > 0 else 0
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试Mysqld Exporter指标日志的增量读取
+覆盖多行(格式化)JSON文档和逐行JSON两种日志格式
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.mcp_protocols import MysqldExporterProtocol
+
+DOCUMENT = {
+    "timestamp": "2024-03-01T11:22:33",
+    "tags": ["a", "b"],
+    "source": {"host": "db01"},
+    "metrics": [
+        {"metric": "mysql_up", "labels": {}, "value": 1},
+        {"metric": "mysql_global_status_threads_connected", "labels": {"instance": "db01"}, "value": 12}
+    ]
+}
+
+
+def _read(log_file):
+    return MysqldExporterProtocol._read_mysql_metrics_from_log(log_file)
+
+
+def test_multiline_document():
+    """格式化输出的单个JSON文档: 能单独解析的行(标量、数组、无metrics的对象)也必须保留"""
+    print("🧪 测试多行JSON文档...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        log_file = os.path.join(temp_dir, "mysqld_exporter_metrics.log")
+        with open(log_file, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(DOCUMENT, indent=2) + "\n")
+
+        metrics = _read(log_file)
+        assert metrics.get("mysql_up") == [{"labels": {}, "value": 1}], f"mysql_up解析错误: {metrics}"
+        assert metrics["mysql_global_status_threads_connected"][0]["value"] == 12
+
+        # 未变化时复用缓存结果, 多次读取结果一致
+        assert _read(log_file) == metrics
+
+        # 文件被覆盖为新文档时重新解析
+        document = dict(DOCUMENT, metrics=[{"metric": "mysql_up", "labels": {}, "value": 0}])
+        with open(log_file, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(document, indent=4))
+        metrics = _read(log_file)
+        assert metrics == {"mysql_up": [{"labels": {}, "value": 0}]}, f"覆盖后解析错误: {metrics}"
+
+    print("✅ 多行JSON文档解析正确")
+
+
+def test_json_lines():
+    """逐行JSON: 追加的行增量合并"""
+    print("🧪 测试逐行JSON...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        log_file = os.path.join(temp_dir, "mysqld_exporter_metrics.log")
+        with open(log_file, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(DOCUMENT) + "\n")
+        assert len(_read(log_file)["mysql_up"]) == 1
+
+        with open(log_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(DOCUMENT) + "\n")
+        metrics = _read(log_file)
+        assert len(metrics["mysql_up"]) == 2, f"期望2条，实际为{len(metrics['mysql_up'])}"
+
+    print("✅ 逐行JSON增量解析正确")
+
+
+if __name__ == "__main__":
+    test_multiline_document()
+    test_json_lines()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+扫描器规则引擎基准测试
+对比逐关键词匹配与生成的组合关键词正则在不同关键词数量下的单行日志分析耗时
+"""
+
+import importlib.util
+import logging
+import random
+import string
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from generate_scanner import ScannerGenerator
+
+
+def build_scanner(generator: ScannerGenerator, scanners_dir: Path, keywords):
+    """生成扫描器并导入, 替换为指定的关键词后重新编译规则"""
+    pattern = {
+        'service': 'bench',
+        'pattern_id': f'bench_{len(keywords)}',
+        'pattern_type': 'log_anomaly',
+        'top_keywords': [],
+        'error_count': 10,
+        'error_rate': 0.1
+    }
+    code = generator.generate_scanner_for_pattern(pattern)
+    module_path = scanners_dir / f"scan_bench_{len(keywords)}.py"
+    module_path.write_text(code, encoding='utf-8')
+
+    spec = importlib.util.spec_from_file_location(module_path.stem, module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    scanner = module.BenchScanner()
+    scanner.error_keywords = list(keywords)
+    scanner.keyword_pattern = generator._keyword_trie_pattern(keywords)
+    scanner._compile_rules()
+    return scanner
+
+
+def legacy_keyword_scan(lines, keywords) -> int:
+    """旧版实现: 每行对每个关键词各做一次小写转换和子串查找"""
+    matches = 0
+    for line in lines:
+        for keyword in keywords:
+            if keyword.lower() in line.lower():
+                matches += 1
+    return matches
+
+
+def main():
+    logging.disable(logging.INFO)
+    random.seed(42)
+
+    line_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    keyword_counts = [10, 100, 1000]
+
+    vocabulary = ['request', 'served', 'upstream', 'connection', 'client', 'query', 'ok', 'GET', '200']
+    lines = [
+        ' '.join(random.choice(vocabulary) for _ in range(12)) + (' error 502\n' if i % 50 == 0 else '\n')
+        for i in range(line_count)
+    ]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        log_path = temp_dir / "bench.log"
+        log_path.write_text(''.join(lines), encoding='utf-8')
+
+        generator = ScannerGenerator(output_dir=str(temp_dir), scanners_dir=str(temp_dir))
+
+        print(f"{'关键词数':>8} {'旧版(us/行)':>12} {'组合正则(us/行)':>16}")
+        for keyword_count in keyword_counts:
+            keywords = ['error', '502'] + [
+                ''.join(random.choices(string.ascii_lowercase, k=8)) for _ in range(keyword_count - 2)
+            ]
+            scanner = build_scanner(generator, temp_dir, keywords)
+            scanner.tail_lines = line_count
+
+            start = time.perf_counter()
+            legacy_keyword_scan(lines, keywords)
+            legacy_cost = (time.perf_counter() - start) / line_count * 1e6
+
+            start = time.perf_counter()
+            scanner._analyze_log_file(str(log_path))
+            compiled_cost = (time.perf_counter() - start) / line_count * 1e6
+
+            print(f"{keyword_count:>8} {legacy_cost:>12.2f} {compiled_cost:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,29 +4,31 @@
 实时采集模块 - 收集系统资源数据、服务进程状态
 """
 
-import psutil
 import time
 import json
-import csv
 import logging
-from datetime import datetime
 from typing import Dict, List, Optional, Any
 import os
 from pathlib import Path
 
+from host_sampler import get_sampler
+from process_snapshot import ProcessSnapshot, get_snapshot
+from metrics_store import open_metrics_stores
+
 
 class MetricsCollector:
     """系统指标采集器"""
     
-    def __init__(self, output_dir: str = "data", collect_interval: int = 30):
+    def __init__(self, output_dir: str = "data", collect_interval: int = 30,
+                 metrics_max_age: float = 5.0, retention_days: int = 30):
         """初始化指标采集器"""
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
         self.collect_interval = collect_interval
+        # 系统指标允许的最大时效(秒)
+        self.metrics_max_age = metrics_max_age
         
         # 输出文件
-        self.metrics_file = self.output_dir / "metrics.csv"
-        self.process_file = self.output_dir / "processes.csv"
         self.services_file = self.output_dir / "services.json"
         
         # 关键服务列表
@@ -39,121 +41,77 @@ class MetricsCollector:
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
         
-        # 初始化CSV文件
-        self._init_csv_files()
-    
-    def _init_csv_files(self):
-        """初始化CSV文件头"""
-        if not self.metrics_file.exists():
-            with open(self.metrics_file, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow([
-                    'timestamp', 'cpu_percent', 'memory_percent', 'memory_available',
-                    'disk_usage_percent', 'network_connections', 'process_count'
-                ])
-        
-        if not self.process_file.exists():
-            with open(self.process_file, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow([
-                    'timestamp', 'pid', 'name', 'cpu_percent', 'memory_percent',
-                    'memory_rss', 'status', 'connections'
-                ])
+        # 系统/进程指标写入按天分区的时序存储, 保留 retention_days 天
+        self.metrics_store, self.process_store = open_metrics_stores(self.output_dir, retention_days)
     
     def collect_system_metrics(self) -> Dict[str, Any]:
         """收集系统级别指标"""
         try:
-            # 基础系统指标
-            cpu_percent = psutil.cpu_percent(interval=1)
-            memory = psutil.virtual_memory()
-            disk = psutil.disk_usage('/')
-            net_connections = len(psutil.net_connections())
-            process_count = len(psutil.pids())
+            # 基础系统指标, 从共享采样器读取不超过metrics_max_age秒的样本
+            sample = get_sampler().latest(max_age=self.metrics_max_age)
             
             return {
-                'timestamp': datetime.now().isoformat(),
-                'cpu_percent': cpu_percent,
-                'memory_percent': memory.percent,
-                'memory_available': memory.available,
-                'disk_usage_percent': disk.percent,
-                'network_connections': net_connections,
-                'process_count': process_count
+                'timestamp': sample['timestamp'],
+                'cpu_percent': sample['cpu_percent'],
+                'memory_percent': sample['memory_percent'],
+                'memory_available': sample['memory_available'],
+                'disk_usage_percent': sample['disk_usage_percent'],
+                'network_connections': sample['network_connections'],
+                'process_count': sample['process_count']
             }
             
         except Exception as e:
             self.logger.error(f"采集系统指标失败: {e}")
             return {}
     
-    def collect_process_metrics(self) -> List[Dict[str, Any]]:
+    def collect_process_metrics(self, snapshot: Optional[ProcessSnapshot] = None) -> List[Dict[str, Any]]:
         """收集关键进程指标"""
-        process_metrics = []
+        if snapshot is None:
+            snapshot = get_snapshot(max_age=self.metrics_max_age)
         
-        for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
-            try:
-                proc_info = proc.info
-                proc_name = proc_info['name'].lower()
-                
-                # 检查是否为关键服务
-                if any(service in proc_name for service in self.key_services):
-                    proc_obj = psutil.Process(proc_info['pid'])
-                    
-                    # 获取连接数（安全处理）
-                    try:
-                        connections = len(proc_obj.connections())
-                    except (psutil.NoSuchProcess, psutil.AccessDenied):
-                        connections = 0
-                    
-                    # 获取内存信息
-                    try:
-                        memory_rss = proc_obj.memory_info().rss
-                    except (psutil.NoSuchProcess, psutil.AccessDenied):
-                        memory_rss = 0
-                    
-                    process_metrics.append({
-                        'timestamp': datetime.now().isoformat(),
-                        'pid': proc_info['pid'],
-                        'name': proc_info['name'],
-                        'cpu_percent': proc_info['cpu_percent'] or 0,
-                        'memory_percent': proc_info['memory_percent'] or 0,
-                        'memory_rss': memory_rss,
-                        'status': proc_obj.status(),
-                        'connections': connections
-                    })
-                    
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                continue
-            except Exception as e:
-                self.logger.warning(f"采集进程指标失败: {e}")
+        timestamp = snapshot.timestamp
+        process_metrics = []
+        try:
+            for proc_info in snapshot.match(self.key_services, with_connections=True):
+                process_metrics.append({
+                    'timestamp': timestamp,
+                    'pid': proc_info['pid'],
+                    'name': proc_info['name'],
+                    'cpu_percent': proc_info['cpu_percent'],
+                    'memory_percent': proc_info['memory_percent'],
+                    'memory_rss': proc_info['memory_rss'],
+                    'status': proc_info['status'],
+                    'connections': proc_info['connections']
+                })
+        except Exception as e:
+            self.logger.warning(f"采集进程指标失败: {e}")
         
         return process_metrics
     
-    def collect_service_details(self) -> Dict[str, Any]:
+    def collect_service_details(self, snapshot: Optional[ProcessSnapshot] = None) -> Dict[str, Any]:
         """收集服务详细信息"""
+        if snapshot is None:
+            snapshot = get_snapshot(max_age=self.metrics_max_age)
+        
         services_info = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': snapshot.timestamp,
             'services': {}
         }
         
-        for service_pattern in self.key_services:
-            service_processes = []
-            
-            for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-                try:
-                    proc_info = proc.info
-                    if service_pattern in proc_info['name'].lower():
-                        proc_obj = psutil.Process(proc_info['pid'])
-                        
-                        service_processes.append({
-                            'pid': proc_info['pid'],
-                            'name': proc_info['name'],
-                            'status': proc_obj.status(),
-                            'cpu_percent': proc_obj.cpu_percent(),
-                            'memory_percent': proc_obj.memory_percent(),
-                            'create_time': proc_obj.create_time()
-                        })
-                        
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    continue
+        # 一次匹配全部服务模式, 再按模式分组
+        groups = snapshot.group_by_pattern(self.key_services)
+        for service_pattern, matched in groups.items():
+            service_processes = [
+                {
+                    'pid': proc_info['pid'],
+                    'name': proc_info['name'],
+                    'status': proc_info['status'],
+                    'cpu_percent': proc_info['cpu_percent'],
+                    'memory_percent': proc_info['memory_percent'],
+                    'create_time': proc_info['create_time']
+                }
+                for proc_info in matched
+            ]
             
             if service_processes:
                 services_info['services'][service_pattern] = service_processes
@@ -165,33 +123,11 @@ class MetricsCollector:
         try:
             # 保存系统指标
             if system_metrics:
-                with open(self.metrics_file, 'a', newline='', encoding='utf-8') as f:
-                    writer = csv.writer(f)
-                    writer.writerow([
-                        system_metrics['timestamp'],
-                        system_metrics['cpu_percent'],
-                        system_metrics['memory_percent'],
-                        system_metrics['memory_available'],
-                        system_metrics['disk_usage_percent'],
-                        system_metrics['network_connections'],
-                        system_metrics['process_count']
-                    ])
+                self.metrics_store.append([system_metrics])
             
             # 保存进程指标
             if process_metrics:
-                with open(self.process_file, 'a', newline='', encoding='utf-8') as f:
-                    writer = csv.writer(f)
-                    for proc_metric in process_metrics:
-                        writer.writerow([
-                            proc_metric['timestamp'],
-                            proc_metric['pid'],
-                            proc_metric['name'],
-                            proc_metric['cpu_percent'],
-                            proc_metric['memory_percent'],
-                            proc_metric['memory_rss'],
-                            proc_metric['status'],
-                            proc_metric['connections']
-                        ])
+                self.process_store.append(process_metrics)
             
             self.logger.info(f"保存指标: 系统 {'✓' if system_metrics else '✗'}, 进程 {len(process_metrics)}个")
             
@@ -202,10 +138,11 @@ class MetricsCollector:
         """执行一次完整的数据采集"""
         self.logger.info("开始采集系统指标...")
         
-        # 采集各类指标
+        # 采集各类指标, 本周期只遍历一次进程表, 快照同时共享给进程内运行的扫描器
         system_metrics = self.collect_system_metrics()
-        process_metrics = self.collect_process_metrics()
-        services_info = self.collect_service_details()
+        snapshot = get_snapshot(max_age=0)
+        process_metrics = self.collect_process_metrics(snapshot)
+        services_info = self.collect_service_details(snapshot)
         
         # 保存数据
         self.save_metrics(system_metrics, process_metrics)
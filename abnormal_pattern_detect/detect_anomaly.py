@@ -8,12 +8,20 @@ import pandas as pd
 import numpy as np
 import json
 import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Tuple, Optional
 from pathlib import Path
 import warnings
 warnings.filterwarnings('ignore')
 
+from metrics_store import open_metrics_stores
+from online_detection import OnlineDetectorState, OnlineStreamState
+
 try:
     from pyod.models.iforest import IForest
     from pyod.models.lof import LOF
@@ -25,37 +33,65 @@ except ImportError as e:
     print("请运行: pip install pyod scikit-learn")
 
 
+def _fit_model(features: np.ndarray, model) -> Tuple[np.ndarray, np.ndarray]:
+    """训练模型并返回训练样本的 (异常标签, 异常分数)"""
+    anomaly_labels = model.fit_predict(features)
+    anomaly_scores = model.decision_function(features)
+    return anomaly_labels, anomaly_scores
+
+
+def _fit_shared_model(shm_name: str, shape: Tuple[int, int], dtype: str,
+                      start: int, stop: int, model) -> Tuple[np.ndarray, np.ndarray]:
+    """在工作进程中直接映射共享内存中的特征矩阵(不复制)并训练模型"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        features = np.ndarray(shape, dtype=dtype, buffer=shm.buf)[start:stop]
+        return _fit_model(features, model)
+    finally:
+        try:
+            shm.close()
+        except BufferError:
+            # 模型仍引用特征视图, 映射在其释放后自动关闭
+            pass
+
+
 class AnomalyDetector:
     """异常检测器"""
     
-    def __init__(self, output_dir: str = "data", contamination: float = 0.1):
+    def __init__(self, output_dir: str = "data", contamination: float = 0.1,
+                 retention_days: int = 30, n_jobs: int = 1):
         """
         初始化异常检测器
         
         Args:
             output_dir: 输出目录
             contamination: 异常比例估计（0.05-0.2）
+            retention_days: 指标时序存储的分区保留天数
+            n_jobs: 模型训练的并行进程数, 1 表示在当前进程顺序训练, -1 表示使用全部CPU
         """
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
         
         self.contamination = contamination
+        self.n_jobs = n_jobs
+        self._executor: Optional[ProcessPoolExecutor] = None
         
         # 输入文件
-        self.metrics_file = self.output_dir / "metrics.csv"
-        self.process_file = self.output_dir / "processes.csv"
+        self.metrics_store, self.process_store = open_metrics_stores(self.output_dir, retention_days)
         self.parsed_logs_file = self.output_dir / "parsed_logs.json"
         
         # 输出文件
         self.anomalies_file = self.output_dir / "anomalies.csv"
         self.anomaly_summary_file = self.output_dir / "anomaly_summary.json"
         
+        # 在线检测状态文件及重新训练策略
+        self.online_state_file = self.output_dir / "online_detector.pkl"
+        self.refit_interval_hours = 6
+        self.drift_threshold = 1.5
+        self.drift_min_samples = 30
+        
         # 模型配置
-        self.models = {
-            'isolation_forest': IForest(contamination=contamination, random_state=42),
-            'lof': LOF(contamination=contamination),
-            'knn': KNN(contamination=contamination)
-        }
+        self.models = self._create_system_models()
         
         # 特征列定义
         self.system_features = [
@@ -71,34 +107,105 @@ class AnomalyDetector:
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
     
+    def _create_system_models(self) -> Dict[str, Any]:
+        """创建系统级检测模型"""
+        return {
+            'isolation_forest': IForest(contamination=self.contamination, random_state=42),
+            'lof': LOF(contamination=self.contamination),
+            'knn': KNN(contamination=self.contamination)
+        }
+    
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        """获取模型训练进程池, n_jobs 为 1 时返回 None"""
+        if self.n_jobs == 1:
+            return None
+        if self._executor is None:
+            max_workers = os.cpu_count() if self.n_jobs <= 0 else self.n_jobs
+            self._executor = ProcessPoolExecutor(max_workers=max_workers)
+        return self._executor
+    
+    def close(self):
+        """关闭模型训练进程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+    
+    def _fit_models(self, jobs: List[Tuple[str, np.ndarray, Any]]) -> List[Any]:
+        """
+        训练一组模型, 返回与 jobs 顺序一致的 (labels, scores) 或训练时抛出的异常
+        
+        Args:
+            jobs: (名称, 特征矩阵, 未训练的模型) 列表, 特征矩阵的列数需一致
+        """
+        executor = self._get_executor()
+        if executor is None or len(jobs) < 2:
+            results = []
+            for _, features, model in jobs:
+                try:
+                    results.append(_fit_model(features, model))
+                except Exception as e:
+                    results.append(e)
+            return results
+        
+        # 每个不同的特征矩阵只复制一次到共享内存, 工作进程按行区间映射
+        ranges = {}
+        total_rows = 0
+        for _, features, _ in jobs:
+            if id(features) not in ranges:
+                ranges[id(features)] = (total_rows, total_rows + len(features))
+                total_rows += len(features)
+        shape = (total_rows, jobs[0][1].shape[1])
+        
+        shm = shared_memory.SharedMemory(create=True, size=max(total_rows * shape[1] * 8, 1))
+        try:
+            matrix = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+            for _, features, _ in jobs:
+                start, stop = ranges[id(features)]
+                matrix[start:stop] = features
+            del matrix
+            
+            futures = [
+                executor.submit(_fit_shared_model, shm.name, shape, np.dtype(np.float64).str,
+                                *ranges[id(features)], model)
+                for _, features, model in jobs
+            ]
+            
+            # 按提交顺序收集结果, 保证输出可复现
+            results = []
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except BrokenProcessPool as e:
+                    self._executor = None
+                    results.append(e)
+                except Exception as e:
+                    results.append(e)
+            return results
+        finally:
+            shm.close()
+            shm.unlink()
+    
     def load_metrics_data(self, hours_back: int = 24) -> Tuple[pd.DataFrame, pd.DataFrame]:
         """加载指标数据"""
         try:
+            # 只读取与时间窗口重叠的分区
+            cutoff_time = datetime.now() - timedelta(hours=hours_back) if hours_back > 0 else None
+            
             # 加载系统指标
-            if self.metrics_file.exists():
-                system_df = pd.read_csv(self.metrics_file)
-                system_df['timestamp'] = pd.to_datetime(system_df['timestamp'])
+            system_df = self.metrics_store.read(start=cutoff_time)
+            if not system_df.empty:
                 self.logger.info(f"加载系统指标: {len(system_df)} 条记录")
             else:
                 system_df = pd.DataFrame()
-                self.logger.warning("系统指标文件不存在")
+                self.logger.warning("系统指标数据不存在")
             
             # 加载进程指标
-            if self.process_file.exists():
-                process_df = pd.read_csv(self.process_file)
-                process_df['timestamp'] = pd.to_datetime(process_df['timestamp'])
+            process_df = self.process_store.read(start=cutoff_time)
+            if not process_df.empty:
                 self.logger.info(f"加载进程指标: {len(process_df)} 条记录")
             else:
                 process_df = pd.DataFrame()
-                self.logger.warning("进程指标文件不存在")
-            
-            # 过滤时间窗口
-            if hours_back > 0:
-                cutoff_time = datetime.now() - timedelta(hours=hours_back)
-                if not system_df.empty:
-                    system_df = system_df[system_df['timestamp'] > cutoff_time]
-                if not process_df.empty:
-                    process_df = process_df[process_df['timestamp'] > cutoff_time]
+                self.logger.warning("进程指标数据不存在")
             
             return system_df, process_df
             
@@ -142,31 +249,31 @@ class AnomalyDetector:
         features_by_service = {}
         feature_dfs_by_service = {}
         
-        # 按进程名分组
-        for process_name in df['name'].unique():
-            process_df = df[df['name'] == process_name].copy()
-            
-            if len(process_df) < 3:  # 数据点太少，跳过
-                continue
-            
-            # 选择特征列
-            feature_cols = [col for col in self.process_features if col in process_df.columns]
-            feature_df = process_df[feature_cols].copy()
-            
-            # 处理缺失值
-            feature_df = feature_df.fillna(feature_df.mean())
-            
-            # 添加派生特征
-            if len(feature_df) > 1:
-                feature_df['cpu_change'] = feature_df['cpu_percent'].diff().fillna(0)
-                feature_df['memory_change'] = feature_df['memory_percent'].diff().fillna(0)
-            
-            # 标准化
-            scaler = StandardScaler()
-            features_scaled = scaler.fit_transform(feature_df)
-            
-            features_by_service[process_name] = features_scaled
-            feature_dfs_by_service[process_name] = feature_df
+        # 选择特征列, 跳过数据点太少的进程
+        feature_cols = [col for col in self.process_features if col in df.columns]
+        df = df[df.groupby('name', sort=False)['name'].transform('size') >= 3]
+        if df.empty:
+            return {}, {}
+        names = df['name']
+        feature_df = df[feature_cols].astype(float)
+        
+        # 按进程名分组处理缺失值、派生特征和标准化, 所有进程一次完成
+        feature_df = feature_df.fillna(feature_df.groupby(names, sort=False).transform('mean'))
+        changes = feature_df.groupby(names, sort=False)[['cpu_percent', 'memory_percent']].diff().fillna(0)
+        feature_df['cpu_change'] = changes['cpu_percent']
+        feature_df['memory_change'] = changes['memory_percent']
+        
+        grouped = feature_df.groupby(names, sort=False)
+        std = grouped.transform('std', ddof=0)
+        scaled = (feature_df - grouped.transform('mean')) / std.where(std > 0, 1.0)
+        scaled_values = scaled.to_numpy()
+        
+        # 按进程名首次出现的顺序拆分
+        positions = grouped.indices
+        for process_name in names.unique():
+            rows = positions[process_name]
+            features_by_service[process_name] = scaled_values[rows]
+            feature_dfs_by_service[process_name] = feature_df.iloc[rows]
         
         return features_by_service, feature_dfs_by_service
     
@@ -188,67 +295,49 @@ class AnomalyDetector:
         # 使用多个模型检测异常
         all_anomaly_scores = {}
         
+        jobs = []
         for model_name, model in self.models.items():
-            try:
-                # 检查样本数量是否足够
-                if features.shape[0] < 2:
-                    self.logger.warning(f"样本数量不足，跳过 {model_name} 模型")
-                    continue
-                
-                # 对于需要邻居的模型，检查样本数量
-                if model_name in ['lof', 'knn'] and features.shape[0] < 5:
-                    self.logger.warning(f"样本数量不足，跳过 {model_name} 模型")
-                    continue
-                
-                # 训练模型并预测
-                anomaly_labels = model.fit_predict(features)
-                anomaly_scores = model.decision_function(features)
-                
-                # 找出异常点
-                anomaly_indices = np.where(anomaly_labels == 1)[0]
-                
-                all_anomaly_scores[model_name] = {
-                    'labels': anomaly_labels,
-                    'scores': anomaly_scores,
-                    'anomaly_count': len(anomaly_indices)
-                }
-                
-                anomaly_results['summary']['by_model'][model_name] = len(anomaly_indices)
-                
-                self.logger.info(f"{model_name} 检测到 {len(anomaly_indices)} 个系统异常")
-                
-            except Exception as e:
-                self.logger.error(f"模型 {model_name} 检测失败: {e}")
+            # 检查样本数量是否足够
+            if features.shape[0] < 2:
+                self.logger.warning(f"样本数量不足，跳过 {model_name} 模型")
+                continue
+            
+            # 对于需要邻居的模型，检查样本数量
+            if model_name in ['lof', 'knn'] and features.shape[0] < 5:
+                self.logger.warning(f"样本数量不足，跳过 {model_name} 模型")
+                continue
+            
+            jobs.append((model_name, features, model))
+        
+        # 训练模型并预测 (n_jobs 不为 1 时各模型在进程池中并行训练)
+        for (model_name, _, _), result in zip(jobs, self._fit_models(jobs)):
+            if isinstance(result, Exception):
+                self.logger.error(f"模型 {model_name} 检测失败: {result}")
                 continue
+            
+            anomaly_labels, anomaly_scores = result
+            
+            # 找出异常点
+            anomaly_indices = np.where(anomaly_labels == 1)[0]
+            
+            all_anomaly_scores[model_name] = {
+                'labels': anomaly_labels,
+                'scores': anomaly_scores,
+                'anomaly_count': len(anomaly_indices)
+            }
+            
+            anomaly_results['summary']['by_model'][model_name] = len(anomaly_indices)
+            
+            self.logger.info(f"{model_name} 检测到 {len(anomaly_indices)} 个系统异常")
         
         # 集成多个模型的结果（投票机制）
         if all_anomaly_scores:
             ensemble_anomalies = self._ensemble_anomaly_detection(all_anomaly_scores, features.shape[0])
             
             # 构建异常记录
-            for idx in ensemble_anomalies:
-                original_idx = system_df.index[idx]
-                # 将Timestamp转换为ISO格式字符串
-                timestamp = system_df.loc[original_idx, 'timestamp']
-                if hasattr(timestamp, 'isoformat'):
-                    timestamp_str = timestamp.isoformat()
-                else:
-                    timestamp_str = str(timestamp)
-                
-                anomaly_record = {
-                    'timestamp': timestamp_str,
-                    'type': 'system',
-                    'anomaly_index': int(idx),
-                    'metrics': {
-                        'cpu_percent': float(system_df.loc[original_idx, 'cpu_percent']),
-                        'memory_percent': float(system_df.loc[original_idx, 'memory_percent']),
-                        'disk_usage_percent': float(system_df.loc[original_idx, 'disk_usage_percent']),
-                        'network_connections': int(system_df.loc[original_idx, 'network_connections'])
-                    },
-                    'scores': {name: float(scores['scores'][idx]) for name, scores in all_anomaly_scores.items()},
-                    'severity': self._calculate_severity(all_anomaly_scores, idx)
-                }
-                anomaly_results['anomalies'].append(anomaly_record)
+            anomaly_results['anomalies'].extend(
+                self._build_system_anomaly_records(system_df, all_anomaly_scores, ensemble_anomalies)
+            )
             
             anomaly_results['summary']['total'] = len(ensemble_anomalies)
         
@@ -266,50 +355,33 @@ class AnomalyDetector:
             'summary': {'total': 0, 'by_service': {}}
         }
         
+        jobs = []
         for service_name, features in features_by_service.items():
-            service_df = process_df[process_df['name'] == service_name].copy()
+            # 检查样本数量是否足够
+            if features.shape[0] < 2:
+                self.logger.warning(f"服务 {service_name} 样本数量不足，跳过异常检测")
+                continue
             
+            # 使用Isolation Forest检测进程异常 (固定随机种子, 并行与顺序训练结果一致)
+            jobs.append((service_name, features, IForest(contamination=self.contamination, random_state=42)))
+        
+        for (service_name, _, _), result in zip(jobs, self._fit_models(jobs)):
             try:
-                # 检查样本数量是否足够
-                if features.shape[0] < 2:
-                    self.logger.warning(f"服务 {service_name} 样本数量不足，跳过异常检测")
-                    continue
-                
-                # 使用Isolation Forest检测进程异常
-                model = IForest(contamination=self.contamination, random_state=42)
-                anomaly_labels = model.fit_predict(features)
-                anomaly_scores = model.decision_function(features)
+                if isinstance(result, Exception):
+                    raise result
                 
+                anomaly_labels, anomaly_scores = result
                 anomaly_indices = np.where(anomaly_labels == 1)[0]
                 
                 anomaly_results['summary']['by_service'][service_name] = len(anomaly_indices)
                 
+                # 预处理时已按进程名分组, 直接按行索引取回该服务的原始数据
+                service_df = process_df.loc[feature_dfs_by_service[service_name].index]
+                
                 # 构建异常记录
-                for idx in anomaly_indices:
-                    original_idx = service_df.index[idx]
-                    # 将Timestamp转换为ISO格式字符串
-                    timestamp = service_df.loc[original_idx, 'timestamp']
-                    if hasattr(timestamp, 'isoformat'):
-                        timestamp_str = timestamp.isoformat()
-                    else:
-                        timestamp_str = str(timestamp)
-                    
-                    anomaly_record = {
-                        'timestamp': timestamp_str,
-                        'type': 'process',
-                        'service': service_name,
-                        'pid': int(service_df.loc[original_idx, 'pid']),
-                        'anomaly_index': int(idx),
-                        'metrics': {
-                            'cpu_percent': float(service_df.loc[original_idx, 'cpu_percent']),
-                            'memory_percent': float(service_df.loc[original_idx, 'memory_percent']),
-                            'memory_rss': int(service_df.loc[original_idx, 'memory_rss']),
-                            'connections': int(service_df.loc[original_idx, 'connections'])
-                        },
-                        'anomaly_score': float(anomaly_scores[idx]),
-                        'severity': 'high' if anomaly_scores[idx] < -0.5 else 'medium'
-                    }
-                    anomaly_results['anomalies'].append(anomaly_record)
+                anomaly_results['anomalies'].extend(
+                    self._build_process_anomaly_records(service_df, service_name, anomaly_scores, anomaly_indices)
+                )
                 
                 self.logger.info(f"{service_name} 检测到 {len(anomaly_indices)} 个进程异常")
                 
@@ -369,33 +441,94 @@ class AnomalyDetector:
         
         return log_anomalies
     
+    @staticmethod
+    def _timestamp_strings(timestamps: pd.Series) -> List[str]:
+        """将时间戳列转换为ISO格式字符串"""
+        return [timestamp.isoformat() if hasattr(timestamp, 'isoformat') else str(timestamp)
+                for timestamp in timestamps]
+    
+    def _build_system_anomaly_records(self, system_df: pd.DataFrame, model_results: Dict,
+                                      indices: List[int]) -> List[Dict[str, Any]]:
+        """构建系统异常记录 (按选中的行一次性取值, 不逐条定位)"""
+        indices = np.asarray(indices, dtype=int)
+        if len(indices) == 0:
+            return []
+        
+        selected = system_df.iloc[indices]
+        metrics = selected[['cpu_percent', 'memory_percent', 'disk_usage_percent']].astype(float)
+        metrics['network_connections'] = selected['network_connections'].astype(int)
+        
+        model_names = list(model_results.keys())
+        score_matrix = np.column_stack([model_results[name]['scores'] for name in model_names])[indices]
+        scores = pd.DataFrame(score_matrix.astype(float), columns=model_names).to_dict('records')
+        severities = self._calculate_severity(score_matrix)
+        
+        return [
+            {
+                'timestamp': timestamp,
+                'type': 'system',
+                'anomaly_index': idx,
+                'metrics': metric,
+                'scores': score,
+                'severity': severity
+            }
+            for timestamp, idx, metric, score, severity in zip(
+                self._timestamp_strings(selected['timestamp']), indices.tolist(),
+                metrics.to_dict('records'), scores, severities.tolist()
+            )
+        ]
+    
+    def _build_process_anomaly_records(self, service_df: pd.DataFrame, service_name: str,
+                                       anomaly_scores: np.ndarray, indices) -> List[Dict[str, Any]]:
+        """构建进程异常记录 (按选中的行一次性取值, 不逐条定位)"""
+        indices = np.asarray(indices, dtype=int)
+        if len(indices) == 0:
+            return []
+        
+        selected = service_df.iloc[indices]
+        metrics = selected[['cpu_percent', 'memory_percent']].astype(float)
+        metrics['memory_rss'] = selected['memory_rss'].astype(int)
+        metrics['connections'] = selected['connections'].astype(int)
+        
+        scores = np.asarray(anomaly_scores, dtype=float)[indices]
+        severities = np.where(scores < -0.5, 'high', 'medium')
+        
+        return [
+            {
+                'timestamp': timestamp,
+                'type': 'process',
+                'service': service_name,
+                'pid': pid,
+                'anomaly_index': idx,
+                'metrics': metric,
+                'anomaly_score': score,
+                'severity': severity
+            }
+            for timestamp, pid, idx, metric, score, severity in zip(
+                self._timestamp_strings(selected['timestamp']), selected['pid'].astype(int).tolist(),
+                indices.tolist(), metrics.to_dict('records'), scores.tolist(), severities.tolist()
+            )
+        ]
+    
     def _ensemble_anomaly_detection(self, model_results: Dict, total_samples: int) -> List[int]:
         """集成多个模型的异常检测结果"""
-        # 投票机制：至少两个模型认为是异常的点
-        anomaly_votes = np.zeros(total_samples)
-        
-        for model_name, results in model_results.items():
-            anomaly_indices = np.where(results['labels'] == 1)[0]
-            anomaly_votes[anomaly_indices] += 1
+        # 投票机制：各模型标签矩阵按行求和
+        label_matrix = np.column_stack([results['labels'] for results in model_results.values()])
+        anomaly_votes = (label_matrix[:total_samples] == 1).sum(axis=1)
         
         # 至少2个模型投票为异常
         ensemble_anomalies = np.where(anomaly_votes >= 2)[0]
         
         return ensemble_anomalies.tolist()
     
-    def _calculate_severity(self, model_results: Dict, anomaly_idx: int) -> str:
-        """计算异常严重程度"""
-        scores = [results['scores'][anomaly_idx] for results in model_results.values()]
-        avg_score = np.mean(scores)
-        
-        if avg_score < -0.6:
-            return 'critical'
-        elif avg_score < -0.3:
-            return 'high'
-        elif avg_score < 0:
-            return 'medium'
-        else:
-            return 'low'
+    def _calculate_severity(self, score_matrix: np.ndarray) -> np.ndarray:
+        """计算异常严重程度 (score_matrix 每行为一个异常点在各模型上的分数)"""
+        avg_scores = np.asarray(score_matrix, dtype=float).reshape(len(score_matrix), -1).mean(axis=1)
+        return np.select(
+            [avg_scores < -0.6, avg_scores < -0.3, avg_scores < 0],
+            ['critical', 'high', 'medium'],
+            default='low'
+        )
     
     def run_anomaly_detection(self, hours_back: int = 24) -> Dict[str, Any]:
         """运行完整的异常检测流程"""
@@ -413,7 +546,11 @@ class AnomalyDetector:
         # 整合日志异常
         log_anomalies = self.integrate_log_anomalies()
         
-        # 合并所有异常
+        return self._merge_anomaly_results(hours_back, system_anomalies, process_anomalies, log_anomalies)
+    
+    def _merge_anomaly_results(self, hours_back: int, system_anomalies: Dict[str, Any],
+                               process_anomalies: Dict[str, Any], log_anomalies: Dict[str, Any]) -> Dict[str, Any]:
+        """合并系统、进程和日志异常"""
         all_anomalies = {
             'detection_time': datetime.now().isoformat(),
             'time_window_hours': hours_back,
@@ -436,6 +573,174 @@ class AnomalyDetector:
         
         return all_anomalies
     
+    def _needs_refit(self, stream: OnlineStreamState) -> bool:
+        """判断在线模型是否需要重新训练: 未训练、超过训练间隔或检测到分布漂移"""
+        if not stream.is_fitted:
+            return True
+        
+        if time.time() - stream.fit_time > self.refit_interval_hours * 3600:
+            self.logger.info("在线模型超过训练间隔，重新训练")
+            return True
+        
+        if stream.drift_stats.count >= self.drift_min_samples:
+            drift = stream.drift_score()
+            if drift > self.drift_threshold:
+                self.logger.info(f"检测到指标分布漂移 ({drift:.2f})，重新训练")
+                return True
+        
+        return False
+    
+    def _score_online(self, stream: OnlineStreamState, features: np.ndarray) -> Dict[str, Any]:
+        """使用已训练的模型对新样本打分"""
+        model_results = {}
+        for model_name, model in stream.models.items():
+            try:
+                labels = model.predict(features)
+                model_results[model_name] = {
+                    'labels': labels,
+                    'scores': model.decision_function(features),
+                    'anomaly_count': int(np.sum(labels == 1))
+                }
+            except Exception as e:
+                self.logger.error(f"模型 {model_name} 打分失败: {e}")
+        return model_results
+    
+    def detect_system_anomalies_online(self, state: OnlineDetectorState, hours_back: int = 24) -> Dict[str, Any]:
+        """在线检测系统级异常: 只对上次检测之后的新样本打分, 按需重新训练"""
+        anomaly_results = {'anomalies': [], 'summary': {'total': 0, 'by_model': {}}}
+        stream = state.system
+        
+        if stream is None or self._needs_refit(stream):
+            window_df = self.metrics_store.read(start=datetime.now() - timedelta(hours=hours_back))
+            if len(window_df) < 5:
+                self.logger.warning("样本数量不足，跳过在线系统异常检测")
+                return anomaly_results
+            
+            previous_timestamp = stream.last_timestamp if stream is not None else None
+            stream = OnlineStreamState(self.system_features, moving_average=True)
+            features = stream.fit(window_df, self._create_system_models())
+            state.system = stream
+            self.logger.info(f"在线系统模型已训练: {len(window_df)} 个样本")
+            
+            # 只对上次检测之后的样本打分, 首次训练时对整个窗口打分
+            if previous_timestamp is not None:
+                new_mask = (window_df['timestamp'] > previous_timestamp).to_numpy()
+                new_df, features = window_df[new_mask], features[new_mask]
+            else:
+                new_df = window_df
+        else:
+            new_df = self.metrics_store.read(start=stream.last_timestamp)
+            if new_df.empty:
+                return anomaly_results
+            
+            feature_df = stream.build_features(new_df)
+            stream.drift_stats.update(feature_df.to_numpy(dtype=float))
+            features = stream.scale(feature_df)
+            stream.last_timestamp = new_df['timestamp'].max()
+        
+        if new_df.empty:
+            return anomaly_results
+        
+        new_df = new_df.reset_index(drop=True)
+        model_results = self._score_online(stream, features)
+        for model_name, results in model_results.items():
+            anomaly_results['summary']['by_model'][model_name] = results['anomaly_count']
+        
+        if model_results:
+            ensemble_anomalies = self._ensemble_anomaly_detection(model_results, len(new_df))
+            anomaly_results['anomalies'].extend(
+                self._build_system_anomaly_records(new_df, model_results, ensemble_anomalies)
+            )
+            anomaly_results['summary']['total'] = len(ensemble_anomalies)
+        
+        return anomaly_results
+    
+    def detect_process_anomalies_online(self, state: OnlineDetectorState, hours_back: int = 24) -> Dict[str, Any]:
+        """在线检测进程级异常: 每个服务一个持久化的 Isolation Forest, 只对新样本打分"""
+        anomaly_results = {'anomalies': [], 'summary': {'total': 0, 'by_service': {}}}
+        
+        cutoff_time = datetime.now() - timedelta(hours=hours_back)
+        start = state.process_last_timestamp if state.process_last_timestamp is not None else cutoff_time
+        new_df = self.process_store.read(start=start)
+        if new_df.empty:
+            return anomaly_results
+        state.process_last_timestamp = new_df['timestamp'].max()
+        
+        # 需要训练的服务才读取整个窗口, 且只读取一次
+        window_df = new_df if start == cutoff_time else None
+        
+        for service_name, service_df in new_df.groupby('name', sort=False):
+            stream = state.processes.get(service_name)
+            
+            try:
+                if stream is None or self._needs_refit(stream):
+                    if window_df is None:
+                        window_df = self.process_store.read(start=cutoff_time)
+                    train_df = window_df[window_df['name'] == service_name]
+                    if len(train_df) < 3:  # 数据点太少，跳过
+                        continue
+                    
+                    previous_timestamp = stream.last_timestamp if stream is not None else None
+                    stream = OnlineStreamState(self.process_features, moving_average=False)
+                    features = stream.fit(train_df, {
+                        'isolation_forest': IForest(contamination=self.contamination, random_state=42)
+                    })
+                    state.processes[service_name] = stream
+                    
+                    if previous_timestamp is not None:
+                        new_mask = (train_df['timestamp'] > previous_timestamp).to_numpy()
+                        service_df, features = train_df[new_mask], features[new_mask]
+                    else:
+                        service_df = train_df
+                else:
+                    feature_df = stream.build_features(service_df)
+                    stream.drift_stats.update(feature_df.to_numpy(dtype=float))
+                    features = stream.scale(feature_df)
+                    stream.last_timestamp = service_df['timestamp'].max()
+                
+                if service_df.empty:
+                    continue
+                
+                model_results = self._score_online(stream, features)
+                if not model_results:
+                    continue
+                results = model_results['isolation_forest']
+                anomaly_indices = np.where(results['labels'] == 1)[0]
+                anomaly_results['summary']['by_service'][service_name] = len(anomaly_indices)
+                anomaly_results['anomalies'].extend(
+                    self._build_process_anomaly_records(
+                        service_df.reset_index(drop=True), service_name, results['scores'], anomaly_indices
+                    )
+                )
+                
+            except Exception as e:
+                self.logger.error(f"在线检测 {service_name} 进程异常失败: {e}")
+                continue
+        
+        anomaly_results['summary']['total'] = len(anomaly_results['anomalies'])
+        return anomaly_results
+    
+    def run_online_detection(self, hours_back: int = 24) -> Dict[str, Any]:
+        """
+        运行在线异常检测: 加载持久化的标准化参数和模型, 只对新采集的样本打分,
+        超过训练间隔或检测到漂移时在最近 hours_back 小时的窗口上重新训练
+        """
+        self.logger.info("开始在线异常检测...")
+        
+        state = OnlineDetectorState.load(self.online_state_file)
+        system_anomalies = self.detect_system_anomalies_online(state, hours_back)
+        process_anomalies = self.detect_process_anomalies_online(state, hours_back)
+        log_anomalies = self.integrate_log_anomalies()
+        
+        try:
+            state.save(self.online_state_file)
+        except Exception as e:
+            self.logger.error(f"保存在线检测状态失败: {e}")
+        
+        all_anomalies = self._merge_anomaly_results(hours_back, system_anomalies, process_anomalies, log_anomalies)
+        all_anomalies['mode'] = 'online'
+        return all_anomalies
+    
     def save_anomaly_results(self, anomaly_results: Dict[str, Any]):
         """保存异常检测结果"""
         try:
@@ -9,11 +9,14 @@ import numpy as np
 import json
 import logging
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
 from collections import defaultdict, Counter
 import re
 
+from parse_logs import iter_parsed_log_entries
+from log_templates import TemplateMiner
+
 
 class PatternExtractor:
     """异常模式提取器"""
@@ -27,9 +30,12 @@ class PatternExtractor:
         self.anomalies_file = self.output_dir / "anomalies.csv"
         self.anomaly_summary_file = self.output_dir / "anomaly_summary.json"
         self.parsed_logs_file = self.output_dir / "parsed_logs.json"
+        self.parsed_log_entries_file = self.output_dir / "parsed_log_entries.jsonl"
         
         # 输出文件
         self.patterns_file = self.output_dir / "extracted_patterns.json"
+        # 错误日志模板索引 (跨运行累计模板频次)
+        self.log_templates_file = self.output_dir / "log_templates.pkl"
         
         # 模式提取配置
         self.metric_thresholds = {
@@ -45,6 +51,9 @@ class PatternExtractor:
             'error': ['error', 'failed', 'failure', 'timeout', '502', '503', '504', '500'],
             'warning': ['warning', 'slow', 'retry', 'deprecated']
         }
+        self._keyword_regex = re.compile('|'.join(
+            re.escape(keyword) for keywords in self.keyword_weights.values() for keyword in keywords
+        ))
         
         # 设置日志
         logging.basicConfig(level=logging.INFO)
@@ -120,38 +129,34 @@ class PatternExtractor:
         
         return patterns
     
+    def update_template_index(self) -> TemplateMiner:
+        """将日志条目明细中新出现的错误日志计入模板索引并保存"""
+        miner = TemplateMiner.load(self.log_templates_file)
+        added = miner.add_entries(
+            iter_parsed_log_entries(self.parsed_log_entries_file, levels=['error', 'critical'])
+        )
+        if added:
+            try:
+                miner.save(self.log_templates_file)
+            except Exception as e:
+                self.logger.warning(f"保存日志模板索引失败: {e}")
+        self.logger.info(f"日志模板索引: 新增 {added} 条错误日志, 共 {len(miner.clusters)} 个模板")
+        return miner
+    
     def extract_log_patterns(self, log_anomalies: List[Dict]) -> List[Dict[str, Any]]:
-        """提取日志异常模式"""
+        """提取日志异常模式 (基于模板频次, 不再逐条扫描原始消息)"""
         patterns = []
         
         try:
-            # 加载详细日志数据
-            if not self.parsed_logs_file.exists():
-                return patterns
-            
-            with open(self.parsed_logs_file, 'r', encoding='utf-8') as f:
-                log_data = json.load(f)
+            miner = self.update_template_index()
             
             # 按服务分析日志模式
-            for service, service_data in log_data.get('services', {}).items():
-                if service not in [anomaly.get('service') for anomaly in log_anomalies]:
-                    continue  # 跳过没有异常的服务
-                
-                # 收集错误日志
-                error_messages = []
-                error_keywords = Counter()
+            services = list(dict.fromkeys(anomaly.get('service') for anomaly in log_anomalies))
+            for service in services:
+                templates = miner.templates(service)
                 
-                for file_data in service_data.get('files', []):
-                    for entry in file_data.get('log_entries', []):
-                        if entry.get('level') in ['error', 'critical']:
-                            error_messages.append(entry.get('message', ''))
-                            
-                            # 提取关键词
-                            keywords = self._extract_keywords_from_message(entry.get('message', ''))
-                            error_keywords.update(keywords)
-                
-                if error_messages:
-                    pattern = self._analyze_log_patterns(service, error_messages, error_keywords)
+                if templates:
+                    pattern = self._analyze_log_patterns(service, templates)
                     
                     # 查找对应的日志异常
                     service_log_anomaly = next(
@@ -163,7 +168,7 @@ class PatternExtractor:
                         'pattern_id': f"{service}_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
                         'pattern_type': 'log_anomaly',
                         'service': service,
-                        'error_count': len(error_messages),
+                        'error_count': pattern['total_errors'],
                         'severity': service_log_anomaly.get('severity', 'medium'),
                         'extraction_time': datetime.now().isoformat()
                     })
@@ -282,19 +287,12 @@ class PatternExtractor:
         }
     
     def _extract_keywords_from_message(self, message: str) -> List[str]:
-        """从日志消息中提取关键词"""
+        """从日志消息(或模板)中提取关键词"""
         if not message:
             return []
         
-        # 转换为小写并提取单词
-        words = re.findall(r'\b\w{3,}\b', message.lower())
-        
-        # 过滤常见词和提取关键词
-        keywords = []
-        for category, category_keywords in self.keyword_weights.items():
-            for keyword in category_keywords:
-                if keyword in message.lower():
-                    keywords.append(keyword)
+        # 一次匹配全部类别关键词
+        keywords = self._keyword_regex.findall(message.lower())
         
         # 添加其他重要词（数字、状态码等）
         numbers = re.findall(r'\b\d{3,}\b', message)
@@ -302,42 +300,41 @@ class PatternExtractor:
         
         return list(set(keywords))  # 去重
     
-    def _analyze_log_patterns(self, service: str, error_messages: List[str], 
-                            error_keywords: Counter) -> Dict[str, Any]:
-        """分析日志模式"""
-        if not error_messages:
+    def _analyze_log_patterns(self, service: str, templates: List[Tuple[Any, int]]) -> Dict[str, Any]:
+        """
+        根据模板频次分析日志模式
+        :param templates: (模板, 频次) 列表, 按频次降序
+        """
+        if not templates:
             return {}
         
-        # 提取常见模式
-        common_patterns = []
+        total_messages = sum(count for _, count in templates)
         
-        # 查找重复的错误片段
-        message_parts = defaultdict(int)
-        for msg in error_messages:
-            # 提取关键错误片段（去掉变量部分）
-            pattern = re.sub(r'\d+', 'NUM', msg)  # 替换数字
-            pattern = re.sub(r'\b\w+\.\w+\.\w+\.\w+\b', 'IP', pattern)  # 替换IP
-            pattern = re.sub(r'/\w+/', '/PATH/', pattern)  # 替换路径
-            
-            if len(pattern) > 20:  # 只保留较长的模式
-                message_parts[pattern] += 1
+        # 关键词按模板提取, 以模板频次加权
+        error_keywords = Counter()
+        for cluster, count in templates:
+            for keyword in self._extract_keywords_from_message(cluster.template):
+                error_keywords[keyword] += count
         
-        # 找出出现频率高的模式
-        for pattern, count in message_parts.items():
-            if count >= max(2, len(error_messages) * 0.1):  # 至少出现2次或10%
+        # 找出出现频率高的模板
+        common_patterns = []
+        for cluster, count in templates:
+            template = cluster.template
+            if len(template) > 20 and count >= max(2, total_messages * 0.1):  # 至少出现2次或10%
                 common_patterns.append({
-                    'pattern': pattern[:100],  # 限制长度
+                    'template_id': cluster.cluster_id,
+                    'pattern': template[:100],  # 限制长度
                     'frequency': count,
-                    'percentage': count / len(error_messages)
+                    'percentage': count / total_messages
                 })
         
         # 计算错误频率
-        total_messages = len(error_messages)
         error_frequency = total_messages
         
         return {
             'total_errors': total_messages,
             'error_frequency': error_frequency,
+            'template_count': len(templates),
             'top_keywords': [{'keyword': kw, 'count': count} 
                            for kw, count in error_keywords.most_common(10)],
             'common_patterns': common_patterns[:5],  # 最多5个常见模式
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+主机指标采样模块 - 后台线程定期采样主机指标, 供扫描器和采集器非阻塞读取
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+import psutil
+
+# 系统范围的 inet 套接字表, 每行一个套接字 (首行为表头)
+PROC_NET_TABLES = ('/proc/net/tcp', '/proc/net/tcp6', '/proc/net/udp', '/proc/net/udp6')
+
+
+class HostMetricsSampler:
+    """主机指标采样器
+
+    后台线程按固定间隔采样 CPU、内存、磁盘、网络连接数和进程数量(可选采样每个进程的指标),
+    最近的样本保存在环形缓冲区中。调用方通过 latest(max_age) 读取,
+    样本足够新时直接返回, 不再各自阻塞调用 psutil.cpu_percent(interval=1)
+    """
+
+    def __init__(self, interval: float = 5.0, history_size: int = 120,
+                 collect_processes: bool = False):
+        """
+        初始化采样器
+        :param interval: 采样间隔(秒)
+        :param history_size: 环形缓冲区保存的样本数量
+        :param collect_processes: 是否采样每个进程的CPU/内存指标; 需遍历整个进程表, 默认关闭,
+                                  扫描器和采集器的进程指标由每个采集周期的进程快照(process_snapshot)提供
+        """
+        self.interval = interval
+        self.collect_processes = collect_processes
+        self.samples = deque(maxlen=history_size)
+
+        self._lock = threading.Lock()
+        self._sample_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._cpu_primed = False
+
+        self.logger = logging.getLogger(__name__)
+
+    def start(self):
+        """启动后台采样线程"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="host-metrics-sampler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """停止后台采样线程"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+
+    def _run(self):
+        """后台采样循环"""
+        while not self._stop_event.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                self.logger.warning(f"主机指标采样失败: {e}")
+            self._stop_event.wait(self.interval)
+
+    def sample(self) -> Dict[str, Any]:
+        """立即采样一次并写入环形缓冲区"""
+        with self._sample_lock:
+            return self._take_sample()
+
+    def _take_sample(self) -> Dict[str, Any]:
+        """采样一次 (需持有采样锁, 避免并发调用互相打断cpu_percent的统计区间)"""
+        # cpu_percent(interval=None) 返回距上次调用的平均值, 首次调用需短暂预热
+        cpu_interval = None if self._cpu_primed else 0.1
+        cpu_percent = psutil.cpu_percent(interval=cpu_interval)
+        self._cpu_primed = True
+
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage('/')
+        network_connections = self._count_network_connections()
+
+        now = time.time()
+        sample = {
+            'time': now,
+            'timestamp': datetime.fromtimestamp(now).isoformat(),
+            'cpu_percent': cpu_percent,
+            'memory_percent': memory.percent,
+            'memory_available': memory.available,
+            'disk_usage_percent': disk.percent,
+            'network_connections': network_connections,
+            'process_count': len(psutil.pids()),
+            'processes': self._sample_processes() if self.collect_processes else []
+        }
+
+        with self._lock:
+            self.samples.append(sample)
+        return sample
+
+    @staticmethod
+    def _count_network_connections() -> int:
+        """
+        统计 inet 套接字数量
+        Linux 上直接按 /proc/net 下各套接字表的行数统计; psutil.net_connections()
+        会遍历每个进程的 /proc/<pid>/fd 以关联进程, 开销与进程和文件描述符数量成正比
+        """
+        count = 0
+        found = False
+        for table in PROC_NET_TABLES:
+            try:
+                with open(table, 'rb') as f:
+                    lines = sum(block.count(b'\n') for block in iter(lambda: f.read(1 << 16), b''))
+            except OSError:
+                continue
+            found = True
+            count += max(lines - 1, 0)
+        if found:
+            return count
+
+        try:
+            return len(psutil.net_connections('inet'))
+        except (psutil.AccessDenied, OSError):
+            return 0
+
+    def _sample_processes(self) -> List[Dict[str, Any]]:
+        """采样每个进程的CPU和内存指标 (process_iter会复用进程对象, cpu_percent为两次采样间的值)"""
+        processes = []
+        for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
+            try:
+                info = proc.info
+                processes.append({
+                    'pid': info['pid'],
+                    'name': info['name'] or '',
+                    'cpu_percent': info['cpu_percent'] or 0,
+                    'memory_percent': info['memory_percent'] or 0
+                })
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                continue
+        return processes
+
+    def latest(self, max_age: float = 10.0) -> Dict[str, Any]:
+        """
+        获取最近的样本
+        :param max_age: 允许的样本最大时效(秒), 缓冲区中没有足够新的样本时立即采样一次
+        """
+        self.start()
+        sample = self._latest_within(max_age)
+        if sample is not None:
+            return sample
+
+        with self._sample_lock:
+            # 等待采样锁期间其他线程可能已完成采样
+            sample = self._latest_within(max_age)
+            if sample is not None:
+                return sample
+            return self._take_sample()
+
+    def _latest_within(self, max_age: float) -> Optional[Dict[str, Any]]:
+        """返回缓冲区中时效不超过max_age的最新样本"""
+        with self._lock:
+            sample = self.samples[-1] if self.samples else None
+        if sample is not None and time.time() - sample['time'] <= max_age:
+            return sample
+        return None
+
+    def history(self, seconds: Optional[float] = None) -> List[Dict[str, Any]]:
+        """获取最近一段时间内的样本(按时间顺序), 不指定则返回整个缓冲区"""
+        with self._lock:
+            samples = list(self.samples)
+        if seconds is None:
+            return samples
+        cutoff = time.time() - seconds
+        return [sample for sample in samples if sample['time'] >= cutoff]
+
+
+_sampler: Optional[HostMetricsSampler] = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler() -> HostMetricsSampler:
+    """获取进程内共享的主机指标采样器"""
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = HostMetricsSampler()
+        return _sampler
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志模板挖掘模块 - Drain 风格的在线模板树, 为每行日志分配模板ID并跨运行累计模板频次
+"""
+
+import os
+import pickle
+import re
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Iterable, Tuple
+
+WILDCARD = '<*>'
+
+# 变量部分的预替换规则 (日期、时间、IP、十六进制、长数字)
+MASK_PATTERNS = [
+    ('<DATE>', r'\d{4}[-/]\d{1,2}[-/]\d{1,2}(?:T\d{1,2}:\d{2}(?::\d{2})?(?:\.\d+)?)?'),
+    ('<TIME>', r'\d{1,2}:\d{2}:\d{2}(?:[.,]\d+)?'),
+    ('<IP>', r'(?<![\d.])\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?(?![\d.])'),
+    ('<HEX>', r'\b0[xX][0-9a-fA-F]+\b'),
+    ('<NUM>', r'\b\d{4,}\b')
+]
+
+
+class LogCluster:
+    """一个日志模板: 模板词序列及按服务累计的出现次数"""
+
+    def __init__(self, cluster_id: int, tokens: List[str]):
+        self.cluster_id = cluster_id
+        self.tokens = tokens
+        self.counts: Dict[str, int] = {}
+        self.last_seen: Dict[str, str] = {}
+
+    @property
+    def template(self) -> str:
+        return ' '.join(self.tokens)
+
+    @property
+    def size(self) -> int:
+        return sum(self.counts.values())
+
+    def similarity(self, tokens: List[str]) -> Tuple[float, int]:
+        """与消息词序列的相似度 (相同位置相同词的比例) 及模板中的通配符数"""
+        same = 0
+        wildcards = 0
+        for template_token, token in zip(self.tokens, tokens):
+            if template_token == WILDCARD:
+                wildcards += 1
+            elif template_token == token:
+                same += 1
+        return same / len(tokens), wildcards
+
+    def merge(self, tokens: List[str]):
+        """将与消息不同的位置替换为通配符"""
+        self.tokens = [
+            template_token if template_token == token else WILDCARD
+            for template_token, token in zip(self.tokens, tokens)
+        ]
+
+
+class TemplateMiner:
+    """Drain 风格的日志模板挖掘器
+
+    解析树第一层按词数分组, 其下按消息前 depth-2 个词逐层分支(含数字的词归入通配分支),
+    叶子节点只保存少量候选模板; 每条消息只与叶子中的候选比较, 均摊复杂度为 O(词数)。
+    挖掘器状态(模板及频次、各文件的已处理位置)以 pickle 持久化, 下次运行只处理新日志
+    """
+
+    def __init__(self, depth: int = 4, similarity_threshold: float = 0.5, max_children: int = 100):
+        """
+        :param depth: 解析树深度 (含根和词数层), 至少为3
+        :param similarity_threshold: 归入已有模板所需的最小相似度
+        :param max_children: 每个内部节点的最大分支数, 超出后归入通配分支
+        """
+        self.depth = max(depth, 3)
+        self.similarity_threshold = similarity_threshold
+        self.max_children = max_children
+
+        self.root: Dict[Any, Any] = {}
+        self.clusters: Dict[int, LogCluster] = {}
+        # 各日志文件已计入的位置: (最新条目时间戳, 已计入的该时间戳的条目数);
+        # 时间戳只精确到秒, 同一秒内稍后写入的条目靠条目数区分
+        self.watermarks: Dict[str, Tuple[str, int]] = {}
+
+        self._compile_masks()
+
+    def _compile_masks(self):
+        """编译变量替换规则为一个组合正则, 每条消息只扫描一次"""
+        self._mask_regex = re.compile('|'.join(
+            f'(?P<g{i}>{pattern})' for i, (_, pattern) in enumerate(MASK_PATTERNS)
+        ))
+        self._mask_tokens = {f'g{i}': token for i, (token, _) in enumerate(MASK_PATTERNS)}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_mask_regex', None)
+        state.pop('_mask_tokens', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._compile_masks()
+
+    def tokenize(self, message: str) -> List[str]:
+        """替换变量部分后按空白切分"""
+        masked = self._mask_regex.sub(lambda m: self._mask_tokens[m.lastgroup], message)
+        return masked.split()
+
+    def _leaf(self, tokens: List[str]) -> List[int]:
+        """沿解析树找到(必要时创建)消息所属的叶子节点"""
+        node = self.root.setdefault(len(tokens), {})
+        for token in tokens[:self.depth - 2]:
+            key = WILDCARD if any(ch.isdigit() for ch in token) else token
+            if key not in node:
+                key = key if len(node) < self.max_children else WILDCARD
+            node = node.setdefault(key, {})
+        return node.setdefault(None, [])
+
+    def add_message(self, message: str, key: str = '', timestamp: Optional[str] = None) -> LogCluster:
+        """
+        将一条消息归入模板(相似度不足时新建模板)并累计频次
+        :param key: 频次的分组键(如服务名)
+        :return: 消息所属的模板
+        """
+        tokens = self.tokenize(message)
+        leaf = self._leaf(tokens)
+
+        best, best_rank = None, None
+        if tokens:
+            for cluster_id in leaf:
+                cluster = self.clusters[cluster_id]
+                similarity, wildcards = cluster.similarity(tokens)
+                rank = (similarity, wildcards)
+                if best_rank is None or rank > best_rank:
+                    best, best_rank = cluster, rank
+        elif leaf:
+            best, best_rank = self.clusters[leaf[0]], (1.0, 0)
+
+        if best is not None and best_rank[0] >= self.similarity_threshold:
+            best.merge(tokens)
+            cluster = best
+        else:
+            cluster = LogCluster(len(self.clusters) + 1, tokens)
+            self.clusters[cluster.cluster_id] = cluster
+            leaf.append(cluster.cluster_id)
+
+        cluster.counts[key] = cluster.counts.get(key, 0) + 1
+        if timestamp and timestamp > cluster.last_seen.get(key, ''):
+            cluster.last_seen[key] = timestamp
+        return cluster
+
+    def _watermark(self, file_path: str) -> Optional[Tuple[str, float]]:
+        """文件的水位 (时间戳, 该时间戳已计入的条目数); 旧版状态只记录时间戳, 视为该秒的条目已全部计入"""
+        watermark = self.watermarks.get(file_path)
+        if isinstance(watermark, str):
+            return watermark, float('inf')
+        return watermark
+
+    def add_entries(self, entries: Iterable[Dict[str, Any]]) -> int:
+        """
+        计入日志条目明细中尚未处理过的条目 (每个文件按时间顺序排列), 按服务累计频次
+        :return: 新计入的条目数
+        """
+        added = 0
+        fresh_files = set()
+        # 文件 -> 本次遇到的水位时间戳的条目数
+        seen_at_watermark: Dict[str, int] = {}
+        # 文件 -> [本次最新的时间戳, 该时间戳的条目数]
+        latest: Dict[str, List[Any]] = {}
+        for entry in entries:
+            file_path = entry.get('file_path', '')
+            timestamp = entry.get('timestamp')
+
+            if timestamp:
+                position = latest.get(file_path)
+                if position is None or timestamp > position[0]:
+                    latest[file_path] = [timestamp, 1]
+                elif timestamp == position[0]:
+                    position[1] += 1
+
+            # 越过水位后, 该文件其后的条目(包括无时间戳的)都是新的
+            if file_path not in fresh_files:
+                watermark = self._watermark(file_path)
+                if watermark is not None:
+                    if not timestamp or timestamp < watermark[0]:
+                        continue
+                    if timestamp == watermark[0]:
+                        seen = seen_at_watermark[file_path] = seen_at_watermark.get(file_path, 0) + 1
+                        if seen <= watermark[1]:
+                            continue
+                fresh_files.add(file_path)
+
+            self.add_message(entry.get('message', ''), entry.get('service', ''), timestamp)
+            added += 1
+
+        for file_path, (timestamp, count) in latest.items():
+            watermark = self._watermark(file_path)
+            if watermark is not None and timestamp < watermark[0]:
+                continue
+            if watermark is not None and timestamp == watermark[0]:
+                # 明细只保留最近的条目, 该秒较早的条目可能已被截掉, 计数不回退
+                count = max(count, watermark[1])
+            self.watermarks[file_path] = (timestamp, count)
+        return added
+
+    def templates(self, key: Optional[str] = None) -> List[Tuple[LogCluster, int]]:
+        """按频次降序返回模板及其频次, 指定 key 时只统计该分组"""
+        result = []
+        for cluster in self.clusters.values():
+            count = cluster.size if key is None else cluster.counts.get(key, 0)
+            if count:
+                result.append((cluster, count))
+        result.sort(key=lambda item: item[1], reverse=True)
+        return result
+
+    @classmethod
+    def load(cls, path: Path, **kwargs) -> "TemplateMiner":
+        """加载挖掘器状态, 文件不存在或损坏时返回新的挖掘器"""
+        path = Path(path)
+        if path.exists():
+            try:
+                with open(path, 'rb') as f:
+                    miner = pickle.load(f)
+                if isinstance(miner, cls):
+                    return miner
+            except Exception:
+                pass
+        return cls(**kwargs)
+
+    def save(self, path: Path):
+        """写入临时文件后替换, 避免中断时留下不完整的状态文件"""
+        path = Path(path)
+        temp_path = path.with_name(path.name + ".tmp")
+        with open(temp_path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
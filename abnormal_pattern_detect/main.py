@@ -12,7 +12,7 @@ import argparse
 import schedule
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 
 # 导入各个模块
 from collect_metrics import MetricsCollector
@@ -20,15 +20,19 @@ from parse_logs import LogParser
 from detect_anomaly import AnomalyDetector
 from extract_pattern import PatternExtractor
 from generate_scanner import ScannerGenerator
+from pipeline_cache import PipelineCache
 
 
 class AnomalyDetectionSystem:
     """异常模式检测系统主控制器"""
     
-    def __init__(self, data_dir: str = "data", scanners_dir: str = "scanners"):
+    def __init__(self, data_dir: str = "data", scanners_dir: str = "scanners",
+                 online_detection: bool = False, n_jobs: int = 1):
         """初始化系统"""
         self.data_dir = Path(data_dir)
         self.scanners_dir = Path(scanners_dir)
+        # 在线检测模式: 每次采集后只对新数据打分
+        self.online_detection = online_detection
         
         # 创建目录
         self.data_dir.mkdir(exist_ok=True)
@@ -36,8 +40,8 @@ class AnomalyDetectionSystem:
         
         # 初始化各个模块
         self.metrics_collector = MetricsCollector(output_dir=str(self.data_dir))
-        self.log_parser = LogParser(output_dir=str(self.data_dir))
-        self.anomaly_detector = AnomalyDetector(output_dir=str(self.data_dir))
+        self.log_parser = LogParser(output_dir=str(self.data_dir), n_jobs=n_jobs)
+        self.anomaly_detector = AnomalyDetector(output_dir=str(self.data_dir), n_jobs=n_jobs)
         self.pattern_extractor = PatternExtractor(output_dir=str(self.data_dir))
         self.scanner_generator = ScannerGenerator(
             output_dir=str(self.data_dir), 
@@ -47,6 +51,9 @@ class AnomalyDetectionSystem:
         # 系统状态文件
         self.status_file = self.data_dir / "system_status.json"
         
+        # 流水线阶段缓存: 输入未变化的阶段直接复用上次结果
+        self.pipeline_cache = PipelineCache(self.data_dir / "pipeline_cache.json")
+        
         # 设置日志
         self._setup_logging()
         self.logger = logging.getLogger(__name__)
@@ -94,8 +101,8 @@ class AnomalyDetectionSystem:
         except Exception as e:
             self.logger.error(f"保存系统状态失败: {e}")
     
-    def collect_data(self) -> Dict[str, Any]:
-        """步骤1: 收集指标和日志数据"""
+    def collect_data(self, incremental_logs: bool = False) -> Dict[str, Any]:
+        """步骤1: 收集指标和日志数据 (incremental_logs=True 时只解析日志文件新写入的行)"""
         self.logger.info("=" * 50)
         self.logger.info("步骤1: 开始数据收集")
         self.logger.info("=" * 50)
@@ -125,7 +132,7 @@ class AnomalyDetectionSystem:
         try:
             # 解析日志
             self.logger.info("解析系统日志...")
-            log_result = self.log_parser.parse_all_logs(time_window_hours=24)
+            log_result = self.log_parser.parse_all_logs(time_window_hours=24, incremental=incremental_logs)
             self.log_parser.save_parsed_logs(log_result)
             
             collection_results['log_parsing'] = {
@@ -151,15 +158,18 @@ class AnomalyDetectionSystem:
         
         return collection_results
     
-    def detect_anomalies(self) -> Dict[str, Any]:
-        """步骤2: 检测异常"""
+    def detect_anomalies(self, online: bool = False) -> Dict[str, Any]:
+        """步骤2: 检测异常 (online=True 时使用持久化模型只对新数据打分)"""
         self.logger.info("=" * 50)
         self.logger.info("步骤2: 开始异常检测")
         self.logger.info("=" * 50)
         
         try:
             # 运行异常检测
-            anomaly_results = self.anomaly_detector.run_anomaly_detection(hours_back=24)
+            if online:
+                anomaly_results = self.anomaly_detector.run_online_detection(hours_back=24)
+            else:
+                anomaly_results = self.anomaly_detector.run_anomaly_detection(hours_back=24)
             
             # 保存结果
             self.anomaly_detector.save_anomaly_results(anomaly_results)
@@ -231,17 +241,18 @@ class AnomalyDetectionSystem:
                 'timestamp': datetime.now().isoformat()
             }
     
-    def generate_scanners(self) -> Dict[str, Any]:
-        """步骤4: 生成扫描器"""
+    def generate_scanners(self, changed_only: bool = False) -> Dict[str, Any]:
+        """步骤4: 生成扫描器 (changed_only=True 时只重写模式有变化的扫描器)"""
         self.logger.info("=" * 50)
         self.logger.info("步骤4: 开始生成扫描器")
         self.logger.info("=" * 50)
         
         try:
             # 生成扫描器代码
-            scanners = self.scanner_generator.generate_all_scanners()
+            scanners = self.scanner_generator.generate_all_scanners(changed_only=changed_only)
+            unchanged = self.scanner_generator.unchanged_scanners
             
-            if not scanners:
+            if not scanners and not unchanged:
                 self.logger.warning("没有生成任何扫描器，可能缺少足够的模式数据")
                 return {
                     'success': False,
@@ -252,8 +263,8 @@ class AnomalyDetectionSystem:
             # 保存扫描器文件
             self.scanner_generator.save_scanners(scanners)
             
-            scanner_count = len(scanners)
-            self.logger.info(f"扫描器生成完成: 生成了 {scanner_count} 个扫描器")
+            scanner_count = len(scanners) + len(unchanged)
+            self.logger.info(f"扫描器生成完成: 重写了 {len(scanners)} 个扫描器, {len(unchanged)} 个未变化")
             
             for filename in scanners.keys():
                 service_name = filename.replace('scan_', '').replace('.py', '')
@@ -267,7 +278,8 @@ class AnomalyDetectionSystem:
             return {
                 'success': True,
                 'scanner_count': scanner_count,
-                'scanner_files': list(scanners.keys()),
+                'scanner_files': list(scanners.keys()) + unchanged,
+                'rewritten_files': list(scanners.keys()),
                 'timestamp': datetime.now().isoformat()
             }
             
@@ -279,8 +291,55 @@ class AnomalyDetectionSystem:
                 'timestamp': datetime.now().isoformat()
             }
     
-    def run_complete_pipeline(self) -> Dict[str, Any]:
-        """运行完整的检测流程"""
+    def _stage_inputs(self, stage: str) -> Tuple[List[Path], Dict[str, Any]]:
+        """阶段的输入文件和影响结果的配置"""
+        if stage == 'pattern_extraction':
+            extractor = self.pattern_extractor
+            return [extractor.anomaly_summary_file, extractor.anomalies_file,
+                    extractor.parsed_logs_file, extractor.parsed_log_entries_file], {
+                'metric_thresholds': extractor.metric_thresholds,
+                'keyword_weights': extractor.keyword_weights
+            }
+        if stage == 'scanner_generation':
+            generator = self.scanner_generator
+            return [generator.patterns_file], {
+                'templates': generator.scanner_templates,
+                'scanners_dir': str(generator.scanners_dir)
+            }
+        raise ValueError(f"未知的流水线阶段: {stage}")
+    
+    def _stage_outputs(self, stage: str) -> List[Path]:
+        """阶段的输出文件 (被外部改动或删除时阶段需重新执行)"""
+        if stage == 'pattern_extraction':
+            return [self.pattern_extractor.patterns_file]
+        return sorted(self.scanners_dir.glob("scan_*.py"))
+    
+    def _run_cached_stage(self, stage: str, run_stage, force: bool = False) -> Dict[str, Any]:
+        """输入摘要与上次成功执行相同时跳过阶段并返回上次结果, 否则执行并记录"""
+        paths, config = self._stage_inputs(stage)
+        input_digest = self.pipeline_cache.digest_inputs(paths, config)
+        
+        if not force and self.pipeline_cache.is_fresh(stage, input_digest):
+            result = self.pipeline_cache.cached_result(stage)
+            if result is not None:
+                self.logger.info(f"⏭️ 跳过 {stage}: 输入未变化, 复用上次结果")
+                result['cached'] = True
+                return result
+        
+        result = run_stage()
+        if result.get('success'):
+            self.pipeline_cache.record(stage, input_digest, self._stage_outputs(stage), result)
+        else:
+            self.pipeline_cache.invalidate(stage)
+        return result
+    
+    def run_complete_pipeline(self, force: bool = False) -> Dict[str, Any]:
+        """
+        运行完整的检测流程
+        数据收集和异常检测每次都执行: 数据收集总会向当天分区追加新数据, 检测结果又取决于随时间滑动的
+        24小时窗口, 按输入摘要缓存永远不会命中。之后的模式提取和扫描器生成在输入(上一阶段的输出内容
+        和配置)未变化时跳过, force=True 时全部重新执行
+        """
         pipeline_start_time = datetime.now()
         
         self.logger.info("🚀 开始运行异常模式检测完整流程...")
@@ -301,13 +360,15 @@ class AnomalyDetectionSystem:
         # 只有在检测到异常时才继续
         if step2_result.get('success') and step2_result.get('total_anomalies', 0) > 0:
             # 步骤3: 模式提取
-            step3_result = self.extract_patterns()
+            step3_result = self._run_cached_stage('pattern_extraction', self.extract_patterns, force)
             pipeline_results['steps']['pattern_extraction'] = step3_result
             
             # 只有在提取到模式时才生成扫描器
             if step3_result.get('success') and step3_result.get('total_patterns', 0) > 0:
                 # 步骤4: 生成扫描器
-                step4_result = self.generate_scanners()
+                step4_result = self._run_cached_stage(
+                    'scanner_generation', lambda: self.generate_scanners(changed_only=not force), force
+                )
                 pipeline_results['steps']['scanner_generation'] = step4_result
             else:
                 self.logger.info("跳过扫描器生成: 没有提取到足够的模式")
@@ -338,9 +399,13 @@ class AnomalyDetectionSystem:
         self.logger.info("⏰ 执行定期数据收集...")
         
         try:
-            # 只收集数据，不做全流程处理
-            self.collect_data()
+            # 只收集数据，不做全流程处理; 日志从检查点继续解析
+            self.collect_data(incremental_logs=True)
             self.logger.info("✅ 定期数据收集完成")
+            
+            # 在线检测模式下随采集频率检测新数据
+            if self.online_detection:
+                self.detect_anomalies(online=True)
         except Exception as e:
             self.logger.error(f"❌ 定期数据收集失败: {e}")
     
@@ -389,9 +454,10 @@ class AnomalyDetectionSystem:
         # 检查文件存在情况
         print(f"\n📂 数据文件状态:")
         files_to_check = [
-            ('metrics.csv', '系统指标'),
-            ('processes.csv', '进程指标'),
+            ('metrics', '系统指标'),
+            ('processes', '进程指标'),
             ('parsed_logs.json', '解析日志'),
+            ('parsed_log_entries.jsonl', '日志条目明细'),
             ('anomaly_summary.json', '异常检测结果'),
             ('extracted_patterns.json', '提取的模式')
         ]
@@ -421,19 +487,24 @@ def main():
     parser.add_argument('--data-dir', default='data', help='数据目录路径')
     parser.add_argument('--scanners-dir', default='/home/denerate/abnormal_pattern_detect/scanners', help='扫描器目录路径')
     parser.add_argument('--interval', type=int, default=30, help='监控模式下的数据收集间隔(分钟)')
+    parser.add_argument('--online', action='store_true', help='使用在线检测模式(持久化模型, 只对新数据打分)')
+    parser.add_argument('--jobs', type=int, default=1, help='日志解析和异常检测模型训练的并行进程数(-1 表示全部CPU)')
+    parser.add_argument('--force', action='store_true', help='忽略流水线阶段缓存, 重新执行所有阶段并重写全部扫描器')
     
     args = parser.parse_args()
     
     # 初始化系统
     system = AnomalyDetectionSystem(
         data_dir=args.data_dir,
-        scanners_dir=args.scanners_dir
+        scanners_dir=args.scanners_dir,
+        online_detection=args.online,
+        n_jobs=args.jobs
     )
     
     if args.command == 'run':
         # 运行完整流程
         print("🚀 开始运行异常模式检测完整流程...")
-        results = system.run_complete_pipeline()
+        results = system.run_complete_pipeline(force=args.force)
         
         print(f"\n📊 流程执行结果:")
         print(f"  - 总耗时: {results.get('duration_seconds', 0):.2f}秒")
@@ -441,7 +512,8 @@ def main():
         
         for step_name, step_result in results.get('steps', {}).items():
             success = "✅" if step_result.get('success') else "❌"
-            print(f"  - {step_name}: {success}")
+            cached = " (输入未变化, 已跳过)" if step_result.get('cached') else ""
+            print(f"  - {step_name}: {success}{cached}")
     
     elif args.command == 'monitor':
         # 启动持续监控
@@ -456,7 +528,7 @@ def main():
     elif args.command == 'detect':
         # 只执行异常检测
         print("🔍 开始异常检测...")
-        results = system.detect_anomalies()
+        results = system.detect_anomalies(online=args.online)
         if results.get('success'):
             print(f"✅ 异常检测完成，发现 {results.get('total_anomalies', 0)} 个异常")
         else:
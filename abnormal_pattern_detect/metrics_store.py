@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+指标存储模块 - 按天分区的列式时序存储, 替代不断追加的 metrics.csv / processes.csv
+"""
+
+import logging
+import os
+import shutil
+import threading
+from datetime import datetime, timedelta, date
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# 系统指标记录类型
+SYSTEM_DTYPE = np.dtype([
+    ('timestamp', 'datetime64[us]'),
+    ('cpu_percent', 'f8'),
+    ('memory_percent', 'f8'),
+    ('memory_available', 'i8'),
+    ('disk_usage_percent', 'f8'),
+    ('network_connections', 'i8'),
+    ('process_count', 'i8')
+])
+
+# 进程指标记录类型
+PROCESS_DTYPE = np.dtype([
+    ('timestamp', 'datetime64[us]'),
+    ('pid', 'i8'),
+    ('name', 'U64'),
+    ('cpu_percent', 'f8'),
+    ('memory_percent', 'f8'),
+    ('memory_rss', 'i8'),
+    ('status', 'U16'),
+    ('connections', 'i8')
+])
+
+
+class TimeSeriesStore:
+    """按天分区的时序存储
+
+    每天一个定长记录段文件(<root>/YYYY-MM-DD.bin), 记录按固定的结构化类型
+    以二进制追加写入; 读取时只内存映射与查询窗口重叠的分区, 加载最近24小时的
+    耗时与累计的历史长度无关。超过保留天数的分区在写入新的一天时删除
+    """
+
+    SUFFIX = ".bin"
+
+    def __init__(self, root_dir: str, dtype: np.dtype, retention_days: int = 30):
+        """
+        初始化时序存储
+        :param root_dir: 分区文件目录
+        :param dtype: 记录的结构化类型, 第一列必须为 timestamp
+        :param retention_days: 分区保留天数, 0 表示不清理
+        """
+        self.root_dir = Path(root_dir)
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        self.dtype = np.dtype(dtype)
+        self.retention_days = retention_days
+
+        self._lock = threading.Lock()
+        self._retention_day: Optional[date] = None
+        self.logger = logging.getLogger(__name__)
+
+    def partition_path(self, day: date) -> Path:
+        """某一天的分区文件路径"""
+        return self.root_dir / f"{day.isoformat()}{self.SUFFIX}"
+
+    def partitions(self) -> List[Tuple[date, Path]]:
+        """按日期排序列出全部分区"""
+        partitions = []
+        for path in self.root_dir.glob(f"*{self.SUFFIX}"):
+            try:
+                day = date.fromisoformat(path.stem)
+            except ValueError:
+                continue
+            partitions.append((day, path))
+        return sorted(partitions)
+
+    def _to_array(self, records: List[Dict[str, Any]]) -> np.ndarray:
+        """将记录字典转换为结构化数组, 缺失字段和空值(None/NaN)按类型填充默认值"""
+        array = np.zeros(len(records), dtype=self.dtype)
+        for field in self.dtype.names:
+            column = [record.get(field) for record in records]
+            if field == 'timestamp':
+                array[field] = np.array(pd.to_datetime(column), dtype='datetime64[us]')
+            elif self.dtype[field].kind == 'U':
+                array[field] = ['' if pd.isna(value) else str(value) for value in column]
+            else:
+                array[field] = [0 if pd.isna(value) else value for value in column]
+        return array
+
+    def append(self, records: List[Dict[str, Any]]):
+        """追加记录, 按记录时间戳写入对应日期的分区"""
+        if not records:
+            return
+
+        array = self._to_array(records)
+        days = array['timestamp'].astype('datetime64[D]')
+
+        with self._lock:
+            for day in np.unique(days):
+                rows = array[days == day]
+                with open(self.partition_path(day.item()), 'ab') as f:
+                    f.write(rows.tobytes())
+
+            latest_day = days.max().item()
+            if self._retention_day != latest_day:
+                self._retention_day = latest_day
+                self.apply_retention(latest_day)
+
+    def apply_retention(self, today: Optional[date] = None) -> int:
+        """删除超过保留天数的分区, 返回删除的分区数"""
+        if self.retention_days <= 0:
+            return 0
+
+        cutoff = (today or date.today()) - timedelta(days=self.retention_days)
+        removed = 0
+        for day, path in self.partitions():
+            if day >= cutoff:
+                break
+            try:
+                path.unlink()
+                removed += 1
+            except OSError as e:
+                self.logger.warning(f"删除过期分区失败 {path}: {e}")
+        if removed:
+            self.logger.info(f"已清理 {removed} 个过期分区: {self.root_dir}")
+        return removed
+
+    def _read_partition(self, path: Path) -> np.ndarray:
+        """内存映射一个分区文件, 忽略末尾未写完整的记录"""
+        count = path.stat().st_size // self.dtype.itemsize
+        if count == 0:
+            return np.empty(0, dtype=self.dtype)
+        return np.memmap(path, dtype=self.dtype, mode='r', shape=(count,))
+
+    def read(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> pd.DataFrame:
+        """
+        读取时间窗口 (start, end] 内的记录, 只打开与窗口重叠的分区
+        :return: DataFrame, timestamp 列为 datetime64
+        """
+        start_day = start.date() if start is not None else None
+        end_day = end.date() if end is not None else None
+        start_value = np.datetime64(start, 'us') if start is not None else None
+        end_value = np.datetime64(end, 'us') if end is not None else None
+
+        chunks = []
+        for day, path in self.partitions():
+            if start_day is not None and day < start_day:
+                continue
+            if end_day is not None and day > end_day:
+                break
+
+            rows = self._read_partition(path)
+            if len(rows) == 0:
+                continue
+            mask = np.ones(len(rows), dtype=bool)
+            if start_value is not None:
+                mask &= rows['timestamp'] > start_value
+            if end_value is not None:
+                mask &= rows['timestamp'] <= end_value
+            chunks.append(np.array(rows[mask]))
+
+        if not chunks:
+            return pd.DataFrame(columns=list(self.dtype.names))
+        return pd.DataFrame(np.concatenate(chunks))
+
+    def is_empty(self) -> bool:
+        """存储中是否没有任何分区"""
+        return not self.partitions()
+
+    def import_csv(self, csv_path: Path, chunk_size: int = 100000) -> int:
+        """
+        导入旧版CSV文件中的记录, 返回导入的记录数 (缺少时间戳的记录跳过)
+        记录先写入临时目录(<root>.importing)中的分区, 全部导入成功后才移入存储目录;
+        导入失败时删除临时分区, 存储保持原状, 可重新导入
+        """
+        staging = TimeSeriesStore(self.root_dir.with_name(self.root_dir.name + ".importing"),
+                                  self.dtype, retention_days=0)
+        try:
+            # 清理上次中断留下的临时分区
+            for _, path in staging.partitions():
+                path.unlink()
+
+            imported = 0
+            for chunk in pd.read_csv(csv_path, chunksize=chunk_size):
+                if 'timestamp' in chunk.columns:
+                    chunk = chunk.dropna(subset=['timestamp'])
+                staging.append(chunk.to_dict('records'))
+                imported += len(chunk)
+
+            with self._lock:
+                for day, path in staging.partitions():
+                    os.replace(path, self.partition_path(day))
+        finally:
+            shutil.rmtree(staging.root_dir, ignore_errors=True)
+
+        self.apply_retention()
+        return imported
+
+
+def open_metrics_stores(data_dir: str, retention_days: int = 30) -> Tuple[TimeSeriesStore, TimeSeriesStore]:
+    """
+    打开系统指标与进程指标存储 (data/metrics/, data/processes/)
+    若存在旧版 metrics.csv / processes.csv 且存储为空, 先导入并将CSV重命名为 *.csv.imported
+    """
+    data_dir = Path(data_dir)
+    stores = (
+        TimeSeriesStore(data_dir / "metrics", SYSTEM_DTYPE, retention_days),
+        TimeSeriesStore(data_dir / "processes", PROCESS_DTYPE, retention_days)
+    )
+
+    logger = logging.getLogger(__name__)
+    for store, legacy_name in zip(stores, ("metrics.csv", "processes.csv")):
+        legacy_file = data_dir / legacy_name
+        if legacy_file.exists() and store.is_empty():
+            try:
+                imported = store.import_csv(legacy_file)
+                legacy_file.rename(legacy_file.with_name(legacy_name + ".imported"))
+                logger.info(f"已导入旧版指标文件 {legacy_name}: {imported} 条记录")
+            except Exception as e:
+                logger.warning(f"导入旧版指标文件 {legacy_name} 失败: {e}")
+
+    return stores
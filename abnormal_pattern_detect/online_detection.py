@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+在线异常检测模块 - 流式统计特征、持久化的标准化器与模型, 只对新采集的数据打分
+"""
+
+import os
+import pickle
+import time
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+import pandas as pd
+
+
+class WelfordStats:
+    """按列的流式均值/方差统计 (Welford 算法, 批量合并采用 Chan 的并行公式)"""
+
+    def __init__(self, size: int):
+        self.count = 0
+        self.mean = np.zeros(size)
+        self.m2 = np.zeros(size)
+
+    def update(self, values: np.ndarray):
+        """合并一批样本 (二维数组, 每列一个特征)"""
+        values = np.asarray(values, dtype=float)
+        n = len(values)
+        if n == 0:
+            return
+
+        batch_mean = values.mean(axis=0)
+        batch_m2 = ((values - batch_mean) ** 2).sum(axis=0)
+        delta = batch_mean - self.mean
+        total = self.count + n
+
+        self.mean = self.mean + delta * n / total
+        self.m2 = self.m2 + batch_m2 + delta ** 2 * self.count * n / total
+        self.count = total
+
+    @property
+    def variance(self) -> np.ndarray:
+        """总体方差 (与 StandardScaler 一致)"""
+        if self.count == 0:
+            return np.zeros_like(self.m2)
+        return self.m2 / self.count
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.variance)
+
+
+class StreamingFeatures:
+    """流式派生特征
+
+    变化量(*_change)使用上一批最后一个值衔接, 移动平均(*_ma)使用EWMA,
+    状态跨批次保留, 新数据到达时无需回看历史窗口
+    """
+
+    def __init__(self, columns: List[str], moving_average: bool = True, span: int = 5):
+        """
+        :param columns: 计算派生特征的原始列 (如 cpu_percent, memory_percent)
+        :param moving_average: 是否计算 EWMA 移动平均特征
+        :param span: EWMA 跨度, alpha = 2 / (span + 1)
+        """
+        self.columns = columns
+        self.moving_average = moving_average
+        self.alpha = 2.0 / (span + 1)
+        self.last_values: Optional[np.ndarray] = None
+        self.ewma: Optional[np.ndarray] = None
+
+    @staticmethod
+    def _prefix(column: str) -> str:
+        return column.replace('_percent', '')
+
+    def reset(self):
+        """清空跨批次状态"""
+        self.last_values = None
+        self.ewma = None
+
+    def transform(self, feature_df: pd.DataFrame) -> pd.DataFrame:
+        """为一批按时间排序的样本追加派生特征, 并推进流式状态"""
+        feature_df = feature_df.copy()
+        if feature_df.empty:
+            return feature_df
+
+        values = feature_df[self.columns].to_numpy(dtype=float)
+        previous = values[:1] if self.last_values is None else self.last_values[np.newaxis, :]
+        changes = np.diff(values, axis=0, prepend=previous)
+        for i, column in enumerate(self.columns):
+            feature_df[f"{self._prefix(column)}_change"] = changes[:, i]
+
+        if self.moving_average:
+            # 以上一批的EWMA值作为种子接续计算
+            seed = values[:1] if self.ewma is None else self.ewma[np.newaxis, :]
+            seeded = pd.DataFrame(np.vstack([seed, values]))
+            ewma = seeded.ewm(alpha=self.alpha, adjust=False).mean().to_numpy()[1:]
+            for i, column in enumerate(self.columns):
+                feature_df[f"{self._prefix(column)}_ma"] = ewma[:, i]
+            self.ewma = ewma[-1]
+
+        self.last_values = values[-1]
+        return feature_df
+
+
+class OnlineStreamState:
+    """单个指标流(系统或某个进程)的在线检测状态: 派生特征状态、标准化参数、已训练模型和漂移统计"""
+
+    def __init__(self, feature_columns: List[str], moving_average: bool = True):
+        self.feature_columns = feature_columns
+        self.features = StreamingFeatures(['cpu_percent', 'memory_percent'], moving_average)
+
+        self.models: Dict[str, Any] = {}
+        self.scaler_mean: Optional[np.ndarray] = None
+        self.scaler_scale: Optional[np.ndarray] = None
+        self.fit_time: Optional[float] = None
+        self.fit_samples = 0
+
+        # 训练后新样本的统计, 用于漂移检测
+        self.drift_stats: Optional[WelfordStats] = None
+        # 已打分的最新样本时间
+        self.last_timestamp: Optional[pd.Timestamp] = None
+
+    @property
+    def is_fitted(self) -> bool:
+        return bool(self.models) and self.scaler_mean is not None
+
+    def build_features(self, df: pd.DataFrame) -> pd.DataFrame:
+        """选择特征列、填充缺失值并追加流式派生特征"""
+        feature_df = df[self.feature_columns].astype(float)
+        feature_df = feature_df.fillna(feature_df.mean()).fillna(0)
+        return self.features.transform(feature_df)
+
+    def scale(self, feature_df: pd.DataFrame) -> np.ndarray:
+        """使用训练时保存的标准化参数变换特征"""
+        return (feature_df.to_numpy(dtype=float) - self.scaler_mean) / self.scaler_scale
+
+    def fit(self, df: pd.DataFrame, models: Dict[str, Any]) -> np.ndarray:
+        """在训练窗口上重新计算派生特征、标准化参数并训练模型, 返回标准化后的训练特征"""
+        self.features.reset()
+        feature_df = self.build_features(df)
+
+        stats = WelfordStats(feature_df.shape[1])
+        stats.update(feature_df.to_numpy(dtype=float))
+        self.scaler_mean = stats.mean
+        scale = stats.std
+        self.scaler_scale = np.where(scale > 0, scale, 1.0)
+
+        features = self.scale(feature_df)
+        for model in models.values():
+            model.fit(features)
+
+        self.models = models
+        self.fit_time = time.time()
+        self.fit_samples = len(features)
+        self.drift_stats = WelfordStats(feature_df.shape[1])
+        self.last_timestamp = df['timestamp'].max()
+        return features
+
+    def drift_score(self) -> float:
+        """训练后新样本均值相对训练分布的最大偏移(以训练标准差为单位)"""
+        if self.drift_stats is None or self.drift_stats.count == 0:
+            return 0.0
+        return float(np.max(np.abs(self.drift_stats.mean - self.scaler_mean) / self.scaler_scale))
+
+
+class OnlineDetectorState:
+    """在线检测的持久化状态, 以 pickle 原子写入数据目录"""
+
+    def __init__(self):
+        self.system: Optional[OnlineStreamState] = None
+        self.processes: Dict[str, OnlineStreamState] = {}
+        # 已读取的最新进程指标时间
+        self.process_last_timestamp: Optional[pd.Timestamp] = None
+
+    @classmethod
+    def load(cls, path: Path) -> "OnlineDetectorState":
+        """加载状态, 文件不存在或损坏时返回空状态"""
+        path = Path(path)
+        if path.exists():
+            try:
+                with open(path, 'rb') as f:
+                    state = pickle.load(f)
+                if isinstance(state, cls):
+                    return state
+            except Exception:
+                pass
+        return cls()
+
+    def save(self, path: Path):
+        """写入临时文件后替换, 避免中断时留下不完整的状态文件"""
+        path = Path(path)
+        temp_path = path.with_name(path.name + ".tmp")
+        with open(temp_path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
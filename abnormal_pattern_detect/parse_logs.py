@@ -12,19 +12,31 @@ from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
 import os
 from collections import defaultdict, Counter
+from concurrent.futures import ProcessPoolExecutor
 
 
 class LogParser:
     """日志解析器"""
     
-    def __init__(self, output_dir: str = "data"):
-        """初始化日志解析器"""
+    def __init__(self, output_dir: str = "data", n_jobs: int = 1):
+        """
+        初始化日志解析器
+        
+        Args:
+            output_dir: 输出目录
+            n_jobs: 并行解析文件的进程数, 1 表示在当前进程顺序解析, -1 表示使用全部CPU
+        """
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
+        self.n_jobs = n_jobs
         
         # 输出文件
         self.parsed_logs_file = self.output_dir / "parsed_logs.json"
         self.log_summary_file = self.output_dir / "log_summary.json"
+        # 日志条目明细 (JSONL, 每行一条, 按需流式读取)
+        self.entries_file = self.output_dir / "parsed_log_entries.jsonl"
+        # 增量解析的文件检查点 (inode、偏移量、最新时间戳)
+        self.checkpoint_file = self.output_dir / "log_checkpoints.json"
         
         # 常见日志路径
         self.common_log_paths = {
@@ -126,9 +138,56 @@ class LogParser:
             r'(\w{3} \d{2} \d{2}:\d{2}:\d{2})'          # Jan 01 12:00:00
         ]
         
+        # 与 time_patterns 一一对应的时间解析格式
+        self.time_formats = [
+            '%Y-%m-%d %H:%M:%S',
+            '%d/%b/%Y:%H:%M:%S',
+            '%Y/%m/%d %H:%M:%S',
+            '%b %d %H:%M:%S'
+        ]
+        
         # 设置日志
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
+        
+        # 预编译模式
+        self.compile_patterns()
+    
+    def compile_patterns(self):
+        """预编译级别、服务和时间模式 (修改模式配置后需重新调用)"""
+        # 每个级别的全部模式合并为一个正则, 按 critical -> error -> warning 的优先级匹配
+        self._level_regexes = [
+            (level, re.compile('|'.join(f'(?:{pattern})' for pattern in self.error_patterns[level])))
+            for level in ('critical', 'error', 'warning')
+        ]
+        
+        # 服务指标模式逐个编译 (一行可能同时命中多个指标), 另合并一个正则用于快速排除不相关的行
+        self._service_regexes = {}
+        self._service_prefilters = {}
+        for service, patterns in self.service_patterns.items():
+            self._service_regexes[service] = [
+                (metric_name, re.compile(pattern, re.IGNORECASE)) for metric_name, pattern in patterns.items()
+            ]
+            self._service_prefilters[service] = re.compile(
+                '|'.join(f'(?:{pattern})' for pattern in patterns.values()), re.IGNORECASE
+            )
+        
+        # 时间模式合并为一个正则, 由命中的分组序号确定格式, 用于快速识别最常见的首个格式;
+        # 单独编译的模式按优先级逐个尝试, 也用于已缓存格式的文件
+        self._time_regexes = [re.compile(pattern) for pattern in self.time_patterns]
+        self._time_regex = re.compile('|'.join(self.time_patterns))
+    
+    def _parse_time(self, time_str: str, format_index: int) -> Optional[datetime]:
+        """按时间模式对应的格式解析时间字符串"""
+        fmt = self.time_formats[format_index]
+        if fmt == '%b %d %H:%M:%S':
+            # 为没有年份的格式添加当前年份
+            time_str = f"{datetime.now().year} {time_str}"
+            fmt = '%Y %b %d %H:%M:%S'
+        try:
+            return datetime.strptime(time_str, fmt)
+        except ValueError:
+            return None
     
     def find_log_files(self, service: str = None) -> Dict[str, List[str]]:
         """查找系统中的日志文件"""
@@ -157,30 +216,42 @@ class LogParser:
         
         return dict(found_logs)
     
-    def extract_timestamp(self, line: str) -> Optional[datetime]:
-        """从日志行中提取时间戳"""
-        for pattern in self.time_patterns:
-            match = re.search(pattern, line)
+    def extract_timestamp(self, line: str, format_cache: Optional[Dict[str, int]] = None) -> Optional[datetime]:
+        """
+        从日志行中提取时间戳
+        
+        Args:
+            format_cache: 单个文件的时间格式缓存, 检测到格式后该文件的后续行先只尝试该格式
+        """
+        if format_cache is not None and 'index' in format_cache:
+            format_index = format_cache['index']
+            match = self._time_regexes[format_index].search(line)
             if match:
-                time_str = match.group(1)
-                
-                # 尝试解析不同格式的时间
-                time_formats = [
-                    '%Y-%m-%d %H:%M:%S',
-                    '%d/%b/%Y:%H:%M:%S',
-                    '%Y/%m/%d %H:%M:%S',
-                    '%b %d %H:%M:%S'
-                ]
-                
-                for fmt in time_formats:
-                    try:
-                        if fmt == '%b %d %H:%M:%S':
-                            # 为没有年份的格式添加当前年份
-                            time_str = f"{datetime.now().year} {time_str}"
-                            fmt = '%Y %b %d %H:%M:%S'
-                        return datetime.strptime(time_str, fmt)
-                    except ValueError:
-                        continue
+                timestamp = self._parse_time(match.group(1), format_index)
+                if timestamp:
+                    return timestamp
+        
+        # 每个时间模式只有一个分组, 命中的分组序号即模式序号; 合并正则取最左侧的匹配,
+        # 只有命中最高优先级的模式时才与逐个模式匹配的结果一致
+        match = self._time_regex.search(line)
+        if match is None:
+            return None
+        if match.lastindex == 1:
+            timestamp = self._parse_time(match.group(1), 0)
+            if timestamp:
+                if format_cache is not None:
+                    format_cache['index'] = 0
+                return timestamp
+        
+        # 按模式优先级逐个尝试, 解析失败时继续尝试下一个模式
+        for format_index, regex in enumerate(self._time_regexes):
+            match = regex.search(line)
+            if match:
+                timestamp = self._parse_time(match.group(1), format_index)
+                if timestamp:
+                    if format_cache is not None:
+                        format_cache['index'] = format_index
+                    return timestamp
         
         return None
     
@@ -188,20 +259,9 @@ class LogParser:
         """分类日志级别"""
         line_lower = line.lower()
         
-        # 检查critical级别
-        for pattern in self.error_patterns['critical']:
-            if re.search(pattern, line_lower):
-                return 'critical'
-        
-        # 检查error级别
-        for pattern in self.error_patterns['error']:
-            if re.search(pattern, line_lower):
-                return 'error'
-        
-        # 检查warning级别
-        for pattern in self.error_patterns['warning']:
-            if re.search(pattern, line_lower):
-                return 'warning'
+        for level, regex in self._level_regexes:
+            if regex.search(line_lower):
+                return level
         
         return 'info'
     
@@ -209,30 +269,99 @@ class LogParser:
         """提取服务特定的指标"""
         metrics = {}
         
-        if service in self.service_patterns:
-            patterns = self.service_patterns[service]
-            
-            for metric_name, pattern in patterns.items():
-                match = re.search(pattern, line, re.IGNORECASE)
-                if match:
-                    if metric_name == 'error_codes':
-                        metrics['http_status'] = int(match.group(1))
-                    elif metric_name == 'response_time':
-                        metrics['response_time'] = float(match.group(1))
-                    else:
-                        metrics[metric_name] = match.group(0)
+        prefilter = self._service_prefilters.get(service)
+        if prefilter is None or not prefilter.search(line):
+            return metrics
+        
+        for metric_name, regex in self._service_regexes[service]:
+            match = regex.search(line)
+            if match:
+                if metric_name == 'error_codes':
+                    metrics['http_status'] = int(match.group(1))
+                elif metric_name == 'response_time':
+                    metrics['response_time'] = float(match.group(1))
+                else:
+                    metrics[metric_name] = match.group(0)
         
         return metrics
     
-    def parse_log_file(self, file_path: str, service: str, 
-                      lines_limit: int = 1000, 
-                      time_window_hours: int = 24) -> Dict[str, Any]:
-        """解析单个日志文件"""
-        parsed_data = {
+    @staticmethod
+    def _tail_lines(f, start: int, end: int, lines_limit: int, block_size: int) -> List[bytes]:
+        """从 end 向前按块读取 [start, end) 区间内的最后 lines_limit 行, lines_limit <= 0 时读取全部行"""
+        position = end
+        blocks = []
+        newline_count = 0
+        
+        # 需要 lines_limit + 1 个换行符才能保证最早的一行完整
+        while position > start and (lines_limit <= 0 or newline_count <= lines_limit):
+            read_size = min(block_size, position - start)
+            position -= read_size
+            f.seek(position)
+            block = f.read(read_size)
+            blocks.append(block)
+            newline_count += block.count(b'\n')
+        
+        lines = b''.join(reversed(blocks)).split(b'\n')
+        if lines and lines[-1] == b'':
+            lines.pop()  # 以换行结尾
+        if position > start:
+            lines = lines[1:]  # 丢弃不完整的第一行
+        if lines_limit > 0:
+            lines = lines[-lines_limit:]
+        return lines
+    
+    @staticmethod
+    def _last_line_end(f, start: int, end: int, block_size: int) -> int:
+        """返回 [start, end) 区间内最后一个换行符之后的偏移量, 没有换行符时返回 start"""
+        position = end
+        while position > start:
+            read_size = min(block_size, position - start)
+            position -= read_size
+            f.seek(position)
+            index = f.read(read_size).rfind(b'\n')
+            if index >= 0:
+                return position + index + 1
+        return start
+    
+    def read_last_lines(self, file_path: str, lines_limit: int,
+                        block_size: int = 64 * 1024) -> Tuple[List[str], int]:
+        """
+        从文件末尾向前按块读取最后 lines_limit 行, 不读取整个文件
+        
+        Returns:
+            (按文件顺序的行列表, 文件大小), lines_limit <= 0 时读取全部行
+        """
+        with open(file_path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            file_size = f.tell()
+            lines = self._tail_lines(f, 0, file_size, lines_limit, block_size)
+        
+        return [line.decode('utf-8', errors='ignore') for line in lines], file_size
+    
+    def read_new_lines(self, file_path: str, offset: int, lines_limit: int,
+                       block_size: int = 64 * 1024) -> Tuple[List[str], int, int]:
+        """
+        读取偏移量 offset 之后新写入的完整行 (最多最后 lines_limit 行), 未以换行结尾的行留到下次读取
+        
+        Returns:
+            (按文件顺序的行列表, 已读取到的偏移量, 文件大小)
+        """
+        with open(file_path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            file_size = f.tell()
+            end = self._last_line_end(f, offset, file_size, block_size)
+            lines = self._tail_lines(f, offset, end, lines_limit, block_size)
+        
+        return [line.decode('utf-8', errors='ignore') for line in lines], end, file_size
+    
+    def _new_file_data(self, file_path: str, service: str) -> Dict[str, Any]:
+        """单个文件的空解析结果"""
+        return {
             'file_path': file_path,
             'service': service,
             'parse_time': datetime.now().isoformat(),
             'total_lines': 0,
+            'file_size': 0,
             'parsed_lines': 0,
             'log_entries': [],
             'summary': {
@@ -242,73 +371,228 @@ class LogParser:
                 'service_metrics': defaultdict(list)
             }
         }
+    
+    def _parse_lines(self, lines: List[str], service: str, cutoff_time: datetime,
+                     format_cache: Dict[str, int]) -> List[Dict[str, Any]]:
+        """从最新的一行开始解析, 返回时间窗口内的日志条目(最新的在前)"""
+        entries = []
+        for line in reversed(lines):
+            line = line.strip()
+            if not line:
+                continue
+            
+            # 提取时间戳
+            timestamp = self.extract_timestamp(line, format_cache)
+            if timestamp and timestamp < cutoff_time:
+                continue  # 跳过超出时间窗口的日志
+            
+            # 构建日志条目: 分类日志级别, 提取服务指标
+            entries.append({
+                'timestamp': timestamp.isoformat() if timestamp else None,
+                'level': self.classify_log_level(line),
+                'message': line,
+                'service_metrics': self.extract_service_metrics(line, service)
+            })
+        
+        return entries
+    
+    @staticmethod
+    def _summarize_entries(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """统计日志条目 (entries 按最新的在前排列)"""
+        summary = {
+            'by_level': Counter(),
+            'by_hour': defaultdict(int),
+            'error_keywords': Counter(),
+            'service_metrics': defaultdict(list)
+        }
+        
+        for entry in entries:
+            log_level = entry['level']
+            summary['by_level'][log_level] += 1
+            
+            timestamp = entry['timestamp']
+            if timestamp:
+                hour_key = f"{timestamp[:10]} {timestamp[11:13]}:00"
+                summary['by_hour'][hour_key] += 1
+            
+            # 提取错误关键词
+            if log_level in ['error', 'critical']:
+                for word in entry['message'].lower().split():
+                    if len(word) > 3:  # 过滤短词
+                        summary['error_keywords'][word] += 1
+            
+            # 记录服务指标
+            for metric, value in entry['service_metrics'].items():
+                summary['service_metrics'][metric].append(value)
+        
+        return summary
+    
+    def parse_log_file(self, file_path: str, service: str, 
+                      lines_limit: int = 1000, 
+                      time_window_hours: int = 24) -> Dict[str, Any]:
+        """解析单个日志文件"""
+        parsed_data = self._new_file_data(file_path, service)
         
         # 计算时间窗口
         cutoff_time = datetime.now() - timedelta(hours=time_window_hours)
         
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                lines = f.readlines()
-                parsed_data['total_lines'] = len(lines)
-                
-                # 从文件末尾开始读取，获取最新的日志
-                for line in reversed(lines[-lines_limit:]):
-                    line = line.strip()
-                    if not line:
-                        continue
-                    
-                    # 提取时间戳
-                    timestamp = self.extract_timestamp(line)
-                    if timestamp and timestamp < cutoff_time:
-                        continue  # 跳过超出时间窗口的日志
-                    
-                    # 分类日志级别
-                    log_level = self.classify_log_level(line)
-                    
-                    # 提取服务指标
-                    service_metrics = self.extract_service_metrics(line, service)
-                    
-                    # 构建日志条目
-                    log_entry = {
-                        'timestamp': timestamp.isoformat() if timestamp else None,
-                        'level': log_level,
-                        'message': line,
-                        'service_metrics': service_metrics
-                    }
-                    
-                    parsed_data['log_entries'].append(log_entry)
-                    parsed_data['parsed_lines'] += 1
-                    
-                    # 更新统计
-                    parsed_data['summary']['by_level'][log_level] += 1
-                    
-                    if timestamp:
-                        hour_key = timestamp.strftime('%Y-%m-%d %H:00')
-                        parsed_data['summary']['by_hour'][hour_key] += 1
-                    
-                    # 提取错误关键词
-                    if log_level in ['error', 'critical']:
-                        words = line.lower().split()
-                        for word in words:
-                            if len(word) > 3:  # 过滤短词
-                                parsed_data['summary']['error_keywords'][word] += 1
-                    
-                    # 记录服务指标
-                    for metric, value in service_metrics.items():
-                        parsed_data['summary']['service_metrics'][metric].append(value)
-                
-                # 倒序回正序
-                parsed_data['log_entries'].reverse()
-                
+            # 从文件末尾向前读取最新的日志, total_lines 为读取的行数
+            lines, parsed_data['file_size'] = self.read_last_lines(file_path, lines_limit)
+            parsed_data['total_lines'] = len(lines)
+            
+            entries = self._parse_lines(lines, service, cutoff_time, {})
+            parsed_data['parsed_lines'] = len(entries)
+            parsed_data['summary'] = self._summarize_entries(entries)
+            
+            # 倒序回正序
+            parsed_data['log_entries'] = entries[::-1]
+            
         except Exception as e:
             self.logger.error(f"解析日志文件失败 {file_path}: {e}")
             parsed_data['error'] = str(e)
         
         return parsed_data
     
+    def parse_log_file_incremental(self, file_path: str, service: str,
+                                   checkpoint: Optional[Dict[str, Any]] = None,
+                                   lines_limit: int = 1000,
+                                   time_window_hours: int = 24) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        """
+        从检查点继续解析单个日志文件, 只处理检查点之后新写入的完整行
+        
+        文件 inode 变化(轮转)或大小小于检查点偏移量(截断)时从文件开头重新读取
+        
+        Returns:
+            (本次新解析的数据, 新检查点); 数据中 continued 表示是否接续检查点,
+            接续时需与之前的解析结果合并
+        """
+        parsed_data = self._new_file_data(file_path, service)
+        cutoff_time = datetime.now() - timedelta(hours=time_window_hours)
+        
+        try:
+            stat = os.stat(file_path)
+            continued = (
+                checkpoint is not None
+                and checkpoint.get('inode') == stat.st_ino
+                and checkpoint.get('offset', 0) <= stat.st_size
+            )
+            offset = checkpoint['offset'] if continued else 0
+            
+            lines, end_offset, parsed_data['file_size'] = self.read_new_lines(file_path, offset, lines_limit)
+            parsed_data['total_lines'] = len(lines)
+            parsed_data['continued'] = continued
+            
+            # 沿用该文件已检测到的时间格式
+            format_cache = {}
+            if continued and checkpoint.get('format_index') is not None:
+                format_cache['index'] = checkpoint['format_index']
+            
+            entries = self._parse_lines(lines, service, cutoff_time, format_cache)
+            parsed_data['parsed_lines'] = len(entries)
+            parsed_data['summary'] = self._summarize_entries(entries)
+            parsed_data['log_entries'] = entries[::-1]
+            
+            last_timestamp = next((entry['timestamp'] for entry in entries if entry['timestamp']), None)
+            if last_timestamp is None and continued:
+                last_timestamp = checkpoint.get('last_timestamp')
+            
+            new_checkpoint = {
+                'inode': stat.st_ino,
+                'offset': end_offset,
+                'last_timestamp': last_timestamp,
+                'format_index': format_cache.get('index')
+            }
+            return parsed_data, new_checkpoint
+            
+        except Exception as e:
+            self.logger.error(f"解析日志文件失败 {file_path}: {e}")
+            parsed_data['error'] = str(e)
+            return parsed_data, checkpoint
+    
+    def _merge_file_data(self, previous: Dict[str, Any], current: Dict[str, Any],
+                         lines_limit: int, cutoff_time: datetime) -> Dict[str, Any]:
+        """将新解析的条目合并到之前的文件解析结果, 丢弃超出时间窗口的条目并保留最新 lines_limit 条"""
+        entries = previous.get('log_entries', []) + current['log_entries']
+        entries = [
+            entry for entry in entries
+            if not entry.get('timestamp') or datetime.fromisoformat(entry['timestamp']) >= cutoff_time
+        ]
+        if lines_limit > 0:
+            entries = entries[-lines_limit:]
+        
+        merged = dict(current)
+        merged['total_lines'] = previous.get('total_lines', 0) + current['total_lines']
+        merged['parsed_lines'] = len(entries)
+        merged['log_entries'] = entries
+        merged['summary'] = self._summarize_entries(entries[::-1])
+        return merged
+    
+    def _load_checkpoints(self) -> Dict[str, Dict[str, Any]]:
+        """加载文件检查点"""
+        try:
+            with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def _save_checkpoints(self, checkpoints: Dict[str, Dict[str, Any]]):
+        """写入临时文件后替换, 避免中断时留下不完整的检查点"""
+        temp_file = self.checkpoint_file.with_name(self.checkpoint_file.name + ".tmp")
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(checkpoints, f, ensure_ascii=False, indent=2)
+        os.replace(temp_file, self.checkpoint_file)
+    
+    def _load_previous_files(self) -> Dict[str, Dict[str, Any]]:
+        """加载上次保存的各文件解析结果 (文件路径 -> 文件数据), 条目从明细文件中恢复"""
+        try:
+            with open(self.parsed_logs_file, 'r', encoding='utf-8') as f:
+                parsed_data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        
+        previous_files = {
+            file_data['file_path']: file_data
+            for service_data in parsed_data.get('services', {}).values()
+            for file_data in service_data.get('files', [])
+        }
+        
+        # 摘要文档不含条目时从明细文件恢复 (旧版结果的条目直接内嵌在文件数据中)
+        if any('log_entries' not in file_data for file_data in previous_files.values()):
+            entries_by_file = defaultdict(list)
+            for entry in self.iter_log_entries():
+                entries_by_file[entry.pop('file_path')].append(entry)
+            for file_path, file_data in previous_files.items():
+                if 'log_entries' not in file_data:
+                    file_data['log_entries'] = entries_by_file.get(file_path, [])
+        
+        for file_data in previous_files.values():
+            for entry in file_data['log_entries']:
+                entry.pop('service', None)
+        return previous_files
+    
+    def _run_parse_jobs(self, jobs: List[Tuple], n_jobs: int) -> List[Any]:
+        """执行文件解析任务 (方法名, 参数...), n_jobs 不为 1 时在进程池中并行, 结果按任务顺序返回"""
+        if n_jobs == 1 or len(jobs) < 2:
+            return [getattr(self, method)(*args) for method, *args in jobs]
+        
+        max_workers = os.cpu_count() if n_jobs <= 0 else n_jobs
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(jobs))) as executor:
+            futures = [executor.submit(getattr(self, method), *args) for method, *args in jobs]
+            return [future.result() for future in futures]
+    
     def parse_all_logs(self, time_window_hours: int = 24, 
-                      lines_per_file: int = 1000) -> Dict[str, Any]:
-        """解析所有找到的日志文件"""
+                      lines_per_file: int = 1000,
+                      incremental: bool = False,
+                      n_jobs: Optional[int] = None) -> Dict[str, Any]:
+        """
+        解析所有找到的日志文件
+        
+        Args:
+            incremental: 是否从检查点继续解析, 只处理新写入的行并合并到上次的解析结果;
+                         为 False 时从文件开头重新解析, 并将检查点更新为本次读取到的位置
+            n_jobs: 并行解析的进程数, 默认使用初始化时的设置
+        """
         self.logger.info("开始解析日志文件...")
         
         # 查找日志文件
@@ -333,6 +617,35 @@ class LogParser:
             self.logger.warning("未找到任何日志文件")
             return all_parsed_data
         
+        # 解析全部文件 (可并行), 结果按文件顺序返回
+        n_jobs = self.n_jobs if n_jobs is None else n_jobs
+        file_list = [(service, log_file) for service, log_files in found_logs.items() for log_file in log_files]
+        # 全量解析不使用检查点从头读取, 但同样记录读取到的偏移量,
+        # 否则之后的增量解析会从旧检查点继续, 重复合并全量解析已保存的行
+        checkpoints = self._load_checkpoints() if incremental else {}
+        previous_files = self._load_previous_files() if incremental else {}
+        results = self._run_parse_jobs([
+            ('parse_log_file_incremental', log_file, service, checkpoints.get(log_file),
+             lines_per_file, time_window_hours)
+            for service, log_file in file_list
+        ], n_jobs)
+        
+        cutoff_time = datetime.now() - timedelta(hours=time_window_hours)
+        parsed_files = {}
+        new_checkpoints = {}
+        for (service, log_file), (file_data, checkpoint) in zip(file_list, results):
+            previous = previous_files.get(log_file)
+            if file_data.pop('continued', False) and previous is not None:
+                file_data = self._merge_file_data(previous, file_data, lines_per_file, cutoff_time)
+            parsed_files[log_file] = file_data
+            if checkpoint is not None:
+                new_checkpoints[log_file] = checkpoint
+        
+        try:
+            self._save_checkpoints(new_checkpoints)
+        except Exception as e:
+            self.logger.error(f"保存日志检查点失败: {e}")
+        
         # 解析每个服务的日志
         for service, log_files in found_logs.items():
             self.logger.info(f"解析 {service} 服务日志，共 {len(log_files)} 个文件")
@@ -349,9 +662,7 @@ class LogParser:
             }
             
             for log_file in log_files:
-                file_data = self.parse_log_file(
-                    log_file, service, lines_per_file, time_window_hours
-                )
+                file_data = parsed_files[log_file]
                 service_data['files'].append(file_data)
                 
                 # 更新服务统计
@@ -407,12 +718,72 @@ class LogParser:
         
         return all_parsed_data
     
+    @staticmethod
+    def _compact_metric_values(values: List[Any]) -> Dict[str, Any]:
+        """将服务指标的原始取值列表压缩为统计值 (数值取 count/min/max/avg, 其余取出现最多的取值)"""
+        numbers = [value for value in values if isinstance(value, (int, float)) and not isinstance(value, bool)]
+        if numbers and len(numbers) == len(values):
+            return {
+                'count': len(numbers),
+                'min': min(numbers),
+                'max': max(numbers),
+                'avg': sum(numbers) / len(numbers)
+            }
+        return {
+            'count': len(values),
+            'top_values': dict(Counter(str(value) for value in values).most_common(10))
+        }
+    
+    def _build_summary_document(self, parsed_data: Dict[str, Any]) -> Dict[str, Any]:
+        """构建不含日志条目的摘要文档, 服务指标压缩为统计值, 并按服务汇总小时分布"""
+        services = {}
+        for service, service_data in parsed_data['services'].items():
+            by_hour = Counter()
+            files = []
+            for file_data in service_data['files']:
+                by_hour.update(file_data['summary']['by_hour'])
+                file_summary = dict(file_data['summary'])
+                file_summary['service_metrics'] = {
+                    metric: self._compact_metric_values(values)
+                    for metric, values in file_data['summary']['service_metrics'].items()
+                }
+                file_doc = {key: value for key, value in file_data.items() if key != 'log_entries'}
+                file_doc['summary'] = file_summary
+                file_doc['entries_count'] = len(file_data['log_entries'])
+                files.append(file_doc)
+            
+            service_summary = dict(service_data['summary'])
+            service_summary['by_hour'] = dict(sorted(by_hour.items()))
+            service_summary['service_metrics'] = {
+                metric: self._compact_metric_values(values)
+                for metric, values in service_data['summary']['service_metrics'].items()
+            }
+            services[service] = dict(service_data, files=files, summary=service_summary)
+        
+        return dict(parsed_data, services=services, entries_file=self.entries_file.name)
+    
+    def _save_entries(self, parsed_data: Dict[str, Any]):
+        """逐条写入日志条目明细 (JSONL), 写入临时文件后替换"""
+        temp_file = self.entries_file.with_name(self.entries_file.name + ".tmp")
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            for service, service_data in parsed_data['services'].items():
+                for file_data in service_data['files']:
+                    for entry in file_data['log_entries']:
+                        record = {'service': service, 'file_path': file_data['file_path']}
+                        record.update(entry)
+                        f.write(json.dumps(record, ensure_ascii=False))
+                        f.write('\n')
+        os.replace(temp_file, self.entries_file)
+    
     def save_parsed_logs(self, parsed_data: Dict[str, Any]):
-        """保存解析结果"""
+        """保存解析结果: 日志条目明细写入 JSONL 文件, parsed_logs.json 只保存摘要"""
         try:
-            # 保存详细数据
+            # 先写明细, 保证摘要文档引用的条目已存在
+            self._save_entries(parsed_data)
+            
+            # 保存摘要文档
             with open(self.parsed_logs_file, 'w', encoding='utf-8') as f:
-                json.dump(parsed_data, f, ensure_ascii=False, indent=2)
+                json.dump(self._build_summary_document(parsed_data), f, ensure_ascii=False, indent=2)
             
             # 保存摘要数据
             summary = {
@@ -437,48 +808,37 @@ class LogParser:
         except Exception as e:
             self.logger.error(f"保存解析结果失败: {e}")
     
+    def iter_log_entries(self, services: Optional[List[str]] = None,
+                         levels: Optional[List[str]] = None):
+        """流式读取已保存的日志条目明细, 可按服务和级别过滤"""
+        return iter_parsed_log_entries(self.entries_file, services, levels)
+    
     def get_error_patterns(self, service: str = None) -> List[Dict[str, Any]]:
         """获取错误模式"""
         try:
-            with open(self.parsed_logs_file, 'r', encoding='utf-8') as f:
-                parsed_data = json.load(f)
+            # 流式读取错误和critical级别的日志, 按文件和小时分组
+            hourly_errors = {}
+            services = [service] if service else None
+            for entry in self.iter_log_entries(services, ['error', 'critical']):
+                if entry['timestamp']:
+                    hour = entry['timestamp'][:13] + ':00:00'  # 取到小时
+                    file_errors = hourly_errors.setdefault((entry['service'], entry['file_path']), defaultdict(list))
+                    file_errors[hour].append(entry)
             
             patterns = []
-            
-            # 如果指定服务，只返回该服务的模式
-            if service and service in parsed_data['services']:
-                services_to_check = {service: parsed_data['services'][service]}
-            else:
-                services_to_check = parsed_data['services']
-            
-            for svc, svc_data in services_to_check.items():
-                for file_data in svc_data['files']:
-                    # 分析错误和critical级别的日志
-                    error_entries = [
-                        entry for entry in file_data['log_entries']
-                        if entry['level'] in ['error', 'critical']
-                    ]
-                    
-                    if error_entries:
-                        # 按小时分组错误
-                        hourly_errors = defaultdict(list)
-                        for entry in error_entries:
-                            if entry['timestamp']:
-                                hour = entry['timestamp'][:13] + ':00:00'  # 取到小时
-                                hourly_errors[hour].append(entry)
-                        
-                        # 找出错误频繁的时段
-                        for hour, entries in hourly_errors.items():
-                            if len(entries) >= 3:  # 一小时内3个或以上错误
-                                pattern = {
-                                    'service': svc,
-                                    'time_period': hour,
-                                    'error_count': len(entries),
-                                    'severity': 'high' if any(e['level'] == 'critical' for e in entries) else 'medium',
-                                    'sample_messages': [e['message'][:100] for e in entries[:3]],
-                                    'common_keywords': self._extract_common_keywords([e['message'] for e in entries])
-                                }
-                                patterns.append(pattern)
+            for (svc, _), file_errors in hourly_errors.items():
+                # 找出错误频繁的时段
+                for hour, entries in file_errors.items():
+                    if len(entries) >= 3:  # 一小时内3个或以上错误
+                        pattern = {
+                            'service': svc,
+                            'time_period': hour,
+                            'error_count': len(entries),
+                            'severity': 'high' if any(e['level'] == 'critical' for e in entries) else 'medium',
+                            'sample_messages': [e['message'][:100] for e in entries[:3]],
+                            'common_keywords': self._extract_common_keywords([e['message'] for e in entries])
+                        }
+                        patterns.append(pattern)
             
             return patterns
             
@@ -498,6 +858,36 @@ class LogParser:
         return [word for word, count in word_counts.items() if count >= 2]
 
 
+def iter_parsed_log_entries(entries_file: str, services: Optional[List[str]] = None,
+                            levels: Optional[List[str]] = None):
+    """
+    逐行读取日志条目明细文件 (parsed_log_entries.jsonl), 不将整个文件载入内存
+    
+    Args:
+        services: 只返回这些服务的条目, None 表示全部
+        levels: 只返回这些级别的条目, None 表示全部
+    """
+    entries_file = Path(entries_file)
+    if not entries_file.exists():
+        return
+    
+    services = set(services) if services is not None else None
+    levels = set(levels) if levels is not None else None
+    with open(entries_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # 跳过未写完整的行
+            if services is not None and entry.get('service') not in services:
+                continue
+            if levels is not None and entry.get('level') not in levels:
+                continue
+            yield entry
+
+
 def main():
     """主函数演示"""
     parser = LogParser(output_dir="data")
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流水线阶段缓存模块 - 记录每个阶段输入与输出的内容摘要, 输入未变化的阶段直接复用上次结果
+"""
+
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Iterable
+
+# JSON 输入文件中只表示运行时刻的顶层字段, 不参与内容摘要
+RUN_STAMP_KEYS = ('parse_time', 'detection_time', 'extraction_time', 'generation_time')
+
+
+def digest_value(value: Any) -> str:
+    """计算可JSON序列化对象的摘要 (键排序, 与字典顺序无关)"""
+    encoded = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+
+def _digest_file_content(path: Path) -> str:
+    """计算文件内容摘要, JSON 文件去掉顶层的运行时刻字段后再计算"""
+    if path.suffix == '.json':
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                for key in RUN_STAMP_KEYS:
+                    data.pop(key, None)
+            return digest_value(data)
+        except (OSError, ValueError):
+            pass
+
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+class PipelineCache:
+    """流水线阶段缓存
+
+    每个阶段记录 输入摘要(输入文件内容 + 阶段配置)、输出文件摘要和阶段结果。
+    输入摘要与上次相同且输出文件未被改动时, 该阶段可跳过并返回上次结果。
+    文件摘要按 (大小, 修改时间) 记忆, 未变化的文件(如历史指标分区)不会重复读取
+    """
+
+    def __init__(self, cache_file: str):
+        self.cache_file = Path(cache_file)
+        self.logger = logging.getLogger(__name__)
+
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        # 路径 -> [大小, 修改时间(ns), 摘要]
+        self.file_digests: Dict[str, List[Any]] = {}
+        self._load()
+
+    def _load(self):
+        """加载缓存清单, 文件不存在或损坏时从空缓存开始"""
+        if not self.cache_file.exists():
+            return
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.stages = data.get('stages', {})
+            self.file_digests = data.get('file_digests', {})
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"加载流水线缓存失败, 将重新执行所有阶段: {e}")
+
+    def save(self):
+        """写入临时文件后替换, 避免中断时留下不完整的缓存清单"""
+        # 已删除的文件(如过期分区)不再保留摘要
+        self.file_digests = {path: value for path, value in self.file_digests.items() if os.path.exists(path)}
+        temp_file = self.cache_file.with_name(self.cache_file.name + ".tmp")
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({'stages': self.stages, 'file_digests': self.file_digests},
+                      f, ensure_ascii=False, indent=2, default=str)
+        os.replace(temp_file, self.cache_file)
+
+    def digest_file(self, path: Path) -> Optional[str]:
+        """单个文件的内容摘要, 文件不存在时返回 None"""
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+
+        key = str(path)
+        cached = self.file_digests.get(key)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+
+        digest = _digest_file_content(path)
+        self.file_digests[key] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def _expand(self, paths: Iterable[Path]) -> List[Path]:
+        """展开目录为其下的全部文件 (按路径排序)"""
+        files = []
+        for path in paths:
+            path = Path(path)
+            if path.is_dir():
+                files.extend(sorted(p for p in path.rglob('*') if p.is_file()))
+            else:
+                files.append(path)
+        return files
+
+    def digest_paths(self, paths: Iterable[Path]) -> Dict[str, Optional[str]]:
+        """一组文件/目录的 {文件路径: 摘要}"""
+        return {str(path): self.digest_file(path) for path in self._expand(paths)}
+
+    def digest_inputs(self, paths: Iterable[Path], config: Optional[Dict[str, Any]] = None) -> str:
+        """阶段输入摘要: 输入文件内容摘要 + 阶段配置"""
+        return digest_value({'files': self.digest_paths(paths), 'config': config or {}})
+
+    def is_fresh(self, stage: str, input_digest: str) -> bool:
+        """阶段输入与上次成功执行时相同, 且其输出文件未被改动"""
+        entry = self.stages.get(stage)
+        if not entry or entry.get('input_digest') != input_digest:
+            return False
+        outputs = entry.get('outputs', {})
+        return all(self.digest_file(Path(path)) == digest for path, digest in outputs.items())
+
+    def cached_result(self, stage: str) -> Optional[Dict[str, Any]]:
+        """阶段上次成功执行的结果"""
+        entry = self.stages.get(stage)
+        return dict(entry['result']) if entry and 'result' in entry else None
+
+    def record(self, stage: str, input_digest: str, output_paths: Iterable[Path], result: Dict[str, Any]):
+        """记录阶段成功执行后的输入摘要、输出文件摘要和结果"""
+        self.stages[stage] = {
+            'input_digest': input_digest,
+            'outputs': self.digest_paths(output_paths),
+            'result': result,
+            'recorded_at': datetime.now().isoformat()
+        }
+        self.save()
+
+    def invalidate(self, stage: Optional[str] = None):
+        """清除指定阶段(默认全部阶段)的缓存记录"""
+        if stage is None:
+            self.stages.clear()
+        else:
+            self.stages.pop(stage, None)
+        self.save()
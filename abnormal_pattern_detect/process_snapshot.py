@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+进程快照模块 - 每个采集周期只遍历一次进程表, 供进程指标、服务详情和扫描器共用
+"""
+
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Iterable
+
+import psutil
+
+
+class ProcessSnapshot:
+    """进程表快照
+
+    创建时只遍历一次进程表并记录 pid/名称; 按服务名称模式匹配时使用编译后的
+    组合正则一次筛选, 仅对命中的进程在 oneshot() 中读取详细指标并缓存
+    """
+
+    def __init__(self):
+        """遍历进程表创建快照"""
+        self.time = time.time()
+        self.timestamp = datetime.fromtimestamp(self.time).isoformat()
+
+        self._processes = []
+        for proc in psutil.process_iter(['pid', 'name']):
+            name = proc.info['name'] or ''
+            self._processes.append((proc, name.lower()))
+
+        self._details: Dict[int, Dict[str, Any]] = {}
+        self._matchers: Dict[tuple, Any] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def process_count(self) -> int:
+        """快照中的进程数量"""
+        return len(self._processes)
+
+    def _matcher(self, patterns: tuple):
+        """编译并缓存一组名称模式的组合正则"""
+        matcher = self._matchers.get(patterns)
+        if matcher is None:
+            matcher = re.compile('|'.join(re.escape(pattern) for pattern in patterns))
+            self._matchers[patterns] = matcher
+        return matcher
+
+    def _read_details(self, proc, with_connections: bool) -> Optional[Dict[str, Any]]:
+        """在oneshot()中一次读取进程详细指标, 结果按pid缓存"""
+        with self._lock:
+            details = self._details.get(proc.pid)
+            if details is not None and (not with_connections or 'connections' in details):
+                return details
+
+        try:
+            with proc.oneshot():
+                if details is None:
+                    try:
+                        memory_rss = proc.memory_info().rss
+                    except (psutil.NoSuchProcess, psutil.AccessDenied):
+                        memory_rss = 0
+                    details = {
+                        'pid': proc.pid,
+                        'name': proc.info['name'],
+                        'status': proc.status(),
+                        'cpu_percent': proc.cpu_percent() or 0,
+                        'memory_percent': proc.memory_percent() or 0,
+                        'memory_rss': memory_rss,
+                        'create_time': proc.create_time()
+                    }
+                if with_connections:
+                    try:
+                        details['connections'] = len(proc.connections())
+                    except (psutil.NoSuchProcess, psutil.AccessDenied):
+                        details['connections'] = 0
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            return None
+
+        with self._lock:
+            self._details[proc.pid] = details
+        return details
+
+    def match(self, patterns: Iterable[str], with_connections: bool = False) -> List[Dict[str, Any]]:
+        """
+        返回名称(小写)包含任一模式的进程详细指标
+        :param with_connections: 是否读取每个进程的网络连接数(开销较大)
+        """
+        patterns = tuple(patterns)
+        if not patterns:
+            return []
+
+        matcher = self._matcher(patterns)
+        matched = []
+        for proc, name in self._processes:
+            if matcher.search(name):
+                details = self._read_details(proc, with_connections)
+                if details is not None:
+                    matched.append(details)
+        return matched
+
+    def group_by_pattern(self, patterns: Iterable[str],
+                         with_connections: bool = False) -> Dict[str, List[Dict[str, Any]]]:
+        """按模式分组返回匹配的进程, 一个进程可能同时属于多个模式(如 mysqld 同时匹配 mysql)"""
+        patterns = tuple(patterns)
+        groups = {pattern: [] for pattern in patterns}
+        for details in self.match(patterns, with_connections):
+            name = (details['name'] or '').lower()
+            for pattern in patterns:
+                if pattern in name:
+                    groups[pattern].append(details)
+        return groups
+
+
+_snapshot: Optional[ProcessSnapshot] = None
+_snapshot_lock = threading.Lock()
+
+
+def get_snapshot(max_age: float = 5.0) -> ProcessSnapshot:
+    """
+    获取进程内共享的进程快照
+    :param max_age: 允许的快照最大时效(秒), 超过则重新遍历进程表
+    """
+    global _snapshot
+    with _snapshot_lock:
+        if _snapshot is None or time.time() - _snapshot.time > max_age:
+            _snapshot = ProcessSnapshot()
+        return _snapshot
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+扫描结果存储模块 - 以 SQLite(WAL) 保存扫描器结果, 替代不断累积的 scan_results_<服务>_<时间>.json 文件
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, date
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+
+class ScanResultStore:
+    """扫描结果存储
+
+    scan_results 表按 (service, scan_time) 建索引, latest_results 表为每个服务
+    保存最新结果的行号, 查询最新结果只需一次主键查找, 与历史记录数量无关。
+    超过保留天数或单服务保留条数的历史结果在每天第一次写入时清理并增量回收空间
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS scan_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            service TEXT NOT NULL,
+            scan_time TEXT NOT NULL,
+            status TEXT,
+            severity_score REAL,
+            total_anomalies INTEGER,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_scan_results_service_time ON scan_results (service, scan_time);
+        CREATE INDEX IF NOT EXISTS idx_scan_results_time ON scan_results (scan_time);
+        CREATE TABLE IF NOT EXISTS latest_results (
+            service TEXT PRIMARY KEY,
+            result_id INTEGER NOT NULL,
+            scan_time TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS store_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    def __init__(self, db_path: str, retention_days: int = 7, max_results_per_service: int = 200):
+        """
+        初始化扫描结果存储
+        :param db_path: 数据库文件路径
+        :param retention_days: 历史结果保留天数, 0 表示不按时间清理
+        :param max_results_per_service: 每个服务保留的最多结果数, 0 表示不限制
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.retention_days = retention_days
+        self.max_results_per_service = max_results_per_service
+
+        self._retention_day: Optional[date] = None
+        self._retention_lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+        with self._connect() as conn:
+            # 增量回收需在建表前设置
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(self.SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """打开一个连接, 正常结束时提交, 出错时回滚"""
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        try:
+            conn.execute("PRAGMA synchronous=NORMAL")
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _insert(conn, scan_data: Dict[str, Any], service: Optional[str] = None) -> int:
+        """写入一条扫描结果并更新该服务的最新结果索引"""
+        service = service or scan_data.get('service_name', 'unknown')
+        scan_time = scan_data.get('scan_start_time') or datetime.now().isoformat()
+        summary = scan_data.get('summary', {})
+
+        cursor = conn.execute(
+            "INSERT INTO scan_results (service, scan_time, status, severity_score, total_anomalies, data) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (service, scan_time, summary.get('status'), summary.get('severity_score'),
+             summary.get('total_anomalies'), json.dumps(scan_data, ensure_ascii=False, default=str))
+        )
+        result_id = cursor.lastrowid
+        conn.execute(
+            "INSERT INTO latest_results (service, result_id, scan_time) VALUES (?, ?, ?) "
+            "ON CONFLICT(service) DO UPDATE SET result_id = excluded.result_id, scan_time = excluded.scan_time "
+            "WHERE excluded.scan_time >= latest_results.scan_time",
+            (service, result_id, scan_time)
+        )
+        return result_id
+
+    def save(self, scan_data: Dict[str, Any], service: Optional[str] = None) -> int:
+        """保存一次扫描结果, 返回结果ID"""
+        with self._connect() as conn:
+            result_id = self._insert(conn, scan_data, service)
+
+        today = date.today()
+        with self._retention_lock:
+            if self._retention_day != today:
+                self._retention_day = today
+                try:
+                    self.apply_retention()
+                except sqlite3.Error as e:
+                    self.logger.warning(f"清理过期扫描结果失败: {e}")
+        return result_id
+
+    def latest(self, service: str) -> Optional[Dict[str, Any]]:
+        """获取某个服务最新的扫描结果"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT r.data FROM latest_results l JOIN scan_results r ON r.id = l.result_id "
+                "WHERE l.service = ?",
+                (service,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def latest_summaries(self) -> Dict[str, Dict[str, Any]]:
+        """每个服务最新一次扫描的摘要 (不解析完整结果)"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT l.service, r.scan_time, r.status, r.severity_score, r.total_anomalies "
+                "FROM latest_results l JOIN scan_results r ON r.id = l.result_id ORDER BY l.service"
+            ).fetchall()
+        return {
+            service: {
+                'scan_time': scan_time,
+                'status': status,
+                'severity_score': severity_score,
+                'total_anomalies': total_anomalies
+            }
+            for service, scan_time, status, severity_score, total_anomalies in rows
+        }
+
+    def history(self, service: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """某个服务最近的扫描摘要, 按时间倒序"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, scan_time, status, severity_score, total_anomalies FROM scan_results "
+                "WHERE service = ? ORDER BY scan_time DESC LIMIT ?",
+                (service, limit)
+            ).fetchall()
+        return [
+            {
+                'id': result_id,
+                'scan_time': scan_time,
+                'status': status,
+                'severity_score': severity_score,
+                'total_anomalies': total_anomalies
+            }
+            for result_id, scan_time, status, severity_score, total_anomalies in rows
+        ]
+
+    def apply_retention(self) -> int:
+        """删除超过保留天数或超出单服务保留条数的结果(各服务的最新结果始终保留), 并回收空间"""
+        removed = 0
+        with self._connect() as conn:
+            if self.retention_days > 0:
+                cutoff = (datetime.now() - timedelta(days=self.retention_days)).isoformat()
+                removed += conn.execute(
+                    "DELETE FROM scan_results WHERE scan_time < ? "
+                    "AND id NOT IN (SELECT result_id FROM latest_results)",
+                    (cutoff,)
+                ).rowcount
+
+            if self.max_results_per_service > 0:
+                removed += conn.execute(
+                    "DELETE FROM scan_results WHERE id IN ("
+                    "  SELECT id FROM ("
+                    "    SELECT id, ROW_NUMBER() OVER (PARTITION BY service ORDER BY scan_time DESC, id DESC) AS rank"
+                    "    FROM scan_results"
+                    "  ) WHERE rank > ?"
+                    ") AND id NOT IN (SELECT result_id FROM latest_results)",
+                    (self.max_results_per_service,)
+                ).rowcount
+
+        if removed:
+            self.compact()
+            self.logger.info(f"已清理 {removed} 条过期扫描结果: {self.db_path}")
+        return removed
+
+    def compact(self):
+        """回收已删除记录占用的页面并截断WAL文件"""
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        try:
+            conn.execute("PRAGMA incremental_vacuum")
+            conn.commit()
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            conn.close()
+
+    def import_json_files(self, results_dir: str) -> int:
+        """导入旧版 scan_results_<服务>_<时间>.json 文件 (只执行一次), 返回导入的结果数"""
+        results_dir = Path(results_dir)
+        with self._connect() as conn:
+            if conn.execute("SELECT 1 FROM store_meta WHERE key = 'json_imported'").fetchone():
+                return 0
+
+            imported = 0
+            for path in sorted(results_dir.glob("scan_results_*.json")):
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        scan_data = json.load(f)
+                except (OSError, ValueError) as e:
+                    self.logger.warning(f"导入旧版扫描结果失败 {path.name}: {e}")
+                    continue
+                if isinstance(scan_data, dict):
+                    self._insert(conn, scan_data)
+                    imported += 1
+
+            conn.execute(
+                "INSERT OR REPLACE INTO store_meta (key, value) VALUES ('json_imported', ?)",
+                (datetime.now().isoformat(),)
+            )
+
+        if imported:
+            self.logger.info(f"已导入 {imported} 个旧版扫描结果文件")
+        return imported
+
+
+_stores: Dict[str, ScanResultStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_result_store(results_dir: str) -> ScanResultStore:
+    """获取扫描结果目录(scanners/results)对应的共享存储, 首次打开时导入旧版JSON结果文件"""
+    results_dir = Path(results_dir).resolve()
+    key = str(results_dir)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = ScanResultStore(results_dir / "scan_results.db")
+            store.import_json_files(results_dir)
+            _stores[key] = store
+        return store
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+扫描器注册模块 - 在当前进程内加载生成的扫描器并保持实例常驻
+"""
+
+import hashlib
+import importlib.util
+import inspect
+import logging
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+
+class ScannerRegistry:
+    """扫描器注册表
+
+    一次性导入 scanners/scan_*.py 中生成的 *Scanner 类并保持实例常驻,
+    直接调用 run_scan() 获取结果; 仅当扫描器文件被 ScannerGenerator.save_scanners
+    重写(修改时间/大小变化且内容哈希不同)时才重新加载对应模块
+    """
+
+    def __init__(self, scanners_dir: str = "scanners"):
+        """初始化扫描器注册表"""
+        self.scanners_dir = Path(scanners_dir)
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def list_scanner_files(self) -> List[str]:
+        """列出扫描器文件名"""
+        if not self.scanners_dir.exists():
+            return []
+        return sorted(path.name for path in self.scanners_dir.glob("scan_*.py"))
+
+    def _file_lock(self, scanner_file: str) -> threading.Lock:
+        """获取单个扫描器文件的锁, 加载与扫描都在该锁内进行, 不同扫描器互不阻塞"""
+        with self._lock:
+            lock = self._locks.get(scanner_file)
+            if lock is None:
+                lock = threading.Lock()
+                self._locks[scanner_file] = lock
+            return lock
+
+    def _get_entry(self, scanner_file: str) -> Dict[str, Any]:
+        """获取已加载的扫描器, 文件内容变化时重新加载 (需持有该文件的锁)"""
+        scanner_path = self.scanners_dir / scanner_file
+        stat = scanner_path.stat()
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        entry = self._entries.get(scanner_file)
+        if entry is not None and entry['signature'] == signature:
+            return entry
+
+        content = scanner_path.read_bytes()
+        content_hash = hashlib.sha256(content).hexdigest()
+        if entry is not None and entry['hash'] == content_hash:
+            # 仅修改时间变化, 内容未变, 不需要重新加载
+            entry['signature'] = signature
+            return entry
+
+        entry = {
+            'signature': signature,
+            'hash': content_hash,
+            'scanner': self._load_scanner(scanner_path)
+        }
+        self._entries[scanner_file] = entry
+        self.logger.info(f"扫描器已加载: {scanner_file}")
+        return entry
+
+    def get_scanner(self, scanner_file: str):
+        """获取扫描器实例, 文件内容变化时重新加载"""
+        with self._file_lock(scanner_file):
+            return self._get_entry(scanner_file)['scanner']
+
+    def _load_scanner(self, scanner_path: Path):
+        """导入扫描器模块并创建其中 *Scanner 类的实例"""
+        module_name = f"_generated_scanners.{scanner_path.stem}"
+        spec = importlib.util.spec_from_file_location(module_name, scanner_path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        sys.modules[module_name] = module
+
+        for name, obj in vars(module).items():
+            if (inspect.isclass(obj) and name.endswith('Scanner')
+                    and obj.__module__ == module_name and hasattr(obj, 'run_scan')):
+                return obj()
+
+        raise ImportError(f"扫描器模块中未找到 *Scanner 类: {scanner_path.name}")
+
+    def run_scan(self, scanner_file: str) -> Dict[str, Any]:
+        """运行单个扫描器并直接返回扫描结果"""
+        # 扫描器实例保存了扫描状态, 同一实例的扫描需串行执行
+        with self._file_lock(scanner_file):
+            return self._get_entry(scanner_file)['scanner'].run_scan()
+
+    def forget(self, scanner_file: Optional[str] = None):
+        """丢弃已加载的扫描器(不指定则全部丢弃), 下次使用时重新加载"""
+        with self._lock:
+            if scanner_file is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(scanner_file, None)
+
+
+_registries: Dict[str, ScannerRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(scanners_dir: str = "scanners") -> ScannerRegistry:
+    """获取某个扫描器目录对应的共享注册表"""
+    key = str(Path(scanners_dir).resolve())
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            registry = ScannerRegistry(key)
+            _registries[key] = registry
+        return registry
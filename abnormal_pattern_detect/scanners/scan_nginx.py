@@ -10,16 +10,40 @@ import psutil
 import time
 import json
 import logging
+import hashlib
+import os
 import re
 import subprocess
+import sys
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from operator import gt, lt, ge, le, eq
+from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
 
+# 共享的主机指标采样器和进程快照位于扫描器目录的上级目录
+_base_dir = str(Path(__file__).resolve().parent.parent)
+if _base_dir not in sys.path:
+    sys.path.append(_base_dir)
+try:
+    from host_sampler import get_sampler
+except ImportError:
+    get_sampler = None
+try:
+    from process_snapshot import get_snapshot
+except ImportError:
+    get_snapshot = None
+try:
+    from scan_result_store import get_result_store
+except ImportError:
+    get_result_store = None
+
 
 class NginxScanner:
     """nginx异常扫描器 - 基于异常模式检测"""
     
+    # 阈值规则的比较运算
+    RULE_OPERATORS = {'>': gt, '<': lt, '>=': ge, '<=': le, '==': eq}
+    
     def __init__(self, config_file: str = None):
         """初始化扫描器"""
         self.service_name = "nginx"
@@ -43,12 +67,27 @@ class NginxScanner:
         # 检测规则（基于异常模式）
         self.detection_rules = []
         
+        # 日志关键词的组合匹配模式（由关键词前缀树生成, 每行只扫描一次）
+        self.keyword_pattern = None
+        
+        # 系统指标允许的最大时效(秒), 在此范围内直接使用共享采样器的样本
+        self.metrics_max_age = 10
+        
+        # 日志读取游标 (inode、偏移量、偏移量前最后一行的哈希), 保存在结果目录中
+        self.results_dir = Path(__file__).parent / "results"
+        self.cursor_file = self.results_dir / "log_cursor_nginx.json"
+        self.log_cursors = self._load_log_cursors()
+        # 首次扫描或日志轮转后最多读取的末尾行数
+        self.tail_lines = 1000
+        
         # 设置日志
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
         
         # 扫描结果
         self.scan_results = []
+        # 最近一次扫描结果是否已写入结果存储
+        self.result_saved = False
         
         # 异常模式统计
         self.pattern_statistics = {
@@ -56,6 +95,36 @@ class NginxScanner:
             'anomalies_detected': 0,
             'pattern_matches': 0
         }
+        
+        self._compile_rules()
+    
+    def _compile_rules(self):
+        """编译检测规则: 关键词组合正则、预编译的日志模式正则, 阈值规则按指标和运算符分组排序"""
+        self._keywords_lower = [keyword.lower() for keyword in self.error_keywords]
+        self._keyword_regex = re.compile(self.keyword_pattern) if self.keyword_pattern else None
+        
+        self._log_pattern_rules = []
+        self._threshold_rules = {}
+        self._other_rules = []
+        for index, rule in enumerate(self.detection_rules):
+            rule_type = rule.get('type', 'threshold')
+            threshold = rule.get('threshold')
+            operator = rule.get('operator', '>')
+            
+            if rule_type == 'log_pattern':
+                if rule.get('pattern'):
+                    self._log_pattern_rules.append((re.compile(rule['pattern'], re.IGNORECASE), rule))
+            elif (rule_type == 'threshold' and operator in self.RULE_OPERATORS
+                  and isinstance(threshold, (int, float)) and not isinstance(threshold, bool)):
+                groups = self._threshold_rules.setdefault(rule.get('metric'), {})
+                groups.setdefault(operator, []).append((threshold, index, rule))
+            else:
+                self._other_rules.append((index, rule))
+        
+        # 大于类规则按阈值升序、小于类按降序, 第一条不满足时其余规则必然不满足
+        for groups in self._threshold_rules.values():
+            for operator, rules in groups.items():
+                rules.sort(key=lambda item: item[0], reverse=operator in ('<', '<='))
     
     def check_process_metrics(self) -> Dict[str, Any]:
         """检查进程指标"""
@@ -68,57 +137,39 @@ class NginxScanner:
         
         try:
             # 查找目标进程
-            target_processes = []
-            for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
-                try:
-                    if "nginx" in proc.info['name'].lower():
-                        target_processes.append(proc)
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    continue
+            if get_snapshot is not None:
+                # 复用本周期共享的进程快照, 不再单独遍历进程表
+                snapshot = get_snapshot(max_age=self.metrics_max_age)
+                target_metrics = [
+                    {
+                        'pid': proc_info['pid'],
+                        'name': proc_info['name'],
+                        'cpu_percent': proc_info['cpu_percent'],
+                        'memory_percent': proc_info['memory_percent'],
+                        'memory_rss': proc_info['memory_rss'],
+                        'connections': proc_info['connections'],
+                        'status': proc_info['status']
+                    }
+                    for proc_info in snapshot.match(["nginx"], with_connections=True)
+                ]
+            else:
+                target_metrics = self._collect_target_processes()
             
-            if not target_processes:
+            if not target_metrics:
                 results['status'] = 'service_not_found'
                 return results
             
             results['process_found'] = True
             
             # 检查每个进程
-            for proc in target_processes:
-                try:
-                    proc_info = proc.info
-                    proc_obj = psutil.Process(proc_info['pid'])
-                    
-                    # 获取详细指标
-                    cpu_percent = proc_obj.cpu_percent()
-                    memory_percent = proc_obj.memory_percent()
-                    memory_rss = proc_obj.memory_info().rss
-                    
-                    try:
-                        connections = len(proc_obj.connections())
-                    except (psutil.NoSuchProcess, psutil.AccessDenied):
-                        connections = 0
-                    
-                    process_metrics = {
-                        'pid': proc_info['pid'],
-                        'name': proc_info['name'],
-                        'cpu_percent': cpu_percent,
-                        'memory_percent': memory_percent,
-                        'memory_rss': memory_rss,
-                        'connections': connections,
-                        'status': proc_obj.status()
-                    }
-                    
-                    results['metrics'][proc_info['pid']] = process_metrics
-                    
-                    # 检查异常条件
-                    anomalies = self._check_metric_anomalies(process_metrics)
-                    if anomalies:
-                        results['anomalies'].extend(anomalies)
-                        results['status'] = 'anomaly_detected'
-                    
-                except (psutil.NoSuchProcess, psutil.AccessDenied) as e:
-                    self.logger.warning(f"无法访问进程 {proc_info.get('pid')}: {e}")
-                    continue
+            for process_metrics in target_metrics:
+                results['metrics'][process_metrics['pid']] = process_metrics
+                
+                # 检查异常条件
+                anomalies = self._check_metric_anomalies(process_metrics)
+                if anomalies:
+                    results['anomalies'].extend(anomalies)
+                    results['status'] = 'anomaly_detected'
         
         except Exception as e:
             self.logger.error(f"检查进程指标失败: {e}")
@@ -126,6 +177,35 @@ class NginxScanner:
         
         return results
     
+    def _collect_target_processes(self) -> List[Dict[str, Any]]:
+        """遍历进程表收集目标进程指标 (进程快照模块不可用时使用)"""
+        target_metrics = []
+        for proc in psutil.process_iter(['pid', 'name']):
+            try:
+                if "nginx" not in proc.info['name'].lower():
+                    continue
+                
+                with proc.oneshot():
+                    try:
+                        connections = len(proc.connections())
+                    except (psutil.NoSuchProcess, psutil.AccessDenied):
+                        connections = 0
+                    
+                    target_metrics.append({
+                        'pid': proc.info['pid'],
+                        'name': proc.info['name'],
+                        'cpu_percent': proc.cpu_percent(),
+                        'memory_percent': proc.memory_percent(),
+                        'memory_rss': proc.memory_info().rss,
+                        'connections': connections,
+                        'status': proc.status()
+                    })
+            except (psutil.NoSuchProcess, psutil.AccessDenied) as e:
+                self.logger.warning(f"无法访问进程 {proc.pid}: {e}")
+                continue
+        
+        return target_metrics
+    
     def check_system_metrics(self) -> Dict[str, Any]:
         """检查系统指标"""
         results = {
@@ -136,18 +216,29 @@ class NginxScanner:
         
         try:
             # 收集系统指标
-            cpu_percent = psutil.cpu_percent(interval=1)
-            memory = psutil.virtual_memory()
-            disk = psutil.disk_usage('/')
-            net_connections = len(psutil.net_connections())
-            
-            system_metrics = {
-                'cpu_percent': cpu_percent,
-                'memory_percent': memory.percent,
-                'disk_usage_percent': disk.percent,
-                'network_connections': net_connections,
-                'timestamp': datetime.now().isoformat()
-            }
+            if get_sampler is not None:
+                # 从共享采样器读取足够新的样本, 不阻塞等待CPU采样
+                sample = get_sampler().latest(max_age=self.metrics_max_age)
+                system_metrics = {
+                    'cpu_percent': sample['cpu_percent'],
+                    'memory_percent': sample['memory_percent'],
+                    'disk_usage_percent': sample['disk_usage_percent'],
+                    'network_connections': sample['network_connections'],
+                    'timestamp': sample['timestamp']
+                }
+            else:
+                cpu_percent = psutil.cpu_percent(interval=1)
+                memory = psutil.virtual_memory()
+                disk = psutil.disk_usage('/')
+                net_connections = len(psutil.net_connections())
+                
+                system_metrics = {
+                    'cpu_percent': cpu_percent,
+                    'memory_percent': memory.percent,
+                    'disk_usage_percent': disk.percent,
+                    'network_connections': net_connections,
+                    'timestamp': datetime.now().isoformat()
+                }
             
             results['metrics'] = system_metrics
             
@@ -199,8 +290,94 @@ class NginxScanner:
             except Exception as e:
                 self.logger.error(f"分析日志文件失败 {log_path}: {e}")
         
+        try:
+            self._save_log_cursors()
+        except Exception as e:
+            self.logger.warning(f"保存日志游标失败: {e}")
+        
         return results
     
+    def _load_log_cursors(self) -> Dict[str, Dict[str, Any]]:
+        """加载日志读取游标"""
+        try:
+            with open(self.cursor_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def _save_log_cursors(self):
+        """写入临时文件后替换, 避免中断时留下不完整的游标文件"""
+        self.results_dir.mkdir(exist_ok=True)
+        temp_file = self.cursor_file.with_name(self.cursor_file.name + ".tmp")
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.log_cursors, f, ensure_ascii=False, indent=2)
+        os.replace(temp_file, self.cursor_file)
+    
+    @staticmethod
+    def _line_hash(f, offset: int, window: int = 4096) -> str:
+        """偏移量之前最后一行(最多 window 字节)的哈希, 用于识别被截断或替换的日志"""
+        start = max(0, offset - window)
+        f.seek(start)
+        data = f.read(offset - start)
+        if data.endswith(b'\n'):
+            data = data[:-1]
+        return hashlib.sha1(data.rsplit(b'\n', 1)[-1]).hexdigest()
+    
+    @staticmethod
+    def _tail_lines(f, file_size: int, lines_limit: int, block_size: int = 65536) -> Tuple[List[bytes], int]:
+        """从文件末尾向前按块读取最后 lines_limit 个完整行, 返回行和最后一个完整行的结束偏移量"""
+        position = file_size
+        data = b''
+        newlines = 0
+        while position > 0 and newlines <= lines_limit:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            block = f.read(read_size)
+            newlines += block.count(b'\n')
+            data = block + data
+        
+        # 末尾未写完的行留到下次扫描
+        end = data.rfind(b'\n') + 1
+        lines = data[:end].splitlines(keepends=True)
+        if position > 0:
+            lines = lines[1:]  # 第一行可能不完整
+        return lines[-lines_limit:], position + end
+    
+    def _read_new_lines(self, log_path: str) -> Tuple[List[str], str]:
+        """
+        读取上次扫描后新增的完整日志行并推进游标
+        首次扫描、日志轮转(inode变化)或被截断/替换时, 只读取末尾的 tail_lines 行
+        :return: (日志行, 读取方式 incremental/tail)
+        """
+        stat = os.stat(log_path)
+        cursor = self.log_cursors.get(log_path)
+        
+        with open(log_path, 'rb') as f:
+            if (cursor is not None and cursor.get('inode') == stat.st_ino
+                    and cursor.get('offset', 0) <= stat.st_size
+                    and self._line_hash(f, cursor['offset']) == cursor.get('line_hash')):
+                offset = cursor['offset']
+                f.seek(offset)
+                raw_lines = []
+                for raw_line in f:
+                    if not raw_line.endswith(b'\n'):
+                        break  # 末尾未写完的行留到下次扫描
+                    raw_lines.append(raw_line)
+                    offset += len(raw_line)
+                read_mode = 'incremental'
+            else:
+                raw_lines, offset = self._tail_lines(f, stat.st_size, self.tail_lines)
+                read_mode = 'tail'
+            
+            self.log_cursors[log_path] = {
+                'inode': stat.st_ino,
+                'offset': offset,
+                'line_hash': self._line_hash(f, offset)
+            }
+        
+        return [raw_line.decode('utf-8', errors='ignore') for raw_line in raw_lines], read_mode
+    
     def _check_metric_anomalies(self, metrics: Dict[str, Any]) -> List[Dict[str, Any]]:
         """基于异常模式检查指标异常"""
         anomalies = []
@@ -226,22 +403,52 @@ class NginxScanner:
                     self.pattern_statistics['anomalies_detected'] += 1
                     self.pattern_statistics['pattern_matches'] += 1
         
-        # 基于检测规则的复合检查
-        for rule in self.detection_rules:
-            if self._evaluate_detection_rule(rule, metrics):
-                anomaly = {
-                    'type': 'pattern_rule_triggered',
-                    'rule': rule.get('name', 'unknown'),
-                    'severity': rule.get('severity', 'medium'),
-                    'pattern_based': True,
-                    'description': f'触发异常模式规则: {rule.get("description", "未知规则")}'
-                }
-                anomalies.append(anomaly)
-                self.pattern_statistics['anomalies_detected'] += 1
-                self.pattern_statistics['pattern_matches'] += 1
+        # 基于检测规则的复合检查 (阈值规则按分组短路评估, 其余规则逐条评估, 按规则顺序输出)
+        triggered = self._match_threshold_rules(metrics)
+        triggered.extend(
+            (index, rule) for index, rule in self._other_rules
+            if self._evaluate_detection_rule(rule, metrics)
+        )
+        triggered.sort(key=lambda item: item[0])
+        
+        for _, rule in triggered:
+            anomaly = {
+                'type': 'pattern_rule_triggered',
+                'rule': rule.get('name', 'unknown'),
+                'severity': rule.get('severity', 'medium'),
+                'pattern_based': True,
+                'description': f'触发异常模式规则: {rule.get("description", "未知规则")}'
+            }
+            anomalies.append(anomaly)
+            self.pattern_statistics['anomalies_detected'] += 1
+            self.pattern_statistics['pattern_matches'] += 1
         
         return anomalies
     
+    def _match_threshold_rules(self, metrics: Dict[str, Any]) -> List[Tuple[int, Dict[str, Any]]]:
+        """评估分组后的阈值规则, 返回触发的 (规则序号, 规则)"""
+        triggered = []
+        for metric_name, groups in self._threshold_rules.items():
+            if metric_name not in metrics:
+                continue
+            
+            current_value = metrics[metric_name]
+            for operator, rules in groups.items():
+                compare = self.RULE_OPERATORS[operator]
+                for threshold, index, rule in rules:
+                    try:
+                        matched = compare(current_value, threshold)
+                    except Exception as e:
+                        self.logger.error(f"评估检测规则失败: {e}")
+                        break
+                    
+                    if matched:
+                        triggered.append((index, rule))
+                    elif operator != '==':
+                        break
+        
+        return triggered
+    
     def _evaluate_detection_rule(self, rule: Dict[str, Any], metrics: Dict[str, Any]) -> bool:
         """评估检测规则"""
         try:
@@ -302,18 +509,17 @@ class NginxScanner:
                 result['status'] = 'file_not_found'
                 return result
             
-            # 读取最近的日志行
-            with open(log_path, 'r', encoding='utf-8', errors='ignore') as f:
-                lines = f.readlines()
-                result['lines_checked'] = len(lines)
-                
-                # 检查最近的1000行
-                recent_lines = lines[-1000:] if len(lines) > 1000 else lines
+            # 只读取上次扫描后新增的日志行 (首次扫描或日志轮转后读取末尾的行)
+            recent_lines, result['read_mode'] = self._read_new_lines(log_path)
+            result['lines_checked'] = len(recent_lines)
+            
+            for line in recent_lines:
+                line_lower = line.lower()
                 
-                for line in recent_lines:
-                    # 基于异常模式的关键词检查（限制数量）
-                    for keyword in self.error_keywords:
-                        if keyword.lower() in line.lower():
+                # 基于异常模式的关键词检查（限制数量）: 组合正则一次扫描, 只对命中的行确定具体关键词
+                if self._keyword_regex is not None and self._keyword_regex.search(line_lower):
+                    for keyword, keyword_lower in zip(self.error_keywords, self._keywords_lower):
+                        if keyword_lower in line_lower:
                             error_info = {
                                 'line': line.strip(),
                                 'keyword': keyword,
@@ -326,23 +532,21 @@ class NginxScanner:
                             # 限制错误记录数量，避免文件过大
                             if len(result['recent_errors']) >= 50:
                                 break
-                    
-                    # 基于异常模式的模式匹配
-                    for rule in self.detection_rules:
-                        if rule.get('type') == 'log_pattern':
-                            pattern = rule.get('pattern', '')
-                            if pattern and re.search(pattern, line, re.IGNORECASE):
-                                anomaly = {
-                                    'type': 'log_pattern_match',
-                                    'rule': rule.get('name', 'unknown'),
-                                    'line': line.strip(),
-                                    'pattern': pattern,
-                                    'severity': rule.get('severity', 'medium'),
-                                    'pattern_based': True,
-                                    'description': f'日志匹配异常模式: {rule.get("description", "未知模式")}'
-                                }
-                                result['anomalies'].append(anomaly)
-                                result['pattern_matches'] += 1
+                
+                # 基于异常模式的模式匹配 (预编译正则)
+                for regex, rule in self._log_pattern_rules:
+                    if regex.search(line):
+                        anomaly = {
+                            'type': 'log_pattern_match',
+                            'rule': rule.get('name', 'unknown'),
+                            'line': line.strip(),
+                            'pattern': rule['pattern'],
+                            'severity': rule.get('severity', 'medium'),
+                            'pattern_based': True,
+                            'description': f'日志匹配异常模式: {rule.get("description", "未知模式")}'
+                        }
+                        result['anomalies'].append(anomaly)
+                        result['pattern_matches'] += 1
             
             result['status'] = 'success'
             
@@ -433,6 +637,15 @@ class NginxScanner:
         
         scan_results['scan_end_time'] = datetime.now().isoformat()
         
+        # 写入扫描结果存储
+        self.result_saved = False
+        if get_result_store is not None:
+            try:
+                get_result_store(self.results_dir).save(scan_results, self.service_name)
+                self.result_saved = True
+            except Exception as e:
+                self.logger.warning(f"保存扫描结果到结果存储失败: {e}")
+        
         self.logger.info(f"nginx 扫描完成，发现 {len(all_anomalies) if 'all_anomalies' in locals() else 0} 个异常")
         
         return scan_results
@@ -510,28 +723,28 @@ def main():
             for rec in summary['recommendations']:
                 print(f"  - {rec}")
         
-        # 保存扫描结果到文件
-        try:
-            import os
-            from pathlib import Path
-            
-            # 确保results目录存在
-            results_dir = Path(__file__).parent / "results"
-            results_dir.mkdir(exist_ok=True)
-            
-            # 生成文件名
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"scan_results_nginx_{timestamp}.json"
-            filepath = results_dir / filename
-            
-            # 保存结果
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(results, f, ensure_ascii=False, indent=2)
-            
-            print(f"\n💾 扫描结果已保存到: {filepath}")
-            
-        except Exception as save_error:
-            print(f"⚠️ 保存扫描结果失败: {save_error}")
+        # 扫描结果已在 run_scan 中写入结果存储, 结果存储不可用或写入失败时保存到文件
+        if scanner.result_saved:
+            print(f"\n💾 扫描结果已保存到: {scanner.results_dir / 'scan_results.db'}")
+        else:
+            try:
+                # 确保results目录存在
+                results_dir = scanner.results_dir
+                results_dir.mkdir(exist_ok=True)
+                
+                # 生成文件名
+                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                filename = f"scan_results_nginx_{timestamp}.json"
+                filepath = results_dir / filename
+                
+                # 保存结果
+                with open(filepath, 'w', encoding='utf-8') as f:
+                    json.dump(results, f, ensure_ascii=False, indent=2)
+                
+                print(f"\n💾 扫描结果已保存到: {filepath}")
+                
+            except Exception as save_error:
+                print(f"⚠️ 保存扫描结果失败: {save_error}")
         
     except Exception as e:
         print(f"❌ 扫描失败: {e}")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试日志增量解析检查点和时间戳提取
+全量解析与增量解析交替执行时, 已保存的日志行不应被重复合并;
+一行中有多个时间字符串时按时间模式的优先级提取
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from parse_logs import LogParser
+
+
+def _append_lines(log_file, start, count):
+    """追加 count 行带时间戳的日志, 行号从 start 开始"""
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with open(log_file, 'a', encoding='utf-8') as f:
+        for i in range(start, start + count):
+            f.write(f"{now} [ERROR] request {i} failed\n")
+
+
+def _parse_and_save(parser, incremental):
+    parsed_data = parser.parse_all_logs(time_window_hours=24, incremental=incremental)
+    parser.save_parsed_logs(parsed_data)
+    return [entry['message'] for entry in parser.iter_log_entries()]
+
+
+def test_full_parse_between_incremental_runs():
+    """增量(10行) -> 全量(+10行) -> 增量(+10行) 后应恰好保留 30 条不重复的条目"""
+    print("🧪 测试全量解析与增量解析交替执行...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        log_file = os.path.join(temp_dir, "error.log")
+        parser = LogParser(output_dir=os.path.join(temp_dir, "data"))
+        parser.common_log_paths = {'nginx': [log_file]}
+
+        _append_lines(log_file, 0, 10)
+        messages = _parse_and_save(parser, incremental=True)
+        assert len(messages) == 10, f"期望10条，实际为{len(messages)}"
+
+        _append_lines(log_file, 10, 10)
+        messages = _parse_and_save(parser, incremental=False)
+        assert len(messages) == 20, f"期望20条，实际为{len(messages)}"
+
+        _append_lines(log_file, 20, 10)
+        messages = _parse_and_save(parser, incremental=True)
+        assert len(messages) == 30, f"期望30条，实际为{len(messages)}"
+        assert len(set(messages)) == 30, f"存在重复条目: {len(messages) - len(set(messages))} 条"
+
+    print("✅ 全量解析后检查点已更新，增量解析未重复合并")
+
+
+def test_timestamp_pattern_priority():
+    """优先级高的格式即使出现在行中靠后的位置也优先; 解析失败的匹配回退到下一个格式"""
+    print("🧪 测试时间戳提取优先级...")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        parser = LogParser(output_dir=temp_dir)
+        expected = datetime(2024, 3, 1, 11, 22, 33)
+
+        timestamp = parser.extract_timestamp("Jan 12 10:00:00 host x 2024-03-01 11:22:33")
+        assert timestamp == expected, f"期望{expected}，实际为{timestamp}"
+
+        timestamp = parser.extract_timestamp("2024-13-45 99:99:99 then 2024/03/01 11:22:33")
+        assert timestamp == expected, f"期望{expected}，实际为{timestamp}"
+
+        format_cache = {}
+        timestamp = parser.extract_timestamp("2024-13-45 99:99:99 then 2024/03/01 11:22:33", format_cache)
+        assert timestamp == expected and format_cache['index'] == 2, f"格式缓存错误: {format_cache}"
+
+    print("✅ 时间戳按格式优先级提取")
+
+
+if __name__ == "__main__":
+    test_full_parse_between_incremental_runs()
+    test_timestamp_pattern_priority()
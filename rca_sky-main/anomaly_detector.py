@@ -36,6 +36,7 @@ class AnomalyDetector:
             service_name = service_data["service"].get("name", "unknown")
             metrics = service_data.get("metrics", {})
             traces = service_data.get("traces", [])
+            trace_stats = service_data.get("trace_stats")
             
             # 提取基础指标
             service_metrics = {
@@ -128,7 +129,18 @@ class AnomalyDetector:
                 })
             
             # 处理trace数据
-            if traces:
+            if trace_stats:
+                # 采集时基于窗口内全部调用链流式累计的统计量（traces 只是耗时最长的样本）
+                service_metrics.update({
+                    "trace_count": trace_stats.get("trace_count", 0),
+                    "error_count": trace_stats.get("error_count", 0),
+                    "error_rate": trace_stats.get("error_rate", 0),
+                    "avg_trace_duration": trace_stats.get("avg_trace_duration", 0),
+                    "max_trace_duration": trace_stats.get("max_trace_duration", 0),
+                    "p95_trace_duration": trace_stats.get("p95_trace_duration", 0),
+                    "p99_trace_duration": trace_stats.get("p99_trace_duration", 0)
+                })
+            elif traces:
                 trace_durations = [trace.get("duration", 0) for trace in traces]
                 error_traces = [trace for trace in traces if trace.get("isError", False)]
                 
@@ -137,7 +149,9 @@ class AnomalyDetector:
                     "error_count": len(error_traces),
                     "error_rate": (len(error_traces) / len(traces)) * 100 if traces else 0,
                     "avg_trace_duration": np.mean(trace_durations) if trace_durations else 0,
-                    "max_trace_duration": np.max(trace_durations) if trace_durations else 0
+                    "max_trace_duration": np.max(trace_durations) if trace_durations else 0,
+                    "p95_trace_duration": np.percentile(trace_durations, 95) if trace_durations else 0,
+                    "p99_trace_duration": np.percentile(trace_durations, 99) if trace_durations else 0
                 })
             else:
                 service_metrics.update({
@@ -145,7 +159,9 @@ class AnomalyDetector:
                     "error_count": 0,
                     "error_rate": 0,
                     "avg_trace_duration": 0,
-                    "max_trace_duration": 0
+                    "max_trace_duration": 0,
+                    "p95_trace_duration": 0,
+                    "p99_trace_duration": 0
                 })
             
             metrics_list.append(service_metrics)
@@ -7,6 +7,7 @@ import yaml
 import logging
 import sys
 import os
+import time
 from datetime import datetime
 from typing import Dict, Any
 
@@ -16,6 +17,7 @@ from anomaly_detector import AnomalyDetector
 from root_cause_analyzer import RootCauseAnalyzer
 from ollama_analyzer import OllamaAnalyzer
 from result_exporter import ResultExporter
+from sliding_window_collector import build_window_collector
 
 is_ai_analysis = True
 
@@ -52,10 +54,7 @@ def check_dependencies(config: Dict[str, Any]) -> bool:
     
     # 检查SkyWalking连接
     skywalking_config = config.get("skywalking", {})
-    collector = SkyWalkingCollector(
-        base_url=skywalking_config.get("base_url", "http://localhost:12800"),
-        timeout=skywalking_config.get("timeout", 30)
-    )
+    collector = SkyWalkingCollector.from_config(skywalking_config)
     
     if not collector.health_check():
         logger.error("SkyWalking连接失败，请检查服务是否正常运行")
@@ -101,10 +100,7 @@ def main():
         
         # SkyWalking数据采集器
         skywalking_config = config.get("skywalking", {})
-        collector = SkyWalkingCollector(
-            base_url=skywalking_config.get("base_url", "http://localhost:12800"),
-            timeout=skywalking_config.get("timeout", 30)
-        )
+        collector = SkyWalkingCollector.from_config(skywalking_config)
         
         # 异常检测器
         anomaly_config = config.get("anomaly_detection", {})
@@ -259,8 +255,46 @@ def main():
         sys.exit(1)
 
 
+def run_daemon():
+    """常驻模式: 维护滑动窗口并在每个采集周期后基于内存窗口执行异常检测和根因分析"""
+    print("🚀 启动滑动窗口采集常驻模式...")
+    
+    config = load_config()
+    setup_logging(config.get("output", {}).get("log_level", "INFO"))
+    logger = logging.getLogger(__name__)
+    
+    window = build_window_collector(config)
+    try:
+        window.start()
+    except Exception as e:
+        logger.error(f"滑动窗口初始化失败: {str(e)}")
+        print(f"\n❌ 滑动窗口初始化失败: {str(e)}")
+        sys.exit(1)
+    logger.info(f"✅ 滑动窗口初始化完成，窗口 {window.window_minutes} 分钟，采集周期 {window.tick_seconds} 秒")
+    
+    try:
+        while True:
+            if window.is_stale():
+                logger.warning(f"滑动窗口已超过 {window.max_stale_seconds} 秒未成功更新，结果可能已过期")
+            result = window.analyze()
+            anomalies = result["anomalies_data"].get("anomalies", {})
+            total_anomalies = sum(len(items) for items in anomalies.values())
+            root_causes = result["root_cause_data"].get("root_causes", [])
+            logger.info(f"窗口截至 {result['window']['last_minute']}: {result['window']['services']} 个服务，"
+                        f"{total_anomalies} 个异常，{len(root_causes)} 个潜在根因")
+            time.sleep(window.tick_seconds)
+    except KeyboardInterrupt:
+        logger.info("用户中断程序")
+    finally:
+        window.stop()
+        window.collector.close()
+
+
 if __name__ == "__main__":
     args = sys.argv
+    if '--daemon' in args[1:]:
+        run_daemon()
+        sys.exit(0)
     if len(args) > 1 and args[1] == '--ai=false':
         is_ai_analysis = False
     main()
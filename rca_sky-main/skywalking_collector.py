@@ -7,39 +7,183 @@ import pytz
 import requests
 import json
 import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Callable, Iterable, Iterator
 import pandas as pd
+from requests.adapters import HTTPAdapter
+
+from trace_aggregates import TraceAggregate
 
 # 设置日志记录
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# 服务指标: (别名后缀, 查询变量名, 指标表达式)
+SERVICE_METRIC_EXPRESSIONS = (
+    ("cpm", "cpm", "service_cpm"),
+    ("sla", "sla", "service_sla"),
+    ("resp_time", "respTime", "service_resp_time"),
+)
+
+# execExpression 查询返回的字段
+EXPRESSION_RESULT_FIELDS = """
+                type
+                results {
+                    metric {
+                        labels {
+                            key
+                            value
+                        }
+                    }
+                    values {
+                        name: id
+                        value
+                        refId: traceID
+                        owner {
+                            scope
+                            serviceID
+                            serviceName
+                            normal
+                            serviceInstanceID
+                            serviceInstanceName
+                            endpointID
+                            endpointName
+                        }
+                    }
+                }
+                error
+"""
+
+class TraceQueryError(Exception):
+    """调用链分页查询失败, 已读取的调用链不完整"""
+
+
 class SkyWalkingCollector:
     """SkyWalking数据采集器"""
     
-    def __init__(self, base_url: str, timeout: int = 30):
+    def __init__(self, base_url: str, timeout: int = 30, max_concurrency: int = 8,
+                 metrics_batch_size: int = 20, service_cache_ttl: int = 60,
+                 trace_page_size: int = 100, trace_max_pages: int = 100, trace_sample_size: int = 50,
+                 settle_seconds: int = 60):
+        """
+        Args:
+            base_url: SkyWalking OAP服务地址
+            timeout: 单次查询超时时间（秒）
+            max_concurrency: 并发查询数上限，同时也是连接池保持的长连接数
+            metrics_batch_size: 一次批量指标查询包含的服务数
+            service_cache_ttl: 服务列表缓存的有效期（秒），0 表示不缓存
+            trace_page_size: 分页读取调用链时的每页条数
+            trace_max_pages: 每个服务最多读取的调用链页数，0 表示不限制
+            trace_sample_size: 每个服务保留的调用链样本数（耗时最长的若干条）
+            settle_seconds: 分钟结束后等待 OAP 写入指标和迟到调用链的时间（秒），采集窗口截止到此前的分钟
+        """
         self.base_url = base_url.rstrip('/')
         # print("debug - ", self.base_url)
         self.graphql_url = f"{self.base_url}/graphql"
         self.timeout = timeout
+        self.max_concurrency = max(1, max_concurrency)
+        self.metrics_batch_size = max(1, metrics_batch_size)
+        self.trace_page_size = max(1, trace_page_size)
+        self.trace_max_pages = trace_max_pages
+        self.trace_sample_size = trace_sample_size
+        self.settle_seconds = max(0, settle_seconds)
         self.logger = logging.getLogger(__name__)
         
+        # 复用长连接的会话，查询线程池和调用链分页线程池可同时发起请求，连接池按两者之和设置
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json"})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency * 2)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # 调用链分页请求使用独立的线程池，查询线程池中的任务可以等待分页结果而不会互相阻塞
+        self._page_executor: Optional[ThreadPoolExecutor] = None
+        
+        # 服务列表缓存: 时间范围(小时) -> (过期时间, 服务列表)，以及 服务名 -> 服务ID 索引
+        self.service_cache_ttl = service_cache_ttl
+        self._service_cache: Dict[int, Any] = {}
+        self._service_ids: Dict[str, str] = {}
+        self._service_cache_lock = threading.Lock()
+        self.service_cache_stats = {"hits": 0, "misses": 0}
+    
+    @classmethod
+    def from_config(cls, skywalking_config: Dict) -> "SkyWalkingCollector":
+        """按 config.yaml 的 skywalking 配置段创建采集器"""
+        return cls(
+            base_url=skywalking_config.get("base_url", "http://localhost:12800"),
+            timeout=skywalking_config.get("timeout", 30),
+            max_concurrency=skywalking_config.get("max_concurrency", 8),
+            metrics_batch_size=skywalking_config.get("metrics_batch_size", 20),
+            service_cache_ttl=skywalking_config.get("service_cache_ttl", 60),
+            trace_page_size=skywalking_config.get("trace_page_size", 100),
+            trace_max_pages=skywalking_config.get("trace_max_pages", 100),
+            trace_sample_size=skywalking_config.get("trace_sample_size", 50),
+            settle_seconds=skywalking_config.get("settle_seconds", 60)
+        )
+    
+    def settled_minute(self, settle_seconds: int = None) -> datetime:
+        """结束已超过 settle_seconds 的最近一个完整分钟 (UTC)
+        
+        该分钟之前的指标已持久化、调用链已基本到齐，按开始时间分页时新到的调用链也不会再插入已读的页
+        """
+        settle_seconds = self.settle_seconds if settle_seconds is None else max(0, settle_seconds)
+        settled = datetime.now(pytz.timezone('UTC')) - timedelta(seconds=settle_seconds)
+        return settled.replace(second=0, microsecond=0) - timedelta(minutes=1)
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """按需创建查询线程池"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                                thread_name_prefix="skywalking-query")
+        return self._executor
+    
+    def _get_page_executor(self) -> ThreadPoolExecutor:
+        """按需创建调用链分页线程池"""
+        if self._page_executor is None:
+            self._page_executor = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                                     thread_name_prefix="skywalking-trace-page")
+        return self._page_executor
+    
+    def _map_concurrent(self, func: Callable, items: Iterable) -> List[Any]:
+        """在线程池中并发执行 func(item)，按输入顺序返回结果
+        
+        func 内部只能执行同步查询，不能再向线程池提交任务，否则可能耗尽线程导致死锁
+        """
+        items = list(items)
+        if self.max_concurrency == 1 or len(items) <= 1:
+            return [func(item) for item in items]
+        return list(self._get_executor().map(func, items))
+    
+    def close(self):
+        """关闭线程池和连接池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._page_executor is not None:
+            self._page_executor.shutdown(wait=True)
+            self._page_executor = None
+        self.session.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        
     def _execute_graphql_query(self, query: str, variables: Dict = None) -> Optional[Dict]:
-        """执行GraphQL查询"""
+        """执行GraphQL查询（经由连接池复用长连接，可在多个线程中并发调用）"""
         try:
             payload = {
                 "query": query,
                 "variables": variables or {}
             }
             
-            headers = {
-                "Content-Type": "application/json",
-            }
-            
-            response = requests.post(
+            response = self.session.post(
                 self.graphql_url,
                 json=payload,
-                headers=headers,
                 timeout=self.timeout
             )
             
@@ -57,8 +201,55 @@ class SkyWalkingCollector:
             self.logger.error(f"执行GraphQL查询时发生错误: {str(e)}")
             return None
     
-    def get_services(self, hours_ago: int = 24) -> List[Dict]:
-        """获取所有服务列表"""
+    def get_services(self, hours_ago: int = 24, refresh: bool = False) -> List[Dict]:
+        """获取所有服务列表（按时间范围缓存 service_cache_ttl 秒，refresh=True 时强制重新查询）"""
+        with self._service_cache_lock:
+            cached = self._service_cache.get(hours_ago)
+            if not refresh and cached and cached[0] > time.monotonic():
+                self.service_cache_stats["hits"] += 1
+                return list(cached[1])
+            self.service_cache_stats["misses"] += 1
+            
+            # 持有锁查询，并发的调用者等待这一次查询结果而不是各自重复查询
+            services = self._query_services(hours_ago)
+            if services and self.service_cache_ttl > 0:
+                self._service_cache[hours_ago] = (time.monotonic() + self.service_cache_ttl, services)
+            for service in services:
+                if service.get("name") and service.get("id"):
+                    self._service_ids[service["name"]] = service["id"]
+            return list(services)
+    
+    def get_service_id(self, service_name: str) -> Optional[str]:
+        """根据服务名查找服务ID，只查索引；索引为空时先加载一次服务列表（走缓存）"""
+        with self._service_cache_lock:
+            service_id = self._service_ids.get(service_name)
+            if service_id or self._service_ids:
+                self.service_cache_stats["hits" if service_id else "misses"] += 1
+                return service_id
+        self.get_services(hours_ago=24)
+        return self._service_ids.get(service_name)
+    
+    def invalidate_service_cache(self):
+        """清空服务列表缓存和服务名索引"""
+        with self._service_cache_lock:
+            self._service_cache.clear()
+            self._service_ids.clear()
+    
+    def get_service_cache_stats(self) -> Dict[str, Any]:
+        """服务列表缓存的命中统计"""
+        with self._service_cache_lock:
+            hits = self.service_cache_stats["hits"]
+            misses = self.service_cache_stats["misses"]
+            return {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                "cached_ranges": len(self._service_cache),
+                "indexed_services": len(self._service_ids)
+            }
+    
+    def _query_services(self, hours_ago: int) -> List[Dict]:
+        """查询服务列表"""
         # 获取时间范围
         end_time = datetime.now()
         start_time = end_time - timedelta(hours=hours_ago)
@@ -246,6 +437,80 @@ class SkyWalkingCollector:
                 'service_resp_time': {"label": "", "values": {"values": []}}
             }
 
+    @staticmethod
+    def _build_batch_metrics_query(service_count: int) -> str:
+        """生成多个服务的批量指标查询文档，第 i 个服务的各指标别名为 s{i}_cpm、s{i}_sla、s{i}_resp_time"""
+        variable_defs = ["$duration: Duration!"]
+        variable_defs += [f"${variable}: String!" for _, variable, _ in SERVICE_METRIC_EXPRESSIONS]
+        variable_defs += [f"$e{index}: Entity!" for index in range(service_count)]
+        
+        fields = []
+        for index in range(service_count):
+            for suffix, variable, _ in SERVICE_METRIC_EXPRESSIONS:
+                fields.append(
+                    f"            s{index}_{suffix}: execExpression(expression: ${variable}, "
+                    f"entity: $e{index}, duration: $duration) {{{EXPRESSION_RESULT_FIELDS}            }}"
+                )
+        
+        return "query queryBatchMetrics(" + ", ".join(variable_defs) + ") {\n" + "\n".join(fields) + "\n        }"
+    
+    def _query_metrics_batch(self, service_names: List[str], duration: Dict) -> Optional[Dict[str, Dict]]:
+        """执行一次批量指标查询并按别名拆分为各服务的指标结果，查询失败时返回 None"""
+        variables = {"duration": duration}
+        for _, variable, expression in SERVICE_METRIC_EXPRESSIONS:
+            variables[variable] = expression
+        for index, service_name in enumerate(service_names):
+            variables[f"e{index}"] = {"serviceName": service_name, "normal": True}
+        
+        result = self._execute_graphql_query(self._build_batch_metrics_query(len(service_names)), variables)
+        if not result:
+            return None
+        
+        metrics_by_service = {}
+        for index, service_name in enumerate(service_names):
+            metrics_result = {}
+            for suffix, _, expression in SERVICE_METRIC_EXPRESSIONS:
+                expression_result = result.get(f"s{index}_{suffix}")
+                if expression_result and not expression_result.get("error"):
+                    metrics_result[expression] = self._format_expression_result(expression_result)
+                else:
+                    metrics_result[expression] = {"label": "", "values": {"values": []}}
+            metrics_by_service[service_name] = metrics_result
+        return metrics_by_service
+    
+    def get_services_metrics_batch(self, service_names: List[str], start_time: datetime, end_time: datetime,
+                                   batch_size: int = None) -> Dict[str, Dict]:
+        """批量获取多个服务的指标数据
+        
+        每 batch_size 个服务合并为一个带别名的GraphQL查询，各批次并发执行，
+        返回 {服务名: 指标结果}，结构与 get_service_metrics_once 相同。
+        某个批次整体查询失败时，该批次退回逐个服务查询
+        """
+        batch_size = max(1, batch_size or self.metrics_batch_size)
+        service_names = list(dict.fromkeys(service_names))
+        batches = [service_names[i:i + batch_size] for i in range(0, len(service_names), batch_size)]
+        
+        metrics_by_service = {}
+        for batch_result in self._map_concurrent(
+                lambda batch: self._get_metrics_batch(batch, start_time, end_time), batches):
+            metrics_by_service.update(batch_result)
+        return metrics_by_service
+    
+    def _get_metrics_batch(self, service_names: List[str], start_time: datetime, end_time: datetime) -> Dict[str, Dict]:
+        """获取一个批次的服务指标（同步执行），批量查询失败时退回逐个服务查询"""
+        duration = {
+            "start": start_time.strftime("%Y-%m-%d %H%M"),
+            "end": end_time.strftime("%Y-%m-%d %H%M"),
+            "step": "MINUTE"
+        }
+        metrics_by_service = self._query_metrics_batch(service_names, duration)
+        if metrics_by_service is None:
+            self.logger.warning(f"批量指标查询失败，改为逐个查询 {len(service_names)} 个服务")
+            metrics_by_service = {
+                name: self.get_service_metrics_once(name, start_time, end_time) for name in service_names
+            }
+        return metrics_by_service
+
     def _format_expression_result(self, expression_result: Dict) -> Dict:
         """将execExpression的结果格式化为与原来readMetricsValues相同的格式"""
         if not expression_result or not expression_result.get("results"):
@@ -263,13 +528,9 @@ class SkyWalkingCollector:
             "values": {"values": values}
         }
     
-    def get_trace_data(self, service_id: str = None, start_time: datetime = None, end_time: datetime = None, 
-                      min_duration: int = 100, limit: int = 50) -> List[Dict]:
-        """获取调用链数据"""
-        if start_time is None:
-            end_time = datetime.now()
-            start_time = end_time - timedelta(hours=1)
-        
+    def _query_trace_page(self, service_id: Optional[str], start_time: datetime, end_time: datetime,
+                          page_num: int, page_size: int, query_order: str = "BY_DURATION") -> Optional[List[Dict]]:
+        """查询一页调用链，查询失败时返回 None"""
         start_str = start_time.strftime("%Y-%m-%d %H%M")
         end_str = end_time.strftime("%Y-%m-%d %H%M")
         
@@ -295,10 +556,10 @@ class SkyWalkingCollector:
                 "step": "MINUTE"
             },
             "traceState": "ALL",
-            "queryOrder": "BY_DURATION",
+            "queryOrder": query_order,
             "paging": {
-                "pageNum": 1,
-                "pageSize": limit
+                "pageNum": page_num,
+                "pageSize": page_size
             }
         }
         
@@ -309,13 +570,93 @@ class SkyWalkingCollector:
         try:
             result = self._execute_graphql_query(query, variables)
             if result and "traces" in result:
-                traces = result["traces"].get("traces", [])
-                
-                return traces
+                return (result["traces"] or {}).get("traces") or []
         except Exception as e:
             self.logger.warning(f"获取调用链数据失败: {str(e)}")
         
-        return []
+        return None
+    
+    def get_trace_data(self, service_id: str = None, start_time: datetime = None, end_time: datetime = None, 
+                      min_duration: int = 100, limit: int = 50) -> List[Dict]:
+        """获取耗时最长的 limit 条调用链（只读取第一页，完整统计使用 get_trace_stats）"""
+        if start_time is None:
+            end_time = datetime.now()
+            start_time = end_time - timedelta(hours=1)
+        
+        return self._query_trace_page(service_id, start_time, end_time, 1, limit) or []
+    
+    def iter_trace_pages(self, service_id: str = None, start_time: datetime = None, end_time: datetime = None,
+                         page_size: int = None, max_pages: int = None) -> Iterator[List[Dict]]:
+        """按页迭代时间窗口内的全部调用链
+        
+        分页请求在独立线程池中并发预取，在途页数从 1 开始、每读到一个满页翻倍，上限为 max_concurrency；
+        调用方取走一页后才补发请求（背压），内存中最多保留在途的这几页。
+        读到不满一页或达到 max_pages（0 表示不限制）时结束；某页查询失败时抛出 TraceQueryError。
+        结束时间应为已结束的分钟（见 settled_minute），否则分页期间新到的调用链会使后续页错位
+        """
+        if start_time is None:
+            end_time = self.settled_minute()
+            start_time = end_time - timedelta(hours=1)
+        page_size = page_size or self.trace_page_size
+        max_pages = self.trace_max_pages if max_pages is None else max_pages
+        
+        executor = self._get_page_executor()
+        in_flight = deque()
+        next_page = 1
+        prefetch = 1
+        pages_read = 0
+        
+        def fill():
+            nonlocal next_page
+            while len(in_flight) < prefetch and (not max_pages or next_page <= max_pages):
+                in_flight.append(executor.submit(
+                    self._query_trace_page, service_id, start_time, end_time, next_page, page_size, "BY_START_TIME"
+                ))
+                next_page += 1
+        
+        try:
+            fill()
+            while in_flight:
+                traces = in_flight.popleft().result()
+                if traces is None:
+                    raise TraceQueryError(f"第 {pages_read + 1} 页查询失败，已读取 {pages_read} 页")
+                pages_read += 1
+                if traces:
+                    yield traces
+                if len(traces) < page_size:
+                    return
+                prefetch = min(prefetch * 2, self.max_concurrency)
+                fill()
+        finally:
+            for future in in_flight:
+                future.cancel()
+    
+    def get_trace_stats(self, service_id: str = None, start_time: datetime = None, end_time: datetime = None,
+                        page_size: int = None, max_pages: int = None, sample_size: int = None) -> TraceAggregate:
+        """分页读取时间窗口内的全部调用链并流式累计统计量（数量、错误数、耗时合计/最大值、分位数草图）
+        
+        达到 max_pages 或某页查询失败时统计不完整，返回结果的 truncated 为 True
+        """
+        page_size = page_size or self.trace_page_size
+        max_pages = self.trace_max_pages if max_pages is None else max_pages
+        aggregate = TraceAggregate(sample_size=self.trace_sample_size if sample_size is None else sample_size)
+        
+        pages = 0
+        last_page_full = False
+        try:
+            for traces in self.iter_trace_pages(service_id, start_time, end_time, page_size, max_pages):
+                aggregate.add_all(traces)
+                pages += 1
+                last_page_full = len(traces) >= page_size
+        except TraceQueryError as e:
+            aggregate.truncated = True
+            self.logger.warning(f"服务 {service_id} 的调用链统计不完整: {str(e)}")
+            return aggregate
+        
+        if max_pages and pages >= max_pages and last_page_full:
+            aggregate.truncated = True
+            self.logger.warning(f"服务 {service_id} 的调用链超过 {max_pages} 页，统计只包含前 {aggregate.count} 条")
+        return aggregate
     
     def get_service_topology(self, start_time: datetime, end_time: datetime) -> Dict:
         """获取服务拓扑图"""
@@ -366,17 +707,12 @@ class SkyWalkingCollector:
             return result["topology"]
         return {"nodes": [], "calls": []}
     
-    def get_service_instances(self, service_name: str, start_time: datetime, end_time: datetime) -> List[Dict]:
-        """获取服务实例信息"""
-        # 1. 先根据服务名称找到服务ID
-        # 我们复用 get_services 方法来获取所有服务，然后从中查找
-        # 注意：为了效率，更优的做法是实现一个 findService(serviceName:...) 的GraphQL查询
-        all_services = self.get_services(hours_ago=24)
-        service_id = None
-        for service in all_services:
-            if service.get("name") == service_name:
-                service_id = service.get("id")
-                break
+    def get_service_instances(self, service_name: str, start_time: datetime, end_time: datetime,
+                              service_id: str = None) -> List[Dict]:
+        """获取服务实例信息（已知服务ID时直接传入 service_id）"""
+        # 1. 先根据服务名称找到服务ID（查服务名索引，不重新获取服务列表）
+        if not service_id:
+            service_id = self.get_service_id(service_name)
         
         if not service_id:
             self.logger.warning(f"未能找到服务 '{service_name}' 的ID，无法查询实例列表。")
@@ -444,18 +780,18 @@ class SkyWalkingCollector:
         if not services:
             return []
         
-        active_nodes = []
+        # 检查服务是否有指标数据（判断是否活跃），所有服务的指标分批一次取回
+        candidates = [service for service in services if service.get("name") and service.get("id")]
+        metrics_by_service = self.get_services_metrics_batch(
+            [service["name"] for service in candidates], start_time, end_time
+        )
         
-        for service in services:
+        def check_service(service: Dict) -> Optional[Dict]:
             service_name = service.get("name")
             service_id = service.get("id")
             
-            if not service_name or not service_id:
-                continue
-            
             try:
-                # 检查服务是否有指标数据（判断是否活跃）
-                metrics = self.get_service_metrics_once(service_name, start_time, end_time)
+                metrics = metrics_by_service.get(service_name)
                 
                 # 检查是否有非空的指标数据
                 has_activity = False
@@ -469,7 +805,7 @@ class SkyWalkingCollector:
                 # 如果有活动，获取服务实例信息
                 instances = []
                 if has_activity:
-                    instances = self.get_service_instances(service_name, start_time, end_time)
+                    instances = self.get_service_instances(service_name, start_time, end_time, service_id)
                 
                 # 构建节点信息
                 node_info = {
@@ -486,12 +822,14 @@ class SkyWalkingCollector:
                 }
                 
                 # 只返回活跃的节点，或者根据需要返回所有节点
-                if has_activity:
-                    active_nodes.append(node_info)
+                return node_info if has_activity else None
                     
             except Exception as e:
                 self.logger.warning(f"检查服务 {service_name} 活动状态时出错: {str(e)}")
-                continue
+                return None
+        
+        # 各服务的检查相互独立，在并发上限内并行执行
+        active_nodes = [node for node in self._map_concurrent(check_service, candidates) if node]
         
         self.logger.info(f"发现 {len(active_nodes)} 个活跃节点")
         return active_nodes
@@ -567,9 +905,9 @@ class SkyWalkingCollector:
 
     def collect_all_data(self, time_window_minutes: int = 15) -> Dict:
         """收集所有相关数据"""
-        server_timezone = pytz.timezone('UTC')
-        end_time = datetime.now(server_timezone)
-        start_time = end_time - timedelta(minutes=time_window_minutes)
+        # 截止到已结束 settle_seconds 的分钟，避免最新一分钟的数据尚未写全、调用链分页错位
+        end_time = self.settled_minute()
+        start_time = end_time - timedelta(minutes=max(1, time_window_minutes) - 1)
         
         self.logger.info(f"开始收集数据，时间范围: {start_time} - {end_time}")
         
@@ -578,37 +916,49 @@ class SkyWalkingCollector:
         self.logger.info(f"发现 {len(services)} 个服务")
         # print(services)
         
-        # 获取拓扑信息
-        topology = self.get_service_topology(start_time, end_time)
+        services = [service for service in services if service.get("name")]
         
-        # 收集每个服务的详细数据
-        services_data = []
+        # 拓扑、分批的服务指标以及每个服务的调用链、实例查询相互独立，全部放入线程池并发执行，
+        # 总耗时接近最慢一批查询的延迟，而不是 服务数×3 次串行往返
+        service_names = [service.get("name") for service in services]
+        batch_size = self.metrics_batch_size
+        batches = [service_names[i:i + batch_size] for i in range(0, len(service_names), batch_size)]
+        
+        queries = [lambda: self.get_service_topology(start_time, end_time)]
+        queries.extend(
+            lambda batch=batch: self._get_metrics_batch(batch, start_time, end_time) for batch in batches
+        )
         for service in services:
             service_name = service.get("name")
-            if not service_name:
-                continue
-                
-            self.logger.info(f"收集服务 {service_name} 的数据")
-            
-            # 获取服务指标
-            metrics = self.get_service_metrics_once(service_name, start_time, end_time)
-            # print('--' * 50)
-            # self.logger.info(f"服务 {service_name} 指标: {json.dumps(metrics, indent=2, ensure_ascii=False)}")
-            
-            # 获取调用链数据
-            traces = self.get_trace_data(service_id=service.get("id"), start_time=start_time, end_time=end_time)
-            # print('--' * 50)
-            # self.logger.info(f"服务 {service_name} 调用链数据: {json.dumps(traces, indent=2, ensure_ascii=False)}")
-            
-            # 获取服务实例
-            instances = self.get_service_instances(service_name, start_time, end_time)
-            # print('--' * 50)
-            # self.logger.info(f"服务 {service_name} 实例: {json.dumps(instances, indent=2, ensure_ascii=False)}")
-
+            service_id = service.get("id")
+            queries.extend([
+                lambda sid=service_id: self.get_trace_stats(service_id=sid, start_time=start_time, end_time=end_time),
+                lambda name=service_name, sid=service_id: self.get_service_instances(name, start_time, end_time, sid)
+            ])
+        
+        self.logger.info(f"并发收集 {len(services)} 个服务的数据 "
+                         f"(指标批次: {len(batches)}, 并发上限: {self.max_concurrency})")
+        results = self._map_concurrent(lambda query: query(), queries)
+        
+        # 获取拓扑信息
+        topology = results[0]
+        
+        metrics_by_service = {}
+        for batch_result in results[1:1 + len(batches)]:
+            metrics_by_service.update(batch_result)
+        per_service_results = results[1 + len(batches):]
+        
+        # 按服务整理详细数据
+        services_data = []
+        for index, service in enumerate(services):
+            trace_stats, instances = per_service_results[index * 2: index * 2 + 2]
+            metrics = metrics_by_service[service.get("name")]
             services_data.append({
                 "service": service,
                 "metrics": metrics,
-                "traces": traces,
+                # 耗时最长的调用链样本，统计量基于窗口内的全部调用链
+                "traces": trace_stats.samples,
+                "trace_stats": trace_stats.to_dict(),
                 "instances": instances
             })
         
@@ -625,8 +975,8 @@ class SkyWalkingCollector:
     def health_check(self) -> bool:
         """检查SkyWalking连接状态"""
         try:
-            # 使用简单的服务查询来检查连接
-            services = self.get_services(hours_ago=1)
+            # 使用简单的服务查询来检查连接（绕过缓存，确保实际访问了服务端）
+            services = self.get_services(hours_ago=1, refresh=True)
             return len(services) >= 0  # 即使没有服务，只要查询成功就说明连接正常
         except Exception as e:
             self.logger.error(f"健康检查失败: {str(e)}")
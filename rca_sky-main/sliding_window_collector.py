@@ -0,0 +1,433 @@
+"""
+滑动窗口采集模块
+常驻进程内为每个服务维护按分钟分桶的滚动窗口, 每个周期只查询最新的分钟,
+异常检测和根因分析直接读取内存中的窗口数据
+"""
+
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Any
+
+import pytz
+import yaml
+
+from skywalking_collector import SkyWalkingCollector, SERVICE_METRIC_EXPRESSIONS, TraceQueryError
+from trace_aggregates import TraceAggregate
+
+
+class MinuteBucket:
+    """一个服务一分钟内的指标值和调用链统计量"""
+
+    __slots__ = ("minute", "metrics", "trace_stats")
+
+    def __init__(self, minute: datetime, trace_sample_size: int = 50):
+        self.minute = minute
+        # 指标名(service_cpm/service_sla/service_resp_time) -> 该分钟的值
+        self.metrics: Dict[str, Optional[int]] = {}
+        self.trace_stats = TraceAggregate(sample_size=trace_sample_size)
+
+
+class ServiceWindow:
+    """单个服务的滚动窗口: 按时间升序排列的分钟桶, 超出窗口的桶自动淘汰"""
+
+    def __init__(self, service: Dict, window_minutes: int, trace_sample_size: int = 50):
+        self.service = service
+        self.window_minutes = window_minutes
+        self.trace_sample_size = trace_sample_size
+        self.buckets: deque = deque(maxlen=window_minutes)
+        self.instances: List[Dict] = []
+
+    def bucket(self, minute: datetime) -> MinuteBucket:
+        """获取(必要时创建)指定分钟的桶"""
+        if self.buckets and self.buckets[-1].minute == minute:
+            return self.buckets[-1]
+        if not self.buckets or self.buckets[-1].minute < minute:
+            bucket = MinuteBucket(minute, self.trace_sample_size)
+            self.buckets.append(bucket)
+            return bucket
+        for bucket in self.buckets:
+            if bucket.minute == minute:
+                return bucket
+        # 窗口内缺失的较早分钟, 插入后保持有序
+        bucket = MinuteBucket(minute, self.trace_sample_size)
+        ordered = sorted(list(self.buckets) + [bucket], key=lambda item: item.minute)
+        self.buckets = deque(ordered[-self.window_minutes:], maxlen=self.window_minutes)
+        return bucket
+
+    def expire(self, oldest_minute: datetime):
+        """淘汰早于窗口起点的桶 (采集中断后恢复时窗口可能整体前移)"""
+        while self.buckets and self.buckets[0].minute < oldest_minute:
+            self.buckets.popleft()
+
+    def to_service_data(self) -> Dict:
+        """转换为与 SkyWalkingCollector.collect_all_data 相同的单服务数据结构"""
+        metrics = {}
+        for _, _, expression in SERVICE_METRIC_EXPRESSIONS:
+            values = [{"value": bucket.metrics.get(expression)} for bucket in self.buckets]
+            metrics[expression] = {"label": "", "values": {"values": values}}
+        trace_stats = TraceAggregate(sample_size=self.trace_sample_size)
+        for bucket in self.buckets:
+            trace_stats.merge(bucket.trace_stats)
+        return {
+            "service": dict(self.service),
+            "metrics": metrics,
+            "traces": trace_stats.samples,
+            "trace_stats": trace_stats.to_dict(),
+            "instances": list(self.instances)
+        }
+
+
+class SlidingWindowCollector:
+    """滑动窗口采集器
+
+    启动时采集一次完整窗口, 之后每个周期只查询上次采集之后已结束的分钟并追加到各服务窗口;
+    OAP 延迟持久化指标、调用链也会延迟上报, 因此只采集结束超过 settle_seconds 的分钟,
+    每个分钟只查询一次且之后不再更新。拓扑和实例按 topology_refresh_minutes 周期刷新。
+    snapshot() 返回与 collect_all_data 相同结构的数据, 可直接交给异常检测和根因分析
+    """
+
+    def __init__(self, collector: SkyWalkingCollector, window_minutes: int = 15, tick_seconds: int = 60,
+                 topology_refresh_minutes: int = 5, settle_seconds: int = 60, max_stale_seconds: int = 300,
+                 anomaly_detector=None, root_cause_analyzer=None, ollama_analyzer=None, result_exporter=None):
+        """
+        Args:
+            collector: SkyWalking数据采集器
+            window_minutes: 滚动窗口长度（分钟）
+            tick_seconds: 增量采集周期（秒）
+            topology_refresh_minutes: 拓扑和实例信息的刷新周期（分钟）
+            settle_seconds: 分钟结束后等待数据写全的时间（秒），之后才采集该分钟
+            max_stale_seconds: 距上次成功采集超过该时间（秒）时窗口视为过期，见 is_stale()
+            anomaly_detector: 异常检测器，analyze() 使用
+            root_cause_analyzer: 根因分析器，analyze() 使用
+            ollama_analyzer: AI分析器，report() 使用，为空时跳过AI分析
+            result_exporter: 结果导出器，report() 使用，为空时不导出文件
+        """
+        self.collector = collector
+        self.window_minutes = max(1, window_minutes)
+        self.tick_seconds = tick_seconds
+        self.topology_refresh_minutes = topology_refresh_minutes
+        self.settle_seconds = max(0, settle_seconds)
+        self.max_stale_seconds = max_stale_seconds
+        self.anomaly_detector = anomaly_detector
+        self.root_cause_analyzer = root_cause_analyzer
+        self.ollama_analyzer = ollama_analyzer
+        self.result_exporter = result_exporter
+        self.logger = logging.getLogger(__name__)
+
+        self.windows: Dict[str, ServiceWindow] = {}
+        self.topology: Dict = {"nodes": [], "calls": []}
+        # 已采集的最新一个完整分钟
+        self.last_minute: Optional[datetime] = None
+        self.last_topology_refresh: Optional[datetime] = None
+        self.last_tick_time: Optional[datetime] = None
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _current_minute(self) -> datetime:
+        """结束已超过 settle_seconds 的最近一个完整分钟 (UTC)"""
+        return self.collector.settled_minute(self.settle_seconds)
+
+    def _ingest(self, services: List[Dict], start_minute: datetime, end_minute: datetime):
+        """查询 [start_minute, end_minute] 内各服务的指标和调用链并写入对应分钟桶"""
+        minutes = int((end_minute - start_minute).total_seconds() // 60) + 1
+        names = [service["name"] for service in services]
+
+        metrics_by_service = self.collector.get_services_metrics_batch(names, start_minute, end_minute)
+        trace_stats_by_service = self.collector._map_concurrent(
+            lambda service: self._stream_trace_stats(service, start_minute, end_minute), services
+        )
+
+        with self._lock:
+            for service, trace_stats in zip(services, trace_stats_by_service):
+                window = self.windows.get(service["name"])
+                if window is None:
+                    window = self.windows[service["name"]] = ServiceWindow(
+                        service, self.window_minutes, self.collector.trace_sample_size
+                    )
+                window.service = service
+
+                # 指标值按分钟顺序返回, 数量不足时与区间末尾对齐
+                metrics = metrics_by_service.get(service["name"], {})
+                for _, _, expression in SERVICE_METRIC_EXPRESSIONS:
+                    values = metrics.get(expression, {}).get("values", {}).get("values", [])[-minutes:]
+                    offset = minutes - len(values)
+                    for index, value in enumerate(values):
+                        minute = start_minute + timedelta(minutes=offset + index)
+                        window.bucket(minute).metrics[expression] = value.get("value")
+
+                for minute, aggregate in trace_stats.items():
+                    window.bucket(minute).trace_stats.merge(aggregate)
+
+                window.expire(end_minute - timedelta(minutes=self.window_minutes - 1))
+
+            self.last_minute = end_minute
+
+    def _stream_trace_stats(self, service: Dict, start_minute: datetime,
+                            end_minute: datetime) -> Dict[datetime, TraceAggregate]:
+        """分页读取区间内服务的全部调用链, 按开始时间所在分钟流式累计统计量
+
+        分页查询失败时已读取的部分照常写入, 区间内各分钟的统计标记为不完整(truncated)
+        """
+        stats: Dict[datetime, TraceAggregate] = {}
+
+        def minute_stats(minute: datetime) -> TraceAggregate:
+            aggregate = stats.get(minute)
+            if aggregate is None:
+                aggregate = stats[minute] = TraceAggregate(sample_size=self.collector.trace_sample_size)
+            return aggregate
+
+        try:
+            for traces in self.collector.iter_trace_pages(service_id=service.get("id"),
+                                                          start_time=start_minute, end_time=end_minute):
+                for trace in traces:
+                    minute_stats(self._trace_minute(trace, start_minute, end_minute)).add(trace)
+        except TraceQueryError as e:
+            self.logger.warning(f"服务 {service.get('name')} 的调用链统计不完整: {str(e)}")
+            minute = start_minute
+            while minute <= end_minute:
+                minute_stats(minute).truncated = True
+                minute += timedelta(minutes=1)
+        return stats
+
+    @staticmethod
+    def _trace_minute(trace: Dict, start_minute: datetime, end_minute: datetime) -> datetime:
+        """调用链开始时间(毫秒时间戳)所在的分钟, 无法解析时归入区间最后一分钟"""
+        try:
+            started = datetime.fromtimestamp(int(trace.get("start")) / 1000, pytz.timezone('UTC'))
+            minute = started.replace(second=0, microsecond=0)
+            return min(max(minute, start_minute), end_minute)
+        except (TypeError, ValueError):
+            return end_minute
+
+    def _refresh_topology(self, services: List[Dict], end_minute: datetime):
+        """刷新窗口范围内的拓扑和各服务实例"""
+        start_minute = end_minute - timedelta(minutes=self.window_minutes - 1)
+        topology = self.collector.get_service_topology(start_minute, end_minute)
+        instances = self.collector._map_concurrent(
+            lambda service: self.collector.get_service_instances(
+                service["name"], start_minute, end_minute, service.get("id")
+            ),
+            services
+        )
+        with self._lock:
+            self.topology = topology
+            for service, service_instances in zip(services, instances):
+                window = self.windows.get(service["name"])
+                if window is not None:
+                    window.instances = service_instances
+            self.last_topology_refresh = end_minute
+
+    def _active_services(self) -> List[Dict]:
+        """活跃服务列表; 查询失败时服务列表为空, 此时抛出异常而不是把窗口清空"""
+        services = [service for service in self.collector.get_services(hours_ago=1) if service.get("name")]
+        if not services:
+            raise RuntimeError(f"未获取到服务列表，请检查SkyWalking服务是否可用: {self.collector.base_url}")
+        return services
+
+    def bootstrap(self):
+        """采集一次完整窗口"""
+        end_minute = self._current_minute()
+        start_minute = end_minute - timedelta(minutes=self.window_minutes - 1)
+        services = self._active_services()
+        self.logger.info(f"初始化滑动窗口: {len(services)} 个服务, {self.window_minutes} 分钟")
+
+        self._ingest(services, start_minute, end_minute)
+        self._refresh_topology(services, end_minute)
+        self.last_tick_time = datetime.now(pytz.timezone('UTC'))
+
+    def tick(self) -> int:
+        """增量采集上次之后已结束的分钟, 返回本次追加的分钟数"""
+        if self.last_minute is None:
+            self.bootstrap()
+            return self.window_minutes
+
+        end_minute = self._current_minute()
+        if end_minute <= self.last_minute:
+            self.last_tick_time = datetime.now(pytz.timezone('UTC'))
+            return 0
+
+        # 中断时间超过窗口长度时只补采窗口内的分钟
+        start_minute = max(self.last_minute + timedelta(minutes=1),
+                           end_minute - timedelta(minutes=self.window_minutes - 1))
+        services = self._active_services()
+        self._ingest(services, start_minute, end_minute)
+
+        # 淘汰已不再活跃的服务
+        active_names = {service["name"] for service in services}
+        with self._lock:
+            for name in [name for name in self.windows if name not in active_names]:
+                del self.windows[name]
+
+        if (self.last_topology_refresh is None or
+                end_minute - self.last_topology_refresh >= timedelta(minutes=self.topology_refresh_minutes)):
+            self._refresh_topology(services, end_minute)
+
+        self.last_tick_time = datetime.now(pytz.timezone('UTC'))
+        return int((end_minute - start_minute).total_seconds() // 60) + 1
+
+    def is_stale(self) -> bool:
+        """尚未采集, 或距上次成功采集已超过 max_stale_seconds (增量采集持续失败)"""
+        if self.last_tick_time is None:
+            return True
+        age = (datetime.now(pytz.timezone('UTC')) - self.last_tick_time).total_seconds()
+        return age > self.max_stale_seconds
+
+    def snapshot(self) -> Dict:
+        """当前窗口数据, 结构与 SkyWalkingCollector.collect_all_data 的返回值相同"""
+        with self._lock:
+            if self.last_minute is None:
+                return {"timestamp": None, "time_range": {}, "topology": {"nodes": [], "calls": []}, "services": []}
+            start_minute = self.last_minute - timedelta(minutes=self.window_minutes - 1)
+            return {
+                "timestamp": self.last_minute.isoformat(),
+                "time_range": {
+                    "start": start_minute.isoformat(),
+                    "end": (self.last_minute + timedelta(minutes=1)).isoformat()
+                },
+                "topology": self.topology,
+                "services": [window.to_service_data() for window in self.windows.values()]
+            }
+
+    def analyze(self) -> Dict[str, Any]:
+        """基于当前窗口执行异常检测和根因分析"""
+        skywalking_data = self.snapshot()
+        anomalies_data = self.anomaly_detector.detect_anomalies(skywalking_data)
+        root_cause_data = self.root_cause_analyzer.analyze(skywalking_data, anomalies_data)
+        return {
+            "skywalking_data": skywalking_data,
+            "anomalies_data": anomalies_data,
+            "root_cause_data": root_cause_data,
+            "window": {
+                "minutes": self.window_minutes,
+                "last_minute": skywalking_data.get("timestamp"),
+                "last_tick_time": self.last_tick_time.isoformat() if self.last_tick_time else None,
+                "services": len(skywalking_data.get("services", []))
+            }
+        }
+
+    def report(self) -> Dict[str, Any]:
+        """基于当前窗口执行与 main.py 相同的完整分析: 异常检测、根因分析、AI分析和结果导出
+
+        与 main.py 一致, 未发现异常时不执行AI分析和导出; 返回 analyze() 的结果并附带
+        ai_analysis 和 exported_files
+        """
+        analysis = self.analyze()
+        analysis["ai_analysis"] = {}
+        analysis["exported_files"] = {}
+        anomalies = analysis["anomalies_data"].get("anomalies", {})
+        if not any(anomalies.values()):
+            return analysis
+
+        skywalking_data = analysis["skywalking_data"]
+        anomalies_data = analysis["anomalies_data"]
+        root_cause_data = analysis["root_cause_data"]
+
+        ai_analysis = {}
+        if self.ollama_analyzer is not None:
+            try:
+                ai_analysis["anomaly_analysis"] = self.ollama_analyzer.analyze_anomalies(anomalies_data)
+                ai_analysis["root_cause_analysis"] = self.ollama_analyzer.analyze_root_causes(root_cause_data)
+                ai_analysis["comprehensive_report"] = self.ollama_analyzer.generate_comprehensive_report(
+                    anomalies_data, root_cause_data, skywalking_data
+                )
+            except Exception as e:
+                self.logger.error(f"AI分析过程中发生错误: {str(e)}")
+                ai_analysis = {"error": str(e)}
+        analysis["ai_analysis"] = ai_analysis
+
+        if self.result_exporter is not None:
+            analysis["exported_files"] = self.result_exporter.export_all(
+                skywalking_data, anomalies_data, root_cause_data, ai_analysis
+            )
+        return analysis
+
+    def _run(self):
+        while not self._stop_event.wait(self.tick_seconds):
+            try:
+                minutes = self.tick()
+                if minutes:
+                    self.logger.debug(f"滑动窗口已追加 {minutes} 分钟数据")
+            except Exception as e:
+                self.logger.error(f"滑动窗口增量采集失败: {str(e)}")
+
+    def start(self):
+        """在后台线程中周期性增量采集 (未初始化时先采集完整窗口)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        if self.last_minute is None:
+            self.bootstrap()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="skywalking-window", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台采集"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.tick_seconds)
+            self._thread = None
+
+
+_window_collectors: Dict[str, SlidingWindowCollector] = {}
+_window_collectors_lock = threading.Lock()
+
+
+def build_window_collector(config: Dict, base_dir: Optional[str] = None) -> SlidingWindowCollector:
+    """按配置(config.yaml 的内容)创建滑动窗口采集器及其使用的检测器、分析器和导出器
+
+    Args:
+        base_dir: 相对路径的结果目录所基于的目录, 默认为当前工作目录
+    """
+    from anomaly_detector import AnomalyDetector
+    from root_cause_analyzer import RootCauseAnalyzer
+    from ollama_analyzer import OllamaAnalyzer
+    from result_exporter import ResultExporter
+
+    skywalking_config = config.get("skywalking", {})
+    anomaly_config = config.get("anomaly_detection", {})
+    window_config = config.get("sliding_window", {})
+    ollama_config = config.get("ollama", {})
+    results_dir = config.get("output", {}).get("results_dir", "./results")
+    if base_dir is not None:
+        results_dir = os.path.join(base_dir, results_dir)
+
+    collector = SkyWalkingCollector.from_config(skywalking_config)
+    return SlidingWindowCollector(
+        collector,
+        window_minutes=window_config.get("window_minutes", anomaly_config.get("time_window", 15)),
+        tick_seconds=window_config.get("tick_seconds", 60),
+        topology_refresh_minutes=window_config.get("topology_refresh_minutes", 5),
+        settle_seconds=window_config.get("settle_seconds", skywalking_config.get("settle_seconds", 60)),
+        max_stale_seconds=window_config.get("max_stale_seconds", 300),
+        anomaly_detector=AnomalyDetector(anomaly_config),
+        root_cause_analyzer=RootCauseAnalyzer(config.get("root_cause_analysis", {})),
+        ollama_analyzer=OllamaAnalyzer(
+            base_url=ollama_config.get("base_url", "http://localhost:11434"),
+            model=ollama_config.get("model", "gemma3:12b-it-qat"),
+            timeout=ollama_config.get("timeout", 600)
+        ),
+        result_exporter=ResultExporter(results_dir=results_dir)
+    )
+
+
+def get_window_collector(config_path: str = "config.yaml") -> SlidingWindowCollector:
+    """获取配置文件对应的共享滑动窗口采集器, 首次调用时采集完整窗口并启动后台增量采集"""
+    with _window_collectors_lock:
+        window = _window_collectors.get(config_path)
+        if window is None:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                config = yaml.safe_load(f) or {}
+            window = build_window_collector(config, os.path.dirname(os.path.abspath(config_path)))
+            try:
+                window.start()
+            except Exception:
+                # 初始化失败的采集器不缓存, 下次调用重新创建
+                window.collector.close()
+                raise
+            _window_collectors[config_path] = window
+        return window
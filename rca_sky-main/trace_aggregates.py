@@ -0,0 +1,134 @@
+"""
+调用链聚合模块
+以流式方式累计调用链统计量(数量、错误数、耗时合计/最大值、耗时分位数草图),
+内存占用与调用链数量无关
+"""
+
+import heapq
+import math
+from typing import Dict, List, Iterable
+
+
+class DurationSketch:
+    """对数分桶的耗时分位数草图 (DDSketch 思路)
+
+    耗时 x 落入桶 ceil(log_gamma(x)), gamma = (1 + a) / (1 - a),
+    任意分位数的相对误差不超过 a; 桶数只与耗时的数量级范围有关, 可直接合并
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value: float):
+        """加入一个耗时值 (毫秒)"""
+        self.count += 1
+        if value <= 0:
+            self.zero_count += 1
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def merge(self, other: "DurationSketch"):
+        """合并另一个相同精度的草图"""
+        self.count += other.count
+        self.zero_count += other.zero_count
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def quantile(self, q: float) -> float:
+        """估计 q 分位数 (0 <= q <= 1), 没有数据时返回 0"""
+        if self.count == 0:
+            return 0
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0
+        seen = self.zero_count
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                # 桶 (gamma^(i-1), gamma^i] 的代表值, 相对误差不超过 relative_accuracy
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+class TraceAggregate:
+    """一组调用链的流式统计量, 另外保留耗时最长的少量调用链作为样本"""
+
+    def __init__(self, sample_size: int = 50, relative_accuracy: float = 0.01):
+        self.sample_size = sample_size
+        self.count = 0
+        self.error_count = 0
+        self.duration_sum = 0
+        self.duration_max = 0
+        self.sketch = DurationSketch(relative_accuracy)
+        # (耗时, 序号, 调用链) 的小顶堆, 保留耗时最长的 sample_size 条
+        self._samples: List = []
+        self._sequence = 0
+        # 因达到分页上限或分页查询失败而未读完全部调用链
+        self.truncated = False
+
+    def add(self, trace: Dict):
+        """累计一条调用链"""
+        duration = trace.get("duration") or 0
+        self.count += 1
+        if trace.get("isError", False):
+            self.error_count += 1
+        self.duration_sum += duration
+        if duration > self.duration_max:
+            self.duration_max = duration
+        self.sketch.add(duration)
+        self._add_sample(duration, trace)
+
+    def _add_sample(self, duration: float, trace: Dict):
+        """耗时超过当前样本中最短者时替换之"""
+        if self.sample_size <= 0:
+            return
+        self._sequence += 1
+        item = (duration, self._sequence, trace)
+        if len(self._samples) < self.sample_size:
+            heapq.heappush(self._samples, item)
+        elif duration > self._samples[0][0]:
+            heapq.heapreplace(self._samples, item)
+
+    def add_all(self, traces: Iterable[Dict]):
+        for trace in traces:
+            self.add(trace)
+
+    def merge(self, other: "TraceAggregate"):
+        """合并另一组调用链的统计量"""
+        self.count += other.count
+        self.error_count += other.error_count
+        self.duration_sum += other.duration_sum
+        self.duration_max = max(self.duration_max, other.duration_max)
+        self.sketch.merge(other.sketch)
+        self.truncated = self.truncated or other.truncated
+        for duration, _, trace in other._samples:
+            self._add_sample(duration, trace)
+
+    @property
+    def samples(self) -> List[Dict]:
+        """耗时最长的调用链样本, 按耗时降序"""
+        return [trace for _, _, trace in sorted(self._samples, key=lambda item: item[0], reverse=True)]
+
+    def quantile(self, q: float) -> float:
+        return self.sketch.quantile(q)
+
+    def to_dict(self) -> Dict:
+        """统计结果, 用于 services[].trace_stats"""
+        return {
+            "trace_count": self.count,
+            "error_count": self.error_count,
+            "error_rate": (self.error_count / self.count) * 100 if self.count else 0,
+            "avg_trace_duration": self.duration_sum / self.count if self.count else 0,
+            "max_trace_duration": self.duration_max,
+            "p50_trace_duration": self.quantile(0.5),
+            "p95_trace_duration": self.quantile(0.95),
+            "p99_trace_duration": self.quantile(0.99),
+            "truncated": self.truncated
+        }
+
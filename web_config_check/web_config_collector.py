@@ -16,11 +16,24 @@ import psutil
 from datetime import datetime
 from typing import Dict, Any, Optional, List
 import logging
+import sys
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 与异常模式检测子系统共享主机指标采样器, 不可用时直接调用psutil
+_sampler_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'abnormal_pattern_detect')
+if _sampler_dir not in sys.path:
+    sys.path.append(_sampler_dir)
+try:
+    from host_sampler import get_sampler
+except ImportError:
+    get_sampler = None
+
+# 性能指标允许的最大时效(秒)
+METRICS_MAX_AGE = 10
+
 class WebConfigCollector:
     """Web应用配置采集器"""
     
@@ -482,12 +495,19 @@ class WebConfigCollector:
         
         try:
             # 系统性能指标
-            cpu_percent = psutil.cpu_percent(interval=1)
-            memory = psutil.virtual_memory()
-            disk = psutil.disk_usage('/')
-            
-            # 网络连接数
-            connections = len(psutil.net_connections())
+            if get_sampler is not None:
+                sample = get_sampler().latest(max_age=METRICS_MAX_AGE)
+                cpu_percent = sample['cpu_percent']
+                memory_percent = sample['memory_percent']
+                disk_percent = sample['disk_usage_percent']
+                connections = sample['network_connections']
+            else:
+                cpu_percent = psutil.cpu_percent(interval=1)
+                memory_percent = psutil.virtual_memory().percent
+                disk_percent = psutil.disk_usage('/').percent
+                
+                # 网络连接数
+                connections = len(psutil.net_connections())
             
             # 进程信息
             web_processes = []
@@ -500,8 +520,8 @@ class WebConfigCollector:
             
             metrics = {
                 "cpu_usage": cpu_percent,
-                "memory_usage": memory.percent,
-                "disk_usage": disk.percent,
+                "memory_usage": memory_percent,
+                "disk_usage": disk_percent,
                 "network_connections": connections,
                 "web_processes": web_processes
             }